@@ -1,11 +1,22 @@
 import os
+import time
+import shutil
 import tempfile
 import json
 import logging
-from flask import Blueprint, request, jsonify, send_file, render_template, Response
+from flask import Blueprint, request, jsonify, send_file, render_template, Response, stream_with_context, g
 from werkzeug.utils import secure_filename
 import uuid
-from diarizer import Diarizer
+import multiprocessing
+from threading import Lock
+from diarizer import DiarizationEngine, EngineBusy, JobManager, StreamingDiarizer
+from diarizer.rendering import (SEGMENT_FORMATS, render_speaker, render_speaker_file,
+                                render_speaker_span)
+from diarizer.session_store import SessionStore
+from diarizer.result_cache import ResultCache
+from diarizer.speaker_count import CRITERIA as SPEAKER_COUNT_CRITERIA
+from diarizer.clustering import CLUSTERING_BACKENDS
+from diarizer.metrics import DiarizationMetrics
 
 # Create Blueprint
 api_bp = Blueprint('api', __name__)
@@ -14,10 +25,98 @@ api_bp = Blueprint('api', __name__)
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
-# Initialize diarizer
-diarizer = Diarizer()
+# Session store shared with the engine workers and other server processes
+session_dir = os.environ.get('DIARIZER_SESSION_DIR',
+                             os.path.join(tempfile.gettempdir(), 'speechsplitter-sessions'))
+session_store = SessionStore(
+    session_dir,
+    max_bytes=int(float(os.environ.get('DIARIZER_SESSION_QUOTA_MB', '2048')) * 1024 * 1024),
+    ttl=float(os.environ.get('DIARIZER_SESSION_TTL', '3600')),
+    sweep_interval=float(os.environ.get('DIARIZER_SESSION_SWEEP_INTERVAL', '60'))
+)
+
+# Results of recently diarized audio, reused while their session exists
+result_cache_size = int(os.environ.get('DIARIZER_RESULT_CACHE_SIZE', '256'))
+result_cache = ResultCache(
+    max_entries=result_cache_size,
+    validate=lambda result: session_store.get(result['session_id']) is not None
+) if result_cache_size > 0 else None
+
+# Request and pipeline metrics, exposed at /api/metrics
+metrics = DiarizationMetrics(result_cache)
+
+# Diarization engine, created on first use
+_engine = None
+_engine_lock = Lock()
+
+def get_engine():
+    """Return the process-wide diarization engine, starting it if needed"""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = DiarizationEngine(
+                max_workers=int(os.environ.get('DIARIZER_WORKERS', '0')) or None,
+                queue_depth=int(os.environ['DIARIZER_QUEUE_DEPTH']) if 'DIARIZER_QUEUE_DEPTH' in os.environ else None,
+                retry_after=int(os.environ.get('DIARIZER_RETRY_AFTER', '5')),
+                result_cache=result_cache,
+                metrics=metrics,
+                diarizer_kwargs={
+                    'session_store': session_store,
+                    'feature_mode': os.environ.get('DIARIZER_FEATURE_MODE', 'segment'),
+                    'block_threshold_s': float(os.environ['DIARIZER_BLOCK_THRESHOLD_S']) if 'DIARIZER_BLOCK_THRESHOLD_S' in os.environ else None,
+                    'max_speakers': int(os.environ.get('DIARIZER_MAX_SPEAKERS', '2')),
+                    'speaker_count': os.environ.get('DIARIZER_SPEAKER_COUNT') or None,
+                    'clustering': os.environ.get('DIARIZER_CLUSTERING', 'kmeans'),
+                    'energy_gate_db': float(os.environ['DIARIZER_ENERGY_GATE_DB']) if 'DIARIZER_ENERGY_GATE_DB' in os.environ else None,
+                    'vad_workers': int(os.environ.get('DIARIZER_VAD_WORKERS', '1')),
+                    'vad_shard_s': float(os.environ.get('DIARIZER_VAD_SHARD_S', '300'))
+                }
+            )
+        return _engine
+
+# Asynchronous jobs share the engine with synchronous requests, and the
+# session index with the other server processes
+jobs = JobManager(
+    get_engine,
+    session_store.index_path,
+    max_pending=int(os.environ.get('DIARIZER_MAX_PENDING_JOBS', '100')),
+    webhook_hosts=[host.strip() for host in os.environ.get('DIARIZER_WEBHOOK_HOSTS', '').split(',') if host.strip()]
+)
+
+def busy_response(e):
+    """Build a 503 response telling the client when to retry"""
+    response = jsonify({'error': 'Server busy, retry later'})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response
+
+@api_bp.before_request
+def start_timer():
+    """Note when the request started, for the request metrics"""
+    g.request_start = time.perf_counter()
+
+@api_bp.after_request
+def record_request(response):
+    """Count the request and its duration by endpoint and status"""
+    start = g.get('request_start')
+    if start is not None:
+        metrics.observe_request(request.endpoint or 'unknown', request.method,
+                                response.status_code, time.perf_counter() - start)
+    return response
 
 # Helper functions
+def with_timings(result):
+    """
+    Drop stage timings from a result unless the request asks for them
+    with ?timings=1
+    """
+    if not isinstance(result, dict) or 'timings' not in result:
+        return result
+    if request.args.get('timings', '').lower() in ('1', 'true', 'yes'):
+        return result
+    # Copy, since cached results are shared between requests
+    return {key: value for key, value in result.items() if key != 'timings'}
+
 def allowed_file(filename):
     """Check if file has an allowed extension"""
     ALLOWED_EXTENSIONS = {'wav', 'mp3', 'ogg', 'flac', 'webm'}
@@ -53,18 +152,98 @@ def upload_file():
         file.save(file_path)
         
         # Process audio file
-        result = diarizer.process_audio_file(file_path)
-        
-        # Clean up
-        os.remove(file_path)
-        os.rmdir(temp_dir)
+        try:
+            result = get_engine().run('process_audio_file', file_path)
+        finally:
+            # Clean up
+            os.remove(file_path)
+            os.rmdir(temp_dir)
         
-        return jsonify(result)
+        return jsonify(with_timings(result))
+    
+    except EngineBusy as e:
+        return busy_response(e)
     
     except Exception as e:
         logger.error(f"Error processing uploaded file: {e}")
         return jsonify({'error': str(e)}), 500
 
+@api_bp.route('/jobs', methods=['POST'])
+def submit_job():
+    """
+    API endpoint to submit an audio file for asynchronous diarization
+    
+    Returns:
+        JSON response with the job ID and its status URL
+    """
+    # Check if file is present in request
+    if 'file' not in request.files:
+        return jsonify({'error': 'No file part in the request'}), 400
+    
+    file = request.files['file']
+    
+    # Check if file is empty
+    if file.filename == '':
+        return jsonify({'error': 'No file selected'}), 400
+    
+    # Check if file has allowed extension
+    if not allowed_file(file.filename):
+        return jsonify({'error': 'File type not allowed'}), 400
+    
+    # Check the optional completion webhook
+    callback_url = request.form.get('callback_url')
+    if callback_url and not callback_url.startswith(('http://', 'https://')):
+        return jsonify({'error': 'callback_url must be an http(s) URL'}), 400
+    if callback_url and not jobs.webhook_allowed(callback_url):
+        return jsonify({'error': 'callback_url host is not allowed'}), 400
+    
+    temp_dir = None
+    try:
+        # Refuse before writing the upload to disk when too many jobs wait
+        jobs.check_capacity()
+        
+        # Save file to temporary location; the job removes it when done
+        temp_dir = tempfile.mkdtemp()
+        file_path = os.path.join(temp_dir, secure_filename(file.filename))
+        file.save(file_path)
+        
+        job_id = jobs.submit(file_path, callback_url=callback_url)
+        
+        return jsonify({
+            'job_id': job_id,
+            'status': 'queued',
+            'url': f'/api/jobs/{job_id}'
+        }), 202
+    
+    except EngineBusy as e:
+        # Filled up while the upload was saved
+        if temp_dir is not None:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+        return busy_response(e)
+    
+    except Exception as e:
+        logger.error(f"Error submitting diarization job: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@api_bp.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """
+    API endpoint to get the status of an asynchronous diarization job
+    
+    Args:
+        job_id: Job ID
+        
+    Returns:
+        JSON with job status, progress and, once completed, the result
+    """
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    if job.get('result') is not None:
+        job = dict(job, result=with_timings(job['result']))
+    return jsonify(job)
+
 @api_bp.route('/stream', methods=['POST'])
 def process_stream():
     """
@@ -81,14 +260,49 @@ def process_stream():
             return jsonify({'error': 'No audio data received'}), 400
         
         # Process audio data
-        result = diarizer.process_audio_bytes(audio_data)
+        result = get_engine().run('process_audio_bytes', audio_data)
         
-        return jsonify(result)
+        return jsonify(with_timings(result))
+    
+    except EngineBusy as e:
+        return busy_response(e)
     
     except Exception as e:
         logger.error(f"Error processing audio stream: {e}")
         return jsonify({'error': str(e)}), 500
 
+@api_bp.route('/stream/live', methods=['POST'])
+def process_live_stream():
+    """
+    API endpoint for real-time diarization of a live audio stream
+    
+    The request body is raw 16-bit mono PCM, typically sent with chunked
+    transfer encoding while it is being captured. Each speech segment is
+    written to the response as a JSON line as soon as it closes.
+    
+    Returns:
+        Streaming application/x-ndjson response
+    """
+    sample_rate = request.args.get('sample_rate', 16000, type=int)
+    if sample_rate not in (8000, 16000, 32000, 48000):
+        return jsonify({'error': 'sample_rate must be 8000, 16000, 32000 or 48000'}), 400
+    
+    streamer = StreamingDiarizer(sample_rate=sample_rate)
+    
+    # Read one VAD frame (30 ms) at a time so segments are not delayed
+    chunk_size = int(sample_rate * streamer.frame_duration_ms / 1000) * 2
+    chunks = iter(lambda: request.stream.read(chunk_size), b'')
+    
+    def generate():
+        try:
+            for segment in streamer.process(chunks):
+                yield json.dumps(segment) + '\n'
+        except Exception as e:
+            logger.error(f"Error processing live stream: {e}")
+            yield json.dumps({'error': str(e)}) + '\n'
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
 @api_bp.route('/segments/<session_id>/<speaker_id>', methods=['GET'])
 def get_speaker_segment(session_id, speaker_id):
     """
@@ -100,18 +314,69 @@ def get_speaker_segment(session_id, speaker_id):
         
     Returns:
         Audio file for the speaker
+        
+    Query parameters:
+        format: Output format, one of wav (default), flac or ogg
+        start: Optional start time in seconds within the speaker's audio;
+            at or past the speaker's total duration the response is 416
+        end: Optional end time in seconds within the speaker's audio
+        
+    Full files are cached per session and honor HTTP Range requests.
     """
     try:
+        fmt = request.args.get('format', 'wav').lower()
+        if fmt not in SEGMENT_FORMATS:
+            return jsonify({'error': f'Unsupported format: {fmt}'}), 400
+        mimetype = SEGMENT_FORMATS[fmt][2]
+        
+        start = request.args.get('start', type=float)
+        end = request.args.get('end', type=float)
+        if (start is not None and start < 0) or (end is not None and end <= (start or 0)):
+            return jsonify({'error': 'Invalid time range'}), 400
+        
         # Construct file path
-        temp_dir = os.path.join(diarizer.temp_dir, session_id)
-        file_path = os.path.join(temp_dir, f"{speaker_id}.wav")
+        session_id = secure_filename(session_id)
+        speaker_id = secure_filename(speaker_id)
+        session = session_store.get(session_id)
+        if session is None:
+            return jsonify({'error': 'Session not found'}), 404
+        
+        # A span starting after the speaker's audio would be an empty file
+        speaker = session.get('speakers', {}).get(speaker_id)
+        if speaker is not None and start is not None and start >= speaker['total_duration']:
+            return jsonify({
+                'error': f"start must be below the speaker's total duration "
+                         f"({speaker['total_duration']:.3f} s)"
+            }), 416
         
-        # Check if file exists
-        if not os.path.exists(file_path):
+        temp_dir = session_store.path(session_id)
+        file_path = os.path.join(temp_dir, f"{speaker_id}.{fmt}")
+        
+        try:
+            # Time ranges decode only the requested span
+            if start is not None or end is not None:
+                data = render_speaker_span(temp_dir, speaker_id, start or 0.0, end, fmt)
+                return Response(data, mimetype=mimetype)
+            
+            # First full WAV request: stream while rendering the cache
+            if fmt == 'wav' and not os.path.exists(file_path) and 'Range' not in request.headers:
+                size, chunks = render_speaker(temp_dir, speaker_id)
+                
+                def generate():
+                    yield from chunks
+                    session_store.update_size(session_id)
+                
+                return Response(stream_with_context(generate()), mimetype=mimetype,
+                                headers={'Content-Length': str(size)})
+            
+            if not os.path.exists(file_path):
+                file_path = render_speaker_file(temp_dir, speaker_id, fmt)
+                session_store.update_size(session_id)
+        except KeyError:
             return jsonify({'error': 'Speaker segment not found'}), 404
         
-        # Return audio file
-        return send_file(file_path, mimetype='audio/wav')
+        # Return audio file (conditional enables Range and ETag handling)
+        return send_file(file_path, mimetype=mimetype, conditional=True)
     
     except Exception as e:
         logger.error(f"Error retrieving speaker segment: {e}")
@@ -129,27 +394,23 @@ def get_session_info(session_id):
         JSON with session information
     """
     try:
-        # Construct directory path
-        temp_dir = os.path.join(diarizer.temp_dir, session_id)
-        
-        # Check if directory exists
-        if not os.path.exists(temp_dir):
+        # Look the session up in the store's index
+        session = session_store.get(secure_filename(session_id))
+        if session is None:
             return jsonify({'error': 'Session not found'}), 404
         
-        # Get list of speaker files
-        speaker_files = [f for f in os.listdir(temp_dir) if f.endswith('.wav')]
-        
         # Create response with speaker info
         speakers = {}
-        for speaker_file in speaker_files:
-            speaker_id = os.path.splitext(speaker_file)[0]
+        for speaker_id, info in sorted(session['speakers'].items()):
             speakers[speaker_id] = {
-                'url': f'/api/segments/{session_id}/{speaker_id}'
+                'url': f'/api/segments/{session_id}/{speaker_id}',
+                'num_segments': info['num_segments'],
+                'total_duration': info['total_duration']
             }
         
         return jsonify({
             'session_id': session_id,
-            'num_speakers': len(speaker_files),
+            'num_speakers': len(speakers),
             'speakers': speakers
         })
     
@@ -157,6 +418,61 @@ def get_session_info(session_id):
         logger.error(f"Error retrieving session info: {e}")
         return jsonify({'error': str(e)}), 500
 
+@api_bp.route('/sessions/<session_id>/recluster', methods=['POST'])
+def recluster_session(session_id):
+    """
+    API endpoint to re-cluster a session into a different number of speakers
+    
+    Reuses the features saved with the session, so no audio is decoded
+    or analysed again. The result is a new session.
+    
+    Args:
+        session_id: Diarization session ID
+        
+    Query parameters:
+        speakers: Number of speakers to identify, or "auto" to estimate it
+        max_speakers: Upper bound for "auto" (default 8)
+        criterion: Estimation criterion for "auto": eigengap (default)
+            or silhouette
+        clustering: Clustering backend (server default if omitted)
+        
+    Returns:
+        JSON with diarization results
+    """
+    try:
+        speaker_count = None
+        if request.args.get('speakers') == 'auto':
+            num_speakers = request.args.get('max_speakers', 8, type=int)
+            speaker_count = request.args.get('criterion', 'eigengap')
+            if speaker_count not in SPEAKER_COUNT_CRITERIA:
+                return jsonify({'error': f'Unsupported criterion: {speaker_count}'}), 400
+        else:
+            num_speakers = request.args.get('speakers', type=int)
+        if num_speakers is None or num_speakers < 1:
+            return jsonify({'error': 'speakers must be a positive integer or "auto"'}), 400
+        
+        clustering = request.args.get('clustering')
+        if clustering is not None and clustering not in CLUSTERING_BACKENDS:
+            return jsonify({'error': f'Unsupported clustering backend: {clustering}'}), 400
+        
+        session_id = secure_filename(session_id)
+        if session_store.get(session_id) is None:
+            return jsonify({'error': 'Session not found'}), 404
+        
+        result = get_engine().run('recluster_session', session_id, num_speakers,
+                                  speaker_count, clustering)
+        if not result.get('success'):
+            return jsonify(result), 404
+        
+        return jsonify(with_timings(result))
+    
+    except EngineBusy as e:
+        return busy_response(e)
+    
+    except Exception as e:
+        logger.error(f"Error re-clustering session: {e}")
+        return jsonify({'error': str(e)}), 500
+
 @api_bp.route('/webrtc', methods=['POST'])
 def process_webrtc():
     """
@@ -178,13 +494,17 @@ def process_webrtc():
         audio_file.save(file_path)
         
         # Process audio file
-        result = diarizer.process_audio_file(file_path)
-        
-        # Clean up
-        os.remove(file_path)
-        os.rmdir(temp_dir)
+        try:
+            result = get_engine().run('process_audio_file', file_path)
+        finally:
+            # Clean up
+            os.remove(file_path)
+            os.rmdir(temp_dir)
         
-        return jsonify(result)
+        return jsonify(with_timings(result))
+    
+    except EngineBusy as e:
+        return busy_response(e)
     
     except Exception as e:
         logger.error(f"Error processing WebRTC audio: {e}")
@@ -194,3 +514,14 @@ def process_webrtc():
 def health_check():
     """Health check endpoint"""
     return jsonify({'status': 'ok'})
+
+@api_bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Request and pipeline metrics in the Prometheus text format"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+# Start workers ahead of traffic in the serving process, but not in the
+# engine's own worker processes, which import this module when spawned
+if multiprocessing.parent_process() is None:
+    get_engine()
+    session_store.start_sweeper()
@@ -0,0 +1,8 @@
+"""
+Benchmarks for the speech diarization pipeline.
+
+Run individual scripts as modules from the repository root, e.g.
+``python -m benchmarks.bench_detect_speech``. ``python -m benchmarks.suite``
+times every pipeline stage on a synthetic corpus and writes a JSON report
+that later runs can be compared against.
+"""
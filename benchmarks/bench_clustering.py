@@ -0,0 +1,55 @@
+"""
+Benchmark clustering backends for speed and label agreement.
+
+Usage:
+    python -m benchmarks.bench_clustering --segments 20,49,200,1000,4000
+"""
+import argparse
+import time
+
+import numpy as np
+from sklearn.metrics import adjusted_rand_score
+
+from diarizer.clustering import CLUSTERING_BACKENDS, cluster
+
+
+def synthetic_features(n_rows, n_dims, n_speakers, seed=0):
+    """Speaker clusters of MFCC-like vectors with uneven per-dimension scales"""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(0, 0.6, (n_speakers, n_dims))
+    truth = rng.integers(n_speakers, size=n_rows)
+    features = (centers[truth] + rng.normal(0, 1, (n_rows, n_dims))) * np.linspace(1, 20, n_dims)
+    return features, truth
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--segments', default='20,49,200,1000,4000',
+                        help='Comma-separated segment counts')
+    parser.add_argument('--dims', type=int, default=39,
+                        help='Feature dimensions')
+    parser.add_argument('--speakers', type=int, default=3,
+                        help='Number of speakers')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='Timing repetitions (best is reported)')
+    args = parser.parse_args()
+    
+    print(f"{'segments':>9}{'backend':>15}{'ms':>10}{'ARI truth':>11}{'ARI kmeans':>12}")
+    for n_rows in [int(n) for n in args.segments.split(',')]:
+        features, truth = synthetic_features(n_rows, args.dims, args.speakers)
+        reference = None
+        for backend in CLUSTERING_BACKENDS:
+            best = np.inf
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                labels = cluster(features, args.speakers, backend)
+                best = min(best, time.perf_counter() - start)
+            if backend == 'kmeans':
+                reference = labels
+            print(f"{n_rows:>9}{backend:>15}{best * 1000:>10.1f}"
+                  f"{adjusted_rand_score(truth, labels):>11.3f}"
+                  f"{adjusted_rand_score(reference, labels):>12.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+Check that diarization throughput scales with concurrent requests.
+
+N identical WAV payloads are submitted from a thread pool of increasing
+size, either through a DiarizationEngine (the path the API uses, one
+worker process per thread) or through a shared in-process Diarizer.
+Requests per second should scale with threads up to the number of cores.
+The run fails if the speedup at any thread count falls below
+--min-efficiency x min(threads, cores).
+
+Usage:
+    python -m benchmarks.bench_concurrency --requests 16 --threads 1 2 4 8
+"""
+import argparse
+import io
+import os
+import time
+import wave
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.synthetic import synthetic_speech
+from diarizer import DiarizationEngine, Diarizer
+from diarizer.audio_utils import float_to_int16
+
+
+def make_wav_bytes(duration, sample_rate=16000):
+    """Encode synthetic speech as an in-memory 16-bit WAV"""
+    audio = float_to_int16(synthetic_speech(duration, sample_rate))
+    with io.BytesIO() as buf:
+        with wave.open(buf, 'wb') as wf:
+            wf.setnchannels(1)
+            wf.setsampwidth(2)
+            wf.setframerate(sample_rate)
+            wf.writeframes(audio.tobytes())
+        return buf.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--requests', type=int, default=16, help='Requests per run')
+    parser.add_argument('--duration', type=float, default=20.0, help='Seconds of audio per request')
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--max-concurrency', type=int, default=None,
+                        help='Concurrency bound of the in-process Diarizer')
+    parser.add_argument('--backend', choices=['engine', 'diarizer'], default='engine',
+                        help='Submit through a DiarizationEngine or a shared Diarizer')
+    parser.add_argument('--min-efficiency', type=float, default=0.6,
+                        help='Required speedup per usable core')
+    args = parser.parse_args()
+    
+    payload = make_wav_bytes(args.duration)
+    cores = os.cpu_count() or 1
+    engine = None
+    if args.backend == 'engine':
+        engine = DiarizationEngine(max_workers=max(args.threads), queue_depth=args.requests)
+        process = lambda audio: engine.run('process_audio_bytes', audio)
+        # Warm up every worker
+        with ThreadPoolExecutor(max_workers=max(args.threads)) as pool:
+            list(pool.map(process, [payload] * max(args.threads)))
+    else:
+        diarizer = Diarizer(max_concurrency=args.max_concurrency)
+        process = diarizer.process_audio_bytes
+        process(payload)  # warm up imports and caches
+    
+    print(f"backend={args.backend} cores={cores} requests={args.requests} audio={args.duration}s")
+    print(f"{'threads':>8}{'wall s':>10}{'req/s':>10}{'speedup':>10}{'required':>10}")
+    baseline = None
+    failures = []
+    for n_threads in args.threads:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=n_threads) as pool:
+            results = list(pool.map(process, [payload] * args.requests))
+        elapsed = time.perf_counter() - start
+        
+        if not all(r.get('success') for r in results):
+            raise RuntimeError("Diarization failed during benchmark")
+        
+        throughput = args.requests / elapsed
+        baseline = baseline or throughput
+        speedup = throughput / baseline
+        required = args.min_efficiency * min(n_threads, cores)
+        print(f"{n_threads:>8}{elapsed:>10.2f}{throughput:>10.2f}{speedup:>10.2f}{required:>10.2f}")
+        if speedup < required:
+            failures.append(n_threads)
+    
+    if engine is not None:
+        engine.shutdown()
+    if failures:
+        raise SystemExit(f"Throughput does not scale at {failures} threads")
+
+
+if __name__ == '__main__':
+    main()
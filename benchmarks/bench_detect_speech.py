@@ -0,0 +1,119 @@
+"""
+Benchmark Diarizer._detect_speech against the previous list-of-frames
+implementation.
+
+Each variant runs in its own subprocess so peak RSS is measured in
+isolation; the peak of allocations made inside the call itself is
+reported separately via tracemalloc. Times are normalized to one hour of
+audio.
+
+Usage:
+    python -m benchmarks.bench_detect_speech --duration 600
+"""
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import webrtcvad
+
+from benchmarks.synthetic import synthetic_speech
+
+
+def legacy_detect_speech(diarizer, audio, sample_rate):
+    """Frame-copying implementation used before the vectorized path"""
+    audio_int16 = (audio * 32768).astype(np.int16)
+    frame_size = int(sample_rate * diarizer.frame_duration_ms / 1000)
+    padding = frame_size - (len(audio_int16) % frame_size)
+    if padding < frame_size:
+        audio_int16 = np.pad(audio_int16, (0, padding), 'constant')
+    frames = [audio_int16[i:i+frame_size] for i in range(0, len(audio_int16), frame_size)]
+    vad = webrtcvad.Vad(diarizer.vad_aggressiveness)
+    
+    speech_frames = []
+    for i, frame in enumerate(frames):
+        if vad.is_speech(frame.tobytes(), sample_rate):
+            start_sample = i * frame_size
+            end_sample = (i + 1) * frame_size
+            speech_frames.append((start_sample / sample_rate, end_sample / sample_rate,
+                                  audio[start_sample:end_sample]))
+    
+    merged_segments = []
+    if speech_frames:
+        current_start, current_end, current_audio = speech_frames[0]
+        current_audio_list = [current_audio]
+        for start, end, segment_audio in speech_frames[1:]:
+            if abs(start - current_end) < 0.05:
+                current_end = end
+                current_audio_list.append(segment_audio)
+            else:
+                merged_segments.append((current_start, current_end, np.concatenate(current_audio_list)))
+                current_start, current_end = start, end
+                current_audio_list = [segment_audio]
+        merged_segments.append((current_start, current_end, np.concatenate(current_audio_list)))
+    
+    min_samples = int(diarizer.min_speech_duration_ms * sample_rate / 1000)
+    return [s for s in merged_segments if len(s[2]) >= min_samples]
+
+
+def run_variant(variant, duration):
+    """Run one variant in this process and return its measurements"""
+    from diarizer import Diarizer
+    
+    sample_rate = 16000
+    audio = synthetic_speech(duration, sample_rate)
+    diarizer = Diarizer(sample_rate=sample_rate)
+    
+    tracemalloc.start()
+    start = time.perf_counter()
+    if variant == 'legacy':
+        segments = legacy_detect_speech(diarizer, audio, sample_rate)
+    else:
+        segments = diarizer._detect_speech(audio, sample_rate)
+    elapsed = time.perf_counter() - start
+    _, peak_alloc = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    
+    return {
+        'variant': variant,
+        'segments': len(segments),
+        'seconds': elapsed,
+        'seconds_per_hour': elapsed * 3600.0 / duration,
+        'peak_alloc_mb': peak_alloc / (1024.0 * 1024.0),
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--duration', type=float, default=600.0,
+                        help='Synthetic audio duration in seconds')
+    parser.add_argument('--variant', choices=['legacy', 'vectorized'],
+                        help='Run a single variant in-process')
+    args = parser.parse_args()
+    
+    if args.variant:
+        print(json.dumps(run_variant(args.variant, args.duration)))
+        return
+    
+    results = []
+    for variant in ('legacy', 'vectorized'):
+        out = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.bench_detect_speech',
+             '--duration', str(args.duration), '--variant', variant],
+            check=True, capture_output=True, text=True
+        )
+        results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    
+    print(f"{'variant':<12}{'segments':>10}{'s/hour':>10}{'alloc MB':>10}{'peak RSS MB':>14}")
+    for r in results:
+        print(f"{r['variant']:<12}{r['segments']:>10}{r['seconds_per_hour']:>10.2f}"
+              f"{r['peak_alloc_mb']:>10.1f}{r['peak_rss_mb']:>14.1f}")
+
+
+if __name__ == '__main__':
+    main()
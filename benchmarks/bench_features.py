@@ -0,0 +1,48 @@
+"""
+Benchmark per-segment MFCC extraction against the single-pass
+feature_mode='global' path.
+
+Usage:
+    python -m benchmarks.bench_features --duration 3600
+"""
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.synthetic import synthetic_speech
+from diarizer import Diarizer
+from diarizer.feature_extraction import extract_mfcc, extract_region_features
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--duration', type=float, default=3600.0,
+                        help='Synthetic audio duration in seconds')
+    args = parser.parse_args()
+    
+    sample_rate = 16000
+    audio = synthetic_speech(args.duration, sample_rate)
+    regions = Diarizer(sample_rate=sample_rate)._detect_speech(audio, sample_rate)
+    print(f"audio={args.duration:.0f}s segments={len(regions)}")
+    
+    start = time.perf_counter()
+    per_segment = np.array([np.mean(extract_mfcc(audio[s:e], sample_rate), axis=0)
+                            for s, e in regions])
+    segment_time = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    single_pass = extract_region_features(audio, sample_rate, regions)
+    global_time = time.perf_counter() - start
+    
+    static = slice(0, 13)
+    error = np.abs(per_segment[:, static] - single_pass[:, static]).mean()
+    print(f"{'mode':<10}{'seconds':>10}{'x realtime':>12}")
+    print(f"{'segment':<10}{segment_time:>10.2f}{args.duration / segment_time:>12.0f}")
+    print(f"{'global':<10}{global_time:>10.2f}{args.duration / global_time:>12.0f}")
+    print(f"speedup={segment_time / global_time:.2f}x "
+          f"mean abs difference of static MFCC means={error:.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Benchmark frame-level clustering in SpeakerDiarization for long inputs.
+
+Usage:
+    python -m benchmarks.bench_frame_clustering --hours 0.1,0.5,1,3,10
+"""
+import argparse
+import time
+from collections import Counter
+
+import numpy as np
+from sklearn.cluster import KMeans
+
+from diarization_core.speaker_diarization import SpeakerDiarization
+
+FRAMES_PER_SECOND = 100
+
+
+def synthetic_segments(hours, n_speakers=2, n_mfcc=13, segment_s=3.0, seed=0):
+    """Feature dictionaries shaped like FeatureExtractor output"""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(0, 3, (n_speakers, n_mfcc)).astype(np.float32)
+    frames_per_segment = int(segment_s * FRAMES_PER_SECOND)
+    n_segments = int(hours * 3600 / segment_s)
+    speakers = rng.integers(n_speakers, size=n_segments)
+    frames = centers[np.repeat(speakers, frames_per_segment)]
+    frames += rng.normal(0, 1, frames.shape).astype(np.float32)
+    segments = [{'features': block.T, 'start_time': i * segment_s, 'end_time': (i + 1) * segment_s}
+                for i, block in enumerate(np.split(frames, n_segments))]
+    return segments, speakers
+
+
+def legacy_diarize(segments, num_speakers=2):
+    """The previous implementation: full fit and a mask plus Counter per segment"""
+    frames = [s['features'].T for s in segments]
+    segment_indices = []
+    for i, f in enumerate(frames):
+        segment_indices.extend([i] * f.shape[0])
+    segment_indices = np.array(segment_indices)
+    labels = KMeans(n_clusters=num_speakers, random_state=42).fit(np.vstack(frames)).labels_
+    return [Counter(labels[segment_indices == i]).most_common(1)[0][0] for i in range(len(segments))]
+
+
+def agreement(a, b):
+    """Fraction of segments with matching labels, up to swapping two labels"""
+    a, b = np.asarray(a), np.asarray(b)
+    return max(np.mean(a == b), np.mean(a == 1 - b))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--hours', default='0.1,0.5,1,3,10',
+                        help='Comma-separated input lengths in hours')
+    parser.add_argument('--legacy-max-hours', type=float, default=1.0,
+                        help='Longest input also run through the previous implementation')
+    args = parser.parse_args()
+    
+    print(f"{'hours':>6}{'frames':>11}{'seconds':>9}{'legacy s':>10}{'accuracy':>10}")
+    for hours in [float(h) for h in args.hours.split(',')]:
+        segments, truth = synthetic_segments(hours)
+        n_frames = sum(s['features'].shape[1] for s in segments)
+        
+        start = time.perf_counter()
+        labeled = SpeakerDiarization(num_speakers=2).diarize([dict(s) for s in segments])
+        elapsed = time.perf_counter() - start
+        labels = [s['speaker'] for s in labeled]
+        
+        legacy = ''
+        if hours <= args.legacy_max_hours:
+            start = time.perf_counter()
+            legacy_diarize(segments)
+            legacy = f"{time.perf_counter() - start:.2f}"
+        
+        print(f"{hours:>6g}{n_frames:>11}{elapsed:>9.2f}{legacy:>10}{agreement(labels, truth):>10.3f}")
+
+
+if __name__ == '__main__':
+    main()
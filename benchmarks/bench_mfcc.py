@@ -0,0 +1,58 @@
+"""
+Compare the NumPy MFCC engine with librosa for equivalence and throughput.
+
+Usage:
+    python -m benchmarks.bench_mfcc --segments 2000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.synthetic import synthetic_speech
+from diarizer.feature_extraction import extract_mfcc_batch
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--segments', type=int, default=2000, help='Number of segments')
+    parser.add_argument('--min-length', type=float, default=0.3, help='Shortest segment in seconds')
+    parser.add_argument('--max-length', type=float, default=3.0, help='Longest segment in seconds')
+    args = parser.parse_args()
+    
+    sample_rate = 16000
+    rng = np.random.default_rng(0)
+    lengths = (rng.uniform(args.min_length, args.max_length, args.segments) * sample_rate).astype(int)
+    audio = synthetic_speech(lengths.sum() / sample_rate + 1, sample_rate, silence_ratio=0)
+    offsets = np.concatenate(([0], np.cumsum(lengths)))
+    segments = [audio[offsets[i]:offsets[i + 1]] for i in range(args.segments)]
+    audio_seconds = lengths.sum() / sample_rate
+    
+    timings = {}
+    outputs = {}
+    for backend in ('librosa', 'numpy'):
+        extract_mfcc_batch(segments[:8], sample_rate, backend=backend)  # warm up
+        start = time.perf_counter()
+        outputs[backend] = extract_mfcc_batch(segments, sample_rate, backend=backend)
+        timings[backend] = time.perf_counter() - start
+    
+    # Equivalence: worst absolute error relative to each coefficient's range
+    reference = np.vstack(outputs['librosa'])
+    candidate = np.vstack(outputs['numpy'])
+    scale = np.abs(reference).max(axis=0) + 1e-6
+    max_abs = np.abs(reference - candidate).max()
+    max_rel = (np.abs(reference - candidate) / scale).max()
+    
+    print(f"segments={args.segments} audio={audio_seconds:.0f}s dtype={candidate.dtype}")
+    print(f"{'backend':<10}{'seconds':>10}{'segments/s':>12}{'x realtime':>12}")
+    for backend, elapsed in timings.items():
+        print(f"{backend:<10}{elapsed:>10.2f}{args.segments / elapsed:>12.0f}{audio_seconds / elapsed:>12.0f}")
+    print(f"speedup={timings['librosa'] / timings['numpy']:.2f}x "
+          f"max abs error={max_abs:.2e} max relative error={max_rel:.2e}")
+    
+    if max_rel > 1e-3:
+        raise SystemExit("NumPy MFCCs differ from librosa beyond tolerance")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""
+Benchmark sharded parallel VAD against a sequential pass.
+
+Speech detection wall time is measured for each worker count on the same
+synthetic recording, and per-frame decisions are compared with the
+sequential ones. The worker pool is started before timing.
+
+Usage:
+    python -m benchmarks.bench_sharded_vad --duration 7200 --workers 2 4 8
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import webrtcvad
+
+from benchmarks.synthetic import synthetic_speech
+from diarizer.audio_utils import float_to_int16, vad_decisions
+from diarizer.sharded_vad import ShardedVAD
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--duration', type=float, default=7200.0,
+                        help='Synthetic audio duration in seconds')
+    parser.add_argument('--workers', type=int, nargs='+', default=[2, 4],
+                        help='Worker process counts to compare')
+    parser.add_argument('--shard', type=float, default=300.0,
+                        help='Shard length in seconds')
+    args = parser.parse_args()
+    
+    sample_rate = 16000
+    frame_size = int(sample_rate * 0.03)
+    rng = np.random.default_rng(0)
+    audio = synthetic_speech(args.duration, sample_rate)
+    audio += 0.003 * rng.standard_normal(len(audio)).astype(np.float32)
+    pcm = float_to_int16(audio)
+    del audio
+    
+    start = time.perf_counter()
+    reference = vad_decisions(webrtcvad.Vad(3), pcm, frame_size, sample_rate)
+    sequential = time.perf_counter() - start
+    
+    print(f"audio={args.duration:.0f}s frames={len(reference)} shard={args.shard:.0f}s cpus={os.cpu_count()}")
+    print(f"{'workers':<10}{'seconds':>10}{'speedup':>10}{'x realtime':>12}{'frames differ':>15}")
+    print(f"{'sequential':<10}{sequential:>10.2f}{1.0:>10.2f}{args.duration / sequential:>12.0f}{0:>15}")
+    for workers in args.workers:
+        sharded = ShardedVAD(3, workers, args.shard)
+        # Start the pool and import webrtcvad in every worker before timing
+        list(sharded._executor().map(abs, range(workers)))
+        sharded.decisions(pcm[:int(2.5 * args.shard * sample_rate)], frame_size, sample_rate)
+        
+        start = time.perf_counter()
+        decisions = sharded.decisions(pcm, frame_size, sample_rate)
+        elapsed = time.perf_counter() - start
+        sharded.shutdown()
+        
+        differ = int(np.count_nonzero(decisions != reference))
+        print(f"{workers:<10}{elapsed:>10.2f}{sequential / elapsed:>10.2f}"
+              f"{args.duration / elapsed:>12.0f}{differ:>15}")
+
+
+if __name__ == '__main__':
+    main()
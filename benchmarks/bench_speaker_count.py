@@ -0,0 +1,142 @@
+"""
+Benchmark automatic speaker-count estimation against fitting every
+candidate count separately, and report each criterion's accuracy.
+
+Timing uses well-separated Gaussian blobs. Accuracy is also measured on
+per-segment MFCC features of synthetic speech run through the Diarizer's
+VAD and feature extraction, which are far less Gaussian than the blobs.
+Short clips (a handful of segments per speaker) are a regression check
+for the default eigengap criterion: it must not merge their speakers into
+one, and the script exits non-zero if it does.
+
+Usage:
+    python -m benchmarks.bench_speaker_count --rows 2000 --speakers 4
+"""
+import argparse
+import tempfile
+import time
+
+import numpy as np
+from sklearn.cluster import KMeans
+from sklearn.metrics import silhouette_score
+
+from benchmarks.synthetic import synthetic_speech
+from diarizer import Diarizer
+from diarizer.speaker_count import CRITERIA, estimate_num_speakers
+
+
+def speech_features(duration_s, num_speakers, seed, sample_rate=16000):
+    """Per-segment features of synthetic speech, as Diarizer clusters them"""
+    audio = synthetic_speech(duration_s, sample_rate, num_speakers, seed=seed)
+    with tempfile.TemporaryDirectory() as workdir:
+        diarizer = Diarizer(sample_rate=sample_rate, temp_dir=workdir)
+        regions = diarizer._detect_speech(audio, sample_rate)
+        features, _ = diarizer._extract_features(audio, sample_rate, regions)
+    return np.array(features)
+
+
+def accuracy_table(title, cases, max_speakers):
+    """
+    Print each criterion's estimates for synthetic speech cases
+    
+    Args:
+        title: Table heading
+        cases: List of (true speakers, seed, feature matrix)
+        max_speakers: Largest candidate count
+    
+    Returns:
+        Dictionary mapping each criterion to its list of estimates
+    """
+    print(f"\n{title}")
+    print(f"{'speakers':>8}{'seed':>6}{'segments':>10}" + ''.join(f"{c:>12}" for c in CRITERIA))
+    estimates = {criterion: [] for criterion in CRITERIA}
+    for num_speakers, seed, features in cases:
+        row = []
+        for criterion in CRITERIA:
+            k, _ = estimate_num_speakers(features, max_speakers=max_speakers, criterion=criterion)
+            estimates[criterion].append(k)
+            row.append(k)
+        print(f"{num_speakers:>8}{seed:>6}{len(features):>10}" + ''.join(f"{k:>12}" for k in row))
+    truth = [num_speakers for num_speakers, _, _ in cases]
+    print(f"{'accuracy':>24}" + ''.join(
+        f"{np.mean([k == t for k, t in zip(estimates[c], truth)]):>12.0%}" for c in CRITERIA))
+    return estimates
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=2000,
+                        help='Number of feature rows (segments or frames)')
+    parser.add_argument('--dims', type=int, default=39,
+                        help='Feature dimensions')
+    parser.add_argument('--speakers', type=int, default=4,
+                        help='True number of speakers')
+    parser.add_argument('--max-speakers', type=int, default=8,
+                        help='Largest candidate count')
+    parser.add_argument('--speech-duration', type=float, default=600.0,
+                        help='Seconds of synthetic speech per accuracy case')
+    parser.add_argument('--speech-speakers', type=int, nargs='+', default=[2, 3, 4],
+                        help='Speaker counts of the synthetic speech cases')
+    parser.add_argument('--seeds', type=int, default=2,
+                        help='Synthetic speech recordings per speaker count')
+    parser.add_argument('--short-duration', type=float, default=60.0,
+                        help='Seconds of synthetic speech per short regression case')
+    parser.add_argument('--short-seeds', type=int, default=3,
+                        help='Short recordings per speaker count')
+    parser.add_argument('--min-short-accuracy', type=float, default=0.5,
+                        help='Eigengap accuracy required on the short cases')
+    args = parser.parse_args()
+    
+    # Speaker clusters with MFCC-like uneven scales per dimension
+    rng = np.random.default_rng(0)
+    centers = rng.normal(0, 4, (args.speakers, args.dims))
+    features = centers[rng.integers(args.speakers, size=args.rows)]
+    features = (features + rng.normal(0, 1, features.shape)) * np.linspace(1, 30, args.dims)
+    print(f"rows={args.rows} dims={args.dims} speakers={args.speakers}")
+    
+    start = time.perf_counter()
+    KMeans(n_clusters=args.speakers, n_init=10, random_state=0).fit(features)
+    single_time = time.perf_counter() - start
+    
+    # Baseline: an independent n_init=10 fit per candidate, scored by silhouette
+    start = time.perf_counter()
+    scores = {}
+    for k in range(2, args.max_speakers + 1):
+        labels = KMeans(n_clusters=k, n_init=10, random_state=0).fit_predict(features)
+        scores[k] = silhouette_score(features, labels)
+    naive_k = max(scores, key=scores.get)
+    naive_time = time.perf_counter() - start
+    
+    print(f"{'method':<18}{'speakers':>10}{'seconds':>10}{'x single fit':>14}")
+    print(f"{'single fit':<18}{args.speakers:>10}{single_time:>10.3f}{1:>14.1f}")
+    print(f"{'naive silhouette':<18}{naive_k:>10}{naive_time:>10.3f}{naive_time / single_time:>14.1f}")
+    for criterion in CRITERIA:
+        start = time.perf_counter()
+        k, _ = estimate_num_speakers(features, max_speakers=args.max_speakers, criterion=criterion)
+        elapsed = time.perf_counter() - start
+        print(f"{criterion:<18}{k:>10}{elapsed:>10.3f}{elapsed / single_time:>14.1f}")
+    
+    # Accuracy on synthetic speech features
+    cases = [(num_speakers, seed, speech_features(args.speech_duration, num_speakers, seed))
+             for num_speakers in args.speech_speakers for seed in range(args.seeds)]
+    accuracy_table(f"synthetic speech, {args.speech_duration:g}s per case", cases, args.max_speakers)
+    
+    # Short clips, plus single-speaker clips that must stay at one
+    short = [(num_speakers, seed, speech_features(args.short_duration, num_speakers, seed))
+             for num_speakers in [1] + args.speech_speakers for seed in range(args.short_seeds)]
+    estimates = accuracy_table(f"short synthetic speech, {args.short_duration:g}s per case",
+                               short, args.max_speakers)['eigengap']
+    
+    failures = []
+    for (num_speakers, seed, _), k in zip(short, estimates):
+        if (k == 1) != (num_speakers == 1):
+            failures.append(f"eigengap estimated {k} speakers for {num_speakers} (seed {seed})")
+    accuracy = np.mean([k == num_speakers for (num_speakers, _, _), k in zip(short, estimates)])
+    if accuracy < args.min_short_accuracy:
+        failures.append(f"eigengap accuracy {accuracy:.0%} on short clips, "
+                        f"below {args.min_short_accuracy:.0%}")
+    if failures:
+        raise SystemExit("\n".join(failures))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+"""
+Benchmark the streaming VAD collector against the ring-buffer recount.
+
+The legacy variant copies every frame into a dict-backed Frame and
+re-counts voiced frames over the whole padding window on each step, as
+stream_frame_generator and vad_collector did before running counts and
+memoryview frames. Both variants consume the same PCM chunks and must
+yield the same segments.
+
+Usage:
+    python -m benchmarks.bench_vad_collector --duration 600 --padding 300 1000
+"""
+import argparse
+import collections
+import time
+
+import webrtcvad
+
+from benchmarks.synthetic import synthetic_speech
+from diarizer.audio_utils import float_to_int16, stream_frame_generator, vad_segment_collector
+
+
+class LegacyFrame(object):
+    """Frame with a __dict__ and its own copy of the bytes"""
+    def __init__(self, bytes, timestamp, duration):
+        self.bytes = bytes
+        self.timestamp = timestamp
+        self.duration = duration
+
+
+def legacy_frames(frame_duration_ms, chunks, sample_rate):
+    """Per-frame copying stream_frame_generator used before memoryview frames"""
+    n = int(sample_rate * (frame_duration_ms / 1000.0) * 2)
+    timestamp = 0.0
+    duration = (float(n) / sample_rate) / 2.0
+    pending = bytearray()
+    for chunk in chunks:
+        pending += chunk
+        offset = 0
+        while offset + n <= len(pending):
+            yield LegacyFrame(bytes(pending[offset:offset + n]), timestamp, duration)
+            timestamp += duration
+            offset += n
+        del pending[:offset]
+
+
+def legacy_collector(sample_rate, frame_duration_ms, padding_duration_ms, vad, frames):
+    """vad_collector as it was, re-counting the ring buffer on every frame"""
+    num_padding_frames = int(padding_duration_ms / frame_duration_ms)
+    ring_buffer = collections.deque(maxlen=num_padding_frames)
+    triggered = False
+    
+    voiced_frames = []
+    for frame in frames:
+        is_speech = vad.is_speech(frame.bytes, sample_rate)
+        
+        if not triggered:
+            ring_buffer.append((frame, is_speech))
+            num_voiced = len([f for f, speech in ring_buffer if speech])
+            if num_voiced > 0.9 * ring_buffer.maxlen:
+                triggered = True
+                for f, s in ring_buffer:
+                    voiced_frames.append(f)
+                ring_buffer.clear()
+        else:
+            voiced_frames.append(frame)
+            ring_buffer.append((frame, is_speech))
+            num_unvoiced = len([f for f, speech in ring_buffer if not speech])
+            if num_unvoiced > 0.9 * ring_buffer.maxlen:
+                triggered = False
+                yield b''.join([f.bytes for f in voiced_frames])
+                ring_buffer.clear()
+                voiced_frames = []
+    
+    if voiced_frames:
+        yield b''.join([f.bytes for f in voiced_frames])
+
+
+class CountingVad:
+    """Stand-in VAD replaying precomputed decisions, to time the collector alone"""
+    def __init__(self, decisions):
+        self.decisions = iter(decisions)
+    
+    def is_speech(self, frame, sample_rate):
+        return next(self.decisions)
+
+
+def run(variant, chunks, sample_rate, padding_ms, vad):
+    """Collect all segments with one variant; returns (seconds, segments)"""
+    start = time.perf_counter()
+    if variant == 'legacy':
+        frames = legacy_frames(30, chunks, sample_rate)
+        segments = list(legacy_collector(sample_rate, 30, padding_ms, vad, frames))
+    else:
+        frames = stream_frame_generator(30, chunks, sample_rate)
+        segments = [pcm for _, _, pcm in vad_segment_collector(sample_rate, 30, padding_ms, vad, frames)]
+    return time.perf_counter() - start, segments
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--duration', type=float, default=600.0,
+                        help='Synthetic audio duration in seconds')
+    parser.add_argument('--padding', type=int, nargs='+', default=[300, 1000],
+                        help='Collector padding durations in milliseconds')
+    parser.add_argument('--chunk-ms', type=int, default=100,
+                        help='Size of the PCM chunks fed to the collector')
+    args = parser.parse_args()
+    
+    sample_rate = 16000
+    pcm = float_to_int16(synthetic_speech(args.duration, sample_rate)).tobytes()
+    chunk_bytes = int(args.chunk_ms * sample_rate / 1000) * 2
+    chunks = [pcm[i:i + chunk_bytes] for i in range(0, len(pcm), chunk_bytes)]
+    num_frames = len(pcm) // (int(sample_rate * 0.03) * 2)
+    
+    # Real VAD decisions, replayed so the collector overhead is measured alone
+    vad = webrtcvad.Vad(3)
+    decisions = [vad.is_speech(f.bytes, sample_rate) for f in stream_frame_generator(30, chunks, sample_rate)]
+    
+    print(f"audio={args.duration:.0f}s frames={num_frames} chunk={args.chunk_ms}ms")
+    print(f"{'padding ms':<12}{'variant':<12}{'segments':>10}{'seconds':>10}{'frames/s':>12}")
+    for padding_ms in args.padding:
+        timings = {}
+        outputs = {}
+        for variant in ('legacy', 'streaming'):
+            timings[variant], outputs[variant] = run(variant, chunks, sample_rate, padding_ms,
+                                                     CountingVad(decisions))
+            print(f"{padding_ms:<12}{variant:<12}{len(outputs[variant]):>10}"
+                  f"{timings[variant]:>10.2f}{num_frames / timings[variant]:>12.0f}")
+        print(f"{'':<12}speedup={timings['legacy'] / timings['streaming']:.2f}x "
+              f"identical={outputs['legacy'] == outputs['streaming']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Benchmark VoiceDetector.detect_voice_segments against per-frame processing.
+
+The legacy variant packs every frame with np.clip/astype/struct.pack and
+smooths decisions one frame at a time through VoiceDetector.is_speech, as
+detect_voice_segments did before it was vectorized. It is
+fed audio pre-scaled to the int16 range so both variants see the same
+samples and must find the same segments.
+
+Usage:
+    python -m benchmarks.bench_voice_detector --duration 600
+"""
+import argparse
+import struct
+import time
+
+import numpy as np
+
+from benchmarks.synthetic import synthetic_speech
+from diarization_core.voice_detector import VoiceDetector
+
+
+def legacy_detect_voice_segments(detector, audio_data):
+    """Per-frame implementation used before batch conversion and smoothing"""
+    num_frames = len(audio_data) // detector.frame_size
+    voice_segments = []
+    in_speech = False
+    speech_start = 0
+    
+    for i in range(num_frames):
+        frame = audio_data[i * detector.frame_size:(i + 1) * detector.frame_size]
+        frame = np.clip(frame, -32768, 32767)
+        frame_bytes = struct.pack("%dh" % len(frame), *frame.astype(np.int16))
+        is_speech = detector.is_speech(frame_bytes)
+        
+        if is_speech and not in_speech:
+            speech_start = i * detector.frame_duration_ms / 1000.0
+            in_speech = True
+        elif not is_speech and in_speech:
+            voice_segments.append((speech_start, i * detector.frame_duration_ms / 1000.0))
+            in_speech = False
+    
+    if in_speech:
+        voice_segments.append((speech_start, num_frames * detector.frame_duration_ms / 1000.0))
+    return voice_segments
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--duration', type=float, default=600.0,
+                        help='Synthetic audio duration in seconds')
+    args = parser.parse_args()
+    
+    sample_rate = 16000
+    audio = synthetic_speech(args.duration, sample_rate)
+    scaled = np.clip(audio * 32768.0, -32768, 32767)
+    
+    timings = {}
+    outputs = {}
+    for variant in ('legacy', 'batched'):
+        detector = VoiceDetector(sample_rate=sample_rate)
+        start = time.perf_counter()
+        if variant == 'legacy':
+            outputs[variant] = legacy_detect_voice_segments(detector, scaled)
+        else:
+            outputs[variant] = detector.detect_voice_segments(audio, sample_rate)
+        timings[variant] = time.perf_counter() - start
+    
+    num_frames = len(audio) // detector.frame_size
+    print(f"audio={args.duration:.0f}s frames={num_frames}")
+    print(f"{'variant':<10}{'segments':>10}{'seconds':>10}{'frames/s':>12}{'x realtime':>12}")
+    for variant, elapsed in timings.items():
+        print(f"{variant:<10}{len(outputs[variant]):>10}{elapsed:>10.2f}"
+              f"{num_frames / elapsed:>12.0f}{args.duration / elapsed:>12.0f}")
+    print(f"speedup={timings['legacy'] / timings['batched']:.2f}x "
+          f"identical={outputs['legacy'] == outputs['batched']}")
+
+
+if __name__ == '__main__':
+    main()
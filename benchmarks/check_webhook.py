@@ -0,0 +1,104 @@
+"""
+Check job completion webhooks against a local stub receiver.
+
+An http.server stub on 127.0.0.1 (allowed through webhook_hosts) receives
+the callback of a job run on a one-worker DiarizationEngine, and the
+payload is checked against the job's final state. The script also checks
+that, without an allowlist, loopback and private callback URLs are
+refused. Exits non-zero on any failure.
+
+Usage:
+    python -m benchmarks.check_webhook --duration 20
+"""
+import argparse
+import json
+import os
+import queue
+import shutil
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from benchmarks.synthetic import write_synthetic_audio
+from diarizer import DiarizationEngine, JobManager
+from diarizer.jobs import webhook_allowed
+
+
+def start_stub():
+    """
+    Start a webhook receiver on a free local port
+    
+    Returns:
+        Tuple (server, queue receiving (path, decoded JSON body) pairs)
+    """
+    received = queue.Queue()
+    
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            received.put((self.path, json.loads(body)))
+            self.send_response(204)
+            self.end_headers()
+        
+        def log_message(self, format, *args):
+            pass
+    
+    server = HTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, received
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--duration', type=float, default=20.0, help='Seconds of audio in the job')
+    parser.add_argument('--timeout', type=float, default=120.0,
+                        help='Seconds to wait for the callback')
+    args = parser.parse_args()
+    
+    failures = []
+    
+    # Without an allowlist, internal addresses are refused
+    for url in ('http://127.0.0.1:8080/hook', 'http://10.0.0.1/hook', 'http://169.254.169.254/latest',
+                'http://[::1]/hook', 'ftp://example.com/hook'):
+        if webhook_allowed(url):
+            failures.append(f"{url} was allowed without an allowlist")
+    
+    server, received = start_stub()
+    callback_url = f"http://127.0.0.1:{server.server_port}/hook"
+    engine = DiarizationEngine(max_workers=1)
+    index_dir = tempfile.mkdtemp()
+    jobs = JobManager(engine, os.path.join(index_dir, 'jobs.sqlite'), webhook_hosts=['127.0.0.1'])
+    
+    # The job removes its file and directory when done
+    path = os.path.join(tempfile.mkdtemp(), 'webhook.wav')
+    write_synthetic_audio(path, args.duration, 16000, 2, 0.3, 0)
+    job_id = jobs.submit(path, callback_url=callback_url)
+    
+    try:
+        hook_path, payload = received.get(timeout=args.timeout)
+    except queue.Empty:
+        failures.append(f"No callback within {args.timeout:g}s")
+    else:
+        job = jobs.get(job_id)
+        print(f"callback {hook_path}: job {payload.get('job_id')} {payload.get('status')}")
+        if hook_path != '/hook':
+            failures.append(f"Callback sent to {hook_path}")
+        if payload != json.loads(json.dumps(job)):
+            failures.append("Callback payload differs from the job's final state")
+        if payload.get('status') != 'completed' or not (payload.get('result') or {}).get('success'):
+            failures.append(f"Job did not complete: {payload.get('error')}")
+        elif payload['result']['num_speakers'] < 1:
+            failures.append("Callback result has no speakers")
+    
+    server.shutdown()
+    engine.shutdown()
+    shutil.rmtree(os.path.dirname(path), ignore_errors=True)
+    shutil.rmtree(index_dir, ignore_errors=True)
+    
+    if failures:
+        raise SystemExit("\n".join(failures))
+    print("webhook OK")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,308 @@
+"""
+Stage-by-stage benchmark suite for both diarization pipelines.
+
+A deterministic synthetic corpus (one file per duration and speaker
+count) is generated in a temporary directory. Each stage of the Diarizer
+pipeline (decode, VAD, features, clustering, session output, WAV
+rendering) and of the diarization_core pipeline (decode, VAD, MFCC,
+clustering, segment writing) is timed separately and reported as
+real-time factor, throughput and peak memory. Every corpus file and
+pipeline runs in its own subprocess so peak RSS is isolated; stages are
+timed first and then re-run under tracemalloc for their peak allocation,
+so tracing does not skew the timings.
+
+Results are printed as a table and written as JSON. Pass --compare with
+the JSON of an earlier run to print per-stage time ratios.
+
+Usage:
+    python -m benchmarks.suite --durations 60 600 --speakers 2 4 --output bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from benchmarks.synthetic import write_synthetic_audio
+
+PIPELINES = ('diarizer', 'diarization_core')
+
+
+def diarizer_stages(path, sample_rate, num_speakers, workdir):
+    """
+    Stages of Diarizer.process_audio_file, in order
+    
+    Returns:
+        Tuple (list of (name, callable) stages, callable returning a
+        summary of the result)
+    """
+    from diarizer import Diarizer
+    from diarizer.rendering import render_speaker_file
+    from utils.audio_utils import load_audio
+    
+    diarizer = Diarizer(sample_rate=sample_rate, max_speakers=num_speakers, temp_dir=workdir)
+    state = {}
+    
+    def decode():
+        state['y'], state['sr'] = load_audio(path, sr=sample_rate, mono=True)
+    
+    def vad():
+        state['regions'] = diarizer._detect_speech(state['y'], state['sr'])
+    
+    def features():
+        features, state['kept'] = diarizer._extract_features(state['y'], state['sr'], state['regions'])
+        state['features'] = np.array(features)
+    
+    def clustering():
+        state['labels'] = diarizer._identify_speakers(state['features'], diarizer.max_speakers,
+                                                      diarizer.speaker_count)
+    
+    def output():
+        state['result'] = diarizer._generate_speaker_segments(
+            state['labels'], state['kept'], state['sr'], path, state['features'])
+    
+    def render():
+        session_path = diarizer.session_store.path(state['result']['session_id'])
+        for speaker_id in state['result']['speakers']:
+            render_speaker_file(session_path, speaker_id, 'wav')
+    
+    def summary():
+        return {'segments': len(state['kept']), 'speakers': state['result']['num_speakers']}
+    
+    stages = [('decode', decode), ('vad', vad), ('features', features),
+              ('clustering', clustering), ('output', output), ('render', render)]
+    return stages, summary
+
+
+def core_stages(path, sample_rate, num_speakers, workdir):
+    """
+    Stages of the diarization_core pipeline, in order
+    
+    Returns:
+        Tuple (list of (name, callable) stages, callable returning a
+        summary of the result)
+    """
+    from diarization_core.voice_detector import VoiceDetector
+    from diarization_core.feature_extractor import FeatureExtractor
+    from diarization_core.speaker_diarization import SpeakerDiarization
+    from diarization_core.segmenter import AudioSegmenter
+    from utils.audio_utils import load_audio
+    
+    detector = VoiceDetector(sample_rate=sample_rate)
+    extractor = FeatureExtractor(sample_rate=sample_rate)
+    diarization = SpeakerDiarization(num_speakers=num_speakers)
+    segmenter = AudioSegmenter(output_dir=workdir, sample_rate=sample_rate)
+    state = {}
+    
+    def decode():
+        state['y'], state['sr'] = load_audio(path, sr=sample_rate, mmap=False)
+    
+    def vad():
+        state['segments'] = detector.detect_voice_segments(state['y'], state['sr'])
+    
+    def features():
+        state['features'] = extractor.extract_features_from_segments(state['y'], state['segments'], state['sr'])
+    
+    def clustering():
+        state['labeled'] = diarization.diarize(state['features'])
+    
+    def output():
+        state['files'] = segmenter.segment_audio(path, state['labeled'])
+    
+    def summary():
+        return {'segments': len(state['labeled']), 'speakers': len(state['files'])}
+    
+    stages = [('decode', decode), ('vad', vad), ('features', features),
+              ('clustering', clustering), ('output', output)]
+    return stages, summary
+
+
+def measure(stage, audio_seconds, seconds, peak_alloc):
+    """Report entry for one stage"""
+    return {
+        'stage': stage,
+        'seconds': seconds,
+        'rtf': seconds / audio_seconds,
+        'x_realtime': audio_seconds / seconds if seconds > 0 else None,
+        'peak_alloc_mb': None if peak_alloc is None else peak_alloc / (1024.0 * 1024.0),
+    }
+
+
+def run_single(spec):
+    """
+    Benchmark one pipeline on one corpus file in this process
+    
+    Args:
+        spec: Dictionary with pipeline, path, warmup_path, duration_s,
+            sample_rate, num_speakers and trace_memory
+    
+    Returns:
+        Result dictionary for the JSON report
+    """
+    build = diarizer_stages if spec['pipeline'] == 'diarizer' else core_stages
+    audio_seconds = spec['duration_s']
+    
+    # Lazy imports and first-call initialization are not part of any stage
+    with tempfile.TemporaryDirectory() as workdir:
+        stages, _ = build(spec['warmup_path'], spec['sample_rate'], spec['num_speakers'], workdir)
+        for _, stage in stages:
+            stage()
+    
+    # Timing pass
+    with tempfile.TemporaryDirectory() as workdir:
+        stages, summary = build(spec['path'], spec['sample_rate'], spec['num_speakers'], workdir)
+        timings = []
+        for name, stage in stages:
+            start = time.perf_counter()
+            stage()
+            timings.append(time.perf_counter() - start)
+        result = summary()
+    
+    # Memory pass, on fresh pipeline objects
+    peaks = [None] * len(stages)
+    if spec['trace_memory']:
+        with tempfile.TemporaryDirectory() as workdir:
+            stages, _ = build(spec['path'], spec['sample_rate'], spec['num_speakers'], workdir)
+            tracemalloc.start()
+            for i, (_, stage) in enumerate(stages):
+                tracemalloc.reset_peak()
+                stage()
+                peaks[i] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+    
+    report = [measure(name, audio_seconds, seconds, peak)
+              for (name, _), seconds, peak in zip(stages, timings, peaks)]
+    total = measure('total', audio_seconds, sum(timings),
+                    max(peaks) if spec['trace_memory'] else None)
+    return {
+        'pipeline': spec['pipeline'],
+        'corpus': {key: spec[key] for key in ('duration_s', 'num_speakers', 'silence_ratio',
+                                              'source_rate', 'format')},
+        'stages': report,
+        'total': total,
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0,
+        'result': result,
+    }
+
+
+def run_key(run):
+    """Identify a run across reports"""
+    corpus = run['corpus']
+    return (run['pipeline'], corpus['duration_s'], corpus['num_speakers'], corpus['silence_ratio'])
+
+
+def print_report(runs, baseline=None):
+    """Print the results, with time ratios against a baseline report if given"""
+    previous = {run_key(run): run for run in baseline['runs']} if baseline else {}
+    header = f"{'pipeline':<18}{'audio s':>8}{'spk':>5}{'stage':>12}{'seconds':>10}{'RTF':>9}{'x realtime':>12}{'alloc MB':>10}"
+    print(header + (f"{'vs base':>9}" if baseline else ''))
+    for run in runs:
+        old = previous.get(run_key(run))
+        old_stages = {s['stage']: s for s in old['stages'] + [old['total']]} if old else {}
+        for entry in run['stages'] + [run['total']]:
+            alloc = entry['peak_alloc_mb']
+            line = (f"{run['pipeline']:<18}{run['corpus']['duration_s']:>8g}{run['corpus']['num_speakers']:>5}"
+                    f"{entry['stage']:>12}{entry['seconds']:>10.3f}{entry['rtf']:>9.4f}"
+                    f"{entry['x_realtime'] or float('inf'):>12.0f}"
+                    f"{'' if alloc is None else format(alloc, '.1f'):>10}")
+            if baseline:
+                base = old_stages.get(entry['stage'])
+                ratio = entry['seconds'] / base['seconds'] if base and base['seconds'] > 0 else None
+                line += f"{'' if ratio is None else format(ratio, '.2f') + 'x':>9}"
+            print(line)
+        print(f"{'':<18}peak RSS {run['peak_rss_mb']:.0f} MB, {run['result']['segments']} segments, "
+              f"{run['result']['speakers']} speakers")
+
+
+def git_revision():
+    """Current commit of the working tree, if available"""
+    try:
+        out = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--durations', type=float, nargs='+', default=[60.0, 600.0],
+                        help='Corpus file durations in seconds')
+    parser.add_argument('--speakers', type=int, nargs='+', default=[2],
+                        help='Speaker counts')
+    parser.add_argument('--silence', type=float, default=0.3,
+                        help='Approximate fraction of silence')
+    parser.add_argument('--source-rate', type=int, default=44100,
+                        help='Sample rate of the corpus files (resampled to 16 kHz on decode)')
+    parser.add_argument('--format', choices=['wav', 'flac'], default='wav',
+                        help='Corpus file format')
+    parser.add_argument('--pipelines', nargs='+', choices=PIPELINES, default=list(PIPELINES),
+                        help='Pipelines to benchmark')
+    parser.add_argument('--seed', type=int, default=0, help='Corpus random seed')
+    parser.add_argument('--no-memory', action='store_true',
+                        help='Skip the tracemalloc pass')
+    parser.add_argument('--output', default='benchmark-results.json',
+                        help='JSON report path')
+    parser.add_argument('--compare', help='JSON report of an earlier run to compare with')
+    parser.add_argument('--single', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.single:
+        print(json.dumps(run_single(json.loads(args.single))))
+        return
+    
+    runs = []
+    with tempfile.TemporaryDirectory() as corpus_dir:
+        warmup_path = os.path.join(corpus_dir, f"warmup.{args.format}")
+        write_synthetic_audio(warmup_path, 10.0, args.source_rate, max(args.speakers),
+                              args.silence, args.seed + 1)
+        for duration in args.durations:
+            for num_speakers in args.speakers:
+                path = os.path.join(corpus_dir, f"synthetic-{duration:g}s-{num_speakers}spk.{args.format}")
+                write_synthetic_audio(path, duration, args.source_rate, num_speakers,
+                                      args.silence, args.seed)
+                for pipeline in args.pipelines:
+                    spec = {
+                        'pipeline': pipeline, 'path': path, 'warmup_path': warmup_path,
+                        'duration_s': duration,
+                        'num_speakers': num_speakers, 'silence_ratio': args.silence,
+                        'source_rate': args.source_rate, 'format': args.format,
+                        'sample_rate': 16000, 'trace_memory': not args.no_memory,
+                    }
+                    out = subprocess.run(
+                        [sys.executable, '-m', 'benchmarks.suite', '--single', json.dumps(spec)],
+                        check=True, capture_output=True, text=True
+                    )
+                    runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'args': {key: value for key, value in vars(args).items() if key not in ('single', 'compare')},
+        },
+        'runs': runs,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(runs, baseline)
+    print(f"Wrote {args.output}")
+
+
+if __name__ == '__main__':
+    main()
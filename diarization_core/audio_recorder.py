@@ -168,10 +168,10 @@ class AudioRecorder:
         Returns:
             tuple: (samples as numpy array, sample rate)
         """
-        import librosa
+        from utils.audio_utils import load_audio
         try:
-            # Load the audio file
-            samples, sample_rate = librosa.load(filename, sr=None)
+            # Load the audio file at its native rate (no resampling)
+            samples, sample_rate = load_audio(filename, sr=None, mmap=False)
             return samples, sample_rate
         except Exception as e:
             logger.error(f"Error loading audio file: {str(e)}")
@@ -1,6 +1,7 @@
 import numpy as np
 import librosa
 import logging
+from diarizer import mfcc as numpy_mfcc
 
 logger = logging.getLogger(__name__)
 
@@ -8,7 +9,8 @@ class FeatureExtractor:
     """
     Class for extracting MFCC features from audio for diarization.
     """
-    def __init__(self, sample_rate=16000, n_mfcc=13, n_mels=40, n_fft=512, hop_length=160):
+    def __init__(self, sample_rate=16000, n_mfcc=13, n_mels=40, n_fft=512, hop_length=160,
+                 backend='librosa'):
         """
         Initialize the feature extractor.
         
@@ -18,15 +20,21 @@ class FeatureExtractor:
             n_mels (int): Number of Mel bands to generate
             n_fft (int): Length of the FFT window
             hop_length (int): Number of samples between successive frames
+            backend (str): MFCC implementation, 'librosa' or 'numpy'
         """
+        if backend not in ('librosa', 'numpy'):
+            raise ValueError(f"Unsupported MFCC backend: {backend}")
+        
         self.sample_rate = sample_rate
         self.n_mfcc = n_mfcc
         self.n_mels = n_mels
         self.n_fft = n_fft
         self.hop_length = hop_length
+        self.backend = backend
         
         logger.debug(f"Initialized feature extractor with {n_mfcc} MFCCs, "
-                     f"{n_mels} Mel bands, FFT window {n_fft}, hop length {hop_length}")
+                     f"{n_mels} Mel bands, FFT window {n_fft}, hop length {hop_length}, "
+                     f"{backend} backend")
     
     def extract_mfcc(self, audio_data, sample_rate=None):
         """
@@ -48,22 +56,35 @@ class FeatureExtractor:
             audio_data = librosa.resample(audio_data, orig_sr=sample_rate, target_sr=self.sample_rate)
             
         try:
-            # Extract MFCCs
-            mfccs = librosa.feature.mfcc(
-                y=audio_data,
-                sr=self.sample_rate,
-                n_mfcc=self.n_mfcc,
-                n_fft=self.n_fft,
-                hop_length=self.hop_length,
-                n_mels=self.n_mels
-            )
-            
-            # Add delta features
-            delta_mfccs = librosa.feature.delta(mfccs)
-            delta2_mfccs = librosa.feature.delta(mfccs, order=2)
-            
-            # Combine features
-            features = np.vstack([mfccs, delta_mfccs, delta2_mfccs])
+            if self.backend == 'numpy':
+                # MFCCs and deltas from the cached-filterbank NumPy engine
+                features = numpy_mfcc.mfcc(
+                    audio_data,
+                    self.sample_rate,
+                    n_mfcc=self.n_mfcc,
+                    n_fft=self.n_fft,
+                    hop_length=self.hop_length,
+                    n_mels=self.n_mels
+                ).T
+                if features.size == 0:
+                    raise ValueError("Audio too short for delta features")
+            else:
+                # Extract MFCCs
+                mfccs = librosa.feature.mfcc(
+                    y=audio_data,
+                    sr=self.sample_rate,
+                    n_mfcc=self.n_mfcc,
+                    n_fft=self.n_fft,
+                    hop_length=self.hop_length,
+                    n_mels=self.n_mels
+                )
+                
+                # Add delta features
+                delta_mfccs = librosa.feature.delta(mfccs)
+                delta2_mfccs = librosa.feature.delta(mfccs, order=2)
+                
+                # Combine features
+                features = np.vstack([mfccs, delta_mfccs, delta2_mfccs])
             
             # Normalize features
             features = (features - np.mean(features, axis=1, keepdims=True)) / \
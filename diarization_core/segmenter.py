@@ -1,10 +1,10 @@
 import os
 import wave
 import numpy as np
-import librosa
 import soundfile as sf
 import logging
 import uuid
+from utils.audio_utils import load_audio
 
 logger = logging.getLogger(__name__)
 
@@ -41,14 +41,9 @@ class AudioSegmenter:
             dict: Dictionary mapping speaker IDs to lists of segment file paths
         """
         try:
-            # Load the audio file
-            y, sr = librosa.load(audio_file, sr=None)
-            
-            # Resample if necessary
-            if sr != self.sample_rate:
-                logger.info(f"Resampling from {sr}Hz to {self.sample_rate}Hz")
-                y = librosa.resample(y, orig_sr=sr, target_sr=self.sample_rate)
-                sr = self.sample_rate
+            # Load the audio file, resampling only if necessary (PCM WAVs
+            # at the target rate are memory-mapped)
+            y, sr = load_audio(audio_file, sr=self.sample_rate)
                 
             # Group segments by speaker
             speaker_segments = {}
@@ -115,7 +110,7 @@ class AudioSegmenter:
             combined_audio = np.array([])
             
             for segment in segments:
-                segment_audio, sr = librosa.load(segment['file'], sr=self.sample_rate)
+                segment_audio, sr = load_audio(segment['file'], sr=self.sample_rate, mmap=False)
                 combined_audio = np.append(combined_audio, segment_audio)
                 
             # Generate output filename
@@ -1,7 +1,8 @@
 import numpy as np
 from sklearn.cluster import KMeans
 import logging
-from collections import Counter
+from diarizer.speaker_count import CRITERIA, estimate_num_speakers
+from diarizer.clustering import CLUSTERING_BACKENDS, cluster
 
 logger = logging.getLogger(__name__)
 
@@ -9,21 +10,41 @@ class SpeakerDiarization:
     """
     Class for performing speaker diarization using MFCC features.
     """
-    def __init__(self, num_speakers=2, method='kmeans'):
+    def __init__(self, num_speakers=2, method='kmeans', max_speakers=8, criterion='eigengap',
+                 max_fit_frames=20000):
         """
         Initialize the speaker diarization system.
         
         Args:
-            num_speakers (int): Number of speakers to identify
-            method (str): Clustering method ('kmeans', 'agglomerative', etc.)
+            num_speakers (int or str): Number of speakers to identify, or
+                'auto' to estimate it
+            method (str): Clustering method: 'kmeans', or a backend from
+                diarizer.clustering ('minibatch', 'agglomerative', 'numpy',
+                'auto')
+            max_speakers (int): Upper bound on the estimate in 'auto' mode
+            criterion (str): Model-selection criterion for 'auto' mode
+                ('eigengap' or 'silhouette')
+            max_fit_frames (int): Frames used to fit the clustering; longer
+                inputs are fitted on a sample stratified by segment and
+                all frames are then labelled in one batch
         """
         self.num_speakers = num_speakers
         self.method = method
+        self.max_speakers = max_speakers
+        self.criterion = criterion
+        self.max_fit_frames = max_fit_frames
         
-        if method == 'kmeans':
+        if method not in CLUSTERING_BACKENDS:
+            raise ValueError(f"Unsupported diarization method: {method}")
+        if num_speakers == 'auto' and criterion not in CRITERIA:
+            raise ValueError(f"Unsupported speaker count criterion: {criterion}")
+        
+        # 'kmeans' keeps its single-fit estimator; other methods use the
+        # shared clustering backends
+        if method == 'kmeans' and num_speakers != 'auto':
             self.model = KMeans(n_clusters=num_speakers, random_state=42)
         else:
-            raise ValueError(f"Unsupported diarization method: {method}")
+            self.model = None
             
         logger.debug(f"Initialized speaker diarization with {num_speakers} speakers using {method}")
     
@@ -37,26 +58,70 @@ class SpeakerDiarization:
         Returns:
             tuple: (feature matrix, segment indices)
         """
-        # Extract segment indices and flatten features
-        segment_indices = []
-        all_features = []
+        # Transpose to get frames as rows, features as columns
+        frames = [feature_dict['features'].T for feature_dict in features_list]
         
-        for i, feature_dict in enumerate(features_list):
-            # Transpose to get frames as rows, features as columns
-            frames = feature_dict['features'].T
-            
-            # Add to the feature matrix
-            all_features.append(frames)
-            
-            # Keep track of which segment each frame belongs to
-            segment_indices.extend([i] * frames.shape[0])
-            
-        # Combine all features
-        feature_matrix = np.vstack(all_features)
-        segment_indices = np.array(segment_indices)
+        # Combine all features, keeping track of which segment each frame belongs to
+        feature_matrix = np.vstack(frames)
+        segment_indices = np.repeat(np.arange(len(frames)), [len(f) for f in frames])
         
         return feature_matrix, segment_indices
     
+    def _sample_frames(self, segment_indices):
+        """
+        Pick a bounded, segment-stratified sample of frames for fitting.
+        
+        Every stride-th frame of each segment is kept, counting from the
+        segment's first frame, so every segment contributes in proportion
+        to its length and at least one frame.
+        
+        Args:
+            segment_indices (numpy.ndarray): Segment index for each frame
+            
+        Returns:
+            numpy.ndarray: Indices of the sampled frames
+        """
+        n_frames = len(segment_indices)
+        if n_frames <= self.max_fit_frames:
+            return np.arange(n_frames)
+        
+        stride = -(-n_frames // self.max_fit_frames)
+        
+        # Position of each frame within its segment (frames are grouped by segment)
+        run_starts = np.flatnonzero(np.diff(segment_indices, prepend=-1))
+        run_lengths = np.diff(np.append(run_starts, n_frames))
+        positions = np.arange(n_frames) - np.repeat(run_starts, run_lengths)
+        return np.flatnonzero(positions % stride == 0)
+    
+    @staticmethod
+    def _predict_nearest(feature_matrix, centroids, scale=None, chunk_size=65536):
+        """
+        Label frames with their nearest centroid, in fixed-size batches.
+        
+        Args:
+            feature_matrix (numpy.ndarray): Frames as rows
+            centroids (numpy.ndarray): Cluster centroids as rows
+            scale (numpy.ndarray): Optional per-feature weights applied
+                before measuring distances
+            chunk_size (int): Frames per batch
+            
+        Returns:
+            numpy.ndarray: Cluster label for each frame
+        """
+        if scale is not None:
+            centroids = centroids * scale
+        centroid_norms = (centroids ** 2).sum(axis=1)
+        labels = np.empty(len(feature_matrix), dtype=int)
+        for start in range(0, len(feature_matrix), chunk_size):
+            chunk = feature_matrix[start:start + chunk_size]
+            if scale is not None:
+                chunk = chunk * scale
+            # |x - c|^2 up to the per-row constant |x|^2
+            labels[start:start + chunk_size] = np.argmin(
+                centroid_norms - 2 * (chunk @ centroids.T), axis=1
+            )
+        return labels
+    
     def _assign_speakers_to_segments(self, cluster_labels, segment_indices, features_list):
         """
         Assign speakers to segments based on clustering.
@@ -69,19 +134,16 @@ class SpeakerDiarization:
         Returns:
             list: Feature list with speaker labels added
         """
-        # Count speaker occurrences for each segment
-        for i in range(len(features_list)):
-            # Find all frames belonging to this segment
-            segment_frames = (segment_indices == i)
-            
-            # Count occurrences of each speaker in this segment
-            speaker_counts = Counter(cluster_labels[segment_frames])
-            
-            # Assign the most common speaker
-            most_common_speaker = speaker_counts.most_common(1)[0][0]
-            
-            # Add to the feature dictionary
-            features_list[i]['speaker'] = most_common_speaker
+        # Count speaker occurrences for every (segment, speaker) pair at once
+        n_labels = int(cluster_labels.max()) + 1
+        votes = np.bincount(
+            segment_indices * n_labels + cluster_labels,
+            minlength=len(features_list) * n_labels
+        ).reshape(len(features_list), n_labels)
+        
+        # Assign the most common speaker (lowest label on ties)
+        for feature_dict, speaker in zip(features_list, votes.argmax(axis=1)):
+            feature_dict['speaker'] = speaker
             
         return features_list
     
@@ -103,12 +165,41 @@ class SpeakerDiarization:
             # Prepare features for clustering
             feature_matrix, segment_indices = self._prepare_features_for_clustering(features_list)
             
-            # Fit the clustering model
-            logger.info(f"Clustering {feature_matrix.shape[0]} frames with {self.num_speakers} speakers")
-            self.model.fit(feature_matrix)
+            # Fit on a bounded sample of frames
+            sample = self._sample_frames(segment_indices)
+            fit_matrix = feature_matrix[sample]
+            scale = None
             
-            # Get cluster labels for each frame
-            cluster_labels = self.model.labels_
+            if self.num_speakers == 'auto':
+                # Estimate the speaker count while clustering
+                logger.info(f"Clustering {len(sample)} of {len(feature_matrix)} frames with up to {self.max_speakers} speakers")
+                n_speakers, sample_labels = estimate_num_speakers(
+                    fit_matrix, max_speakers=self.max_speakers, criterion=self.criterion
+                )
+                logger.info(f"Estimated {n_speakers} speakers ({self.criterion})")
+                
+                # The estimate clusters standardized features
+                std = fit_matrix.std(axis=0)
+                scale = 1.0 / np.where(std > 0, std, 1.0)
+            elif self.model is not None:
+                # Fit the clustering model
+                logger.info(f"Clustering {len(sample)} of {len(feature_matrix)} frames with {self.num_speakers} speakers")
+                self.model.fit(fit_matrix)
+                sample_labels = self.model.labels_
+            else:
+                logger.info(f"Clustering {len(sample)} of {len(feature_matrix)} frames with {self.num_speakers} speakers using {self.method}")
+                sample_labels = cluster(fit_matrix, self.num_speakers, self.method, random_state=42)
+            
+            # Label all frames in one batch
+            if len(sample) == len(feature_matrix):
+                cluster_labels = np.asarray(sample_labels)
+            elif self.model is not None:
+                cluster_labels = self.model.predict(feature_matrix)
+            else:
+                labels_present = np.unique(sample_labels)
+                centroids = np.array([fit_matrix[sample_labels == label].mean(axis=0)
+                                      for label in labels_present])
+                cluster_labels = labels_present[self._predict_nearest(feature_matrix, centroids, scale)]
             
             # Assign speakers to segments
             labeled_segments = self._assign_speakers_to_segments(
@@ -1,9 +1,9 @@
 import numpy as np
 import librosa
 import webrtcvad
-import struct
 import logging
 from collections import deque
+from diarizer.audio_utils import energy_gate, float_to_int16, smooth_decisions, vad_decisions, voiced_runs
 
 logger = logging.getLogger(__name__)
 
@@ -11,7 +11,8 @@ class VoiceDetector:
     """
     Class for detecting human voice segments in audio using WebRTC VAD.
     """
-    def __init__(self, sample_rate=16000, frame_duration_ms=30, aggressiveness=3):
+    def __init__(self, sample_rate=16000, frame_duration_ms=30, aggressiveness=3,
+                 energy_gate_db=None):
         """
         Initialize the voice detector.
         
@@ -19,9 +20,16 @@ class VoiceDetector:
             sample_rate (int): Audio sample rate in Hz
             frame_duration_ms (int): Duration of each frame in milliseconds
             aggressiveness (int): VAD aggressiveness mode (0-3)
+            energy_gate_db (float): Frames within this many dB of the
+                adaptive noise floor are non-speech without running the
+                VAD; None runs the VAD on every frame
         """
         self.sample_rate = sample_rate
         self.frame_duration_ms = frame_duration_ms
+        self.energy_gate_db = energy_gate_db
+        
+        # Frames and skipped VAD calls of the last detect_voice_segments call
+        self.last_stats = {}
         
         # Initialize WebRTC VAD
         self.vad = webrtcvad.Vad(aggressiveness)
@@ -37,6 +45,24 @@ class VoiceDetector:
                      f"frame duration {frame_duration_ms}ms, "
                      f"aggressiveness {aggressiveness}")
     
+    def _prepare_pcm(self, audio_data):
+        """
+        Convert audio to contiguous int16 PCM once, for slicing into frames.
+        
+        Float audio is expected in [-1, 1] (as returned by librosa) and is
+        scaled to the int16 range; int16 audio is used as is.
+        
+        Args:
+            audio_data (numpy.ndarray): Audio samples
+            
+        Returns:
+            numpy.ndarray: int16 samples
+        """
+        audio_data = np.asarray(audio_data)
+        if audio_data.dtype != np.int16:
+            audio_data = float_to_int16(audio_data)
+        return np.ascontiguousarray(audio_data)
+    
     def _prepare_frame(self, frame):
         """
         Prepare a frame for WebRTC VAD.
@@ -45,7 +71,7 @@ class VoiceDetector:
             frame (numpy.ndarray): Audio frame data
             
         Returns:
-            bytes: Frame data as bytes in the format required by WebRTC VAD
+            memoryview: Frame data as int16 PCM bytes, as required by WebRTC VAD
         """
         # Ensure the frame is the right length
         if len(frame) != self.frame_size:
@@ -57,18 +83,14 @@ class VoiceDetector:
             else:
                 frame = frame[:self.frame_size]
         
-        # Ensure the values are within the valid range for int16
-        frame = np.clip(frame, -32768, 32767)
-        
-        # Convert to int16 bytes
-        return struct.pack("%dh" % len(frame), *frame.astype(np.int16))
+        return memoryview(self._prepare_pcm(frame)).cast('B')
     
     def is_speech(self, frame):
         """
         Determine if a frame contains speech.
         
         Args:
-            frame: Audio frame data (numpy array or bytes)
+            frame: Audio frame data (numpy array, or int16 PCM bytes/memoryview)
             
         Returns:
             bool: True if the frame contains speech, False otherwise
@@ -113,33 +135,30 @@ class VoiceDetector:
             audio_data = librosa.resample(audio_data, orig_sr=sample_rate, target_sr=self.sample_rate)
             sample_rate = self.sample_rate
         
-        # Split into frames
-        num_frames = len(audio_data) // self.frame_size
-        voice_segments = []
-        in_speech = False
-        speech_start = 0
+        # Convert the whole signal once and run VAD over zero-copy frames,
+        # skipping frames the energy gate marks as silence
+        pcm = self._prepare_pcm(audio_data)
+        skip = None
+        if self.energy_gate_db is not None:
+            skip = energy_gate(pcm, self.frame_size, self.sample_rate, self.energy_gate_db,
+                               pad_tail=False)
+        raw = vad_decisions(self.vad, pcm, self.frame_size, self.sample_rate,
+                            pad_tail=False, skip=skip)
+        self.last_stats = {
+            "frames": len(raw),
+            "vad_calls_skipped": 0 if skip is None else int(skip.sum())
+        }
+        
+        # Majority-vote smoothing, continuing from decisions of earlier calls
+        smoothed = smooth_decisions(raw, self.buffer_size, self.decision_buffer)
+        self.decision_buffer.extend(raw[-self.buffer_size:].tolist())
+        
+        # Speech runs as [start, end) frame indices, converted to seconds
+        starts, ends = voiced_runs(smoothed)
+        voice_segments = [
+            (start * self.frame_duration_ms / 1000.0, end * self.frame_duration_ms / 1000.0)
+            for start, end in zip(starts.tolist(), ends.tolist())
+        ]
         
-        for i in range(num_frames):
-            frame = audio_data[i * self.frame_size:(i + 1) * self.frame_size]
-            frame_bytes = self._prepare_frame(frame)
-            
-            is_speech = self.is_speech(frame_bytes)
-            
-            # State transition: non-speech to speech
-            if is_speech and not in_speech:
-                speech_start = i * self.frame_duration_ms / 1000.0  # Convert to seconds
-                in_speech = True
-                
-            # State transition: speech to non-speech
-            elif not is_speech and in_speech:
-                speech_end = i * self.frame_duration_ms / 1000.0
-                voice_segments.append((speech_start, speech_end))
-                in_speech = False
-        
-        # Handle case where we end while still in speech
-        if in_speech:
-            speech_end = num_frames * self.frame_duration_ms / 1000.0
-            voice_segments.append((speech_start, speech_end))
-            
         logger.info(f"Detected {len(voice_segments)} voice segments")
         return voice_segments
@@ -9,3 +9,8 @@ This package provides functionality for:
 """
 
 from .core import Diarizer
+from .engine import DiarizationEngine, EngineBusy
+from .jobs import JobManager
+from .streaming import StreamingDiarizer
+from .online_clustering import OnlineSpeakerClusterer
+from .session_store import SessionStore
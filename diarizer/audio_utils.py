@@ -6,8 +6,10 @@ import webrtcvad
 import logging
 import librosa
 import soundfile as sf
+from scipy.ndimage import minimum_filter1d
 import tempfile
 import os
+from .feature_extraction import extract_frame_energy
 logger = logging.getLogger(__name__)
 
 def read_wave(path):
@@ -47,14 +49,161 @@ def write_wave(path, audio, sample_rate):
         wf.setframerate(sample_rate)
         wf.writeframes(audio.tobytes())
 
+def float_to_int16(audio, block_size=1 << 20):
+    """
+    Convert float audio in [-1, 1] to int16 PCM
+    
+    Conversion is done block by block into a single preallocated output,
+    so no full-size float temporaries are created. Values are clipped to
+    avoid int16 wrap-around.
+    
+    Args:
+        audio: Audio data (numpy array)
+        block_size: Number of samples converted per block
+        
+    Returns:
+        int16 numpy array (the input itself if it is already int16)
+    """
+    if audio.dtype == np.int16:
+        return audio
+    
+    out = np.empty(len(audio), dtype=np.int16)
+    for start in range(0, len(audio), block_size):
+        block = audio[start:start + block_size] * 32768
+        np.clip(block, -32768, 32767, out=block)
+        out[start:start + block_size] = block
+    return out
+
+def energy_gate(audio, frame_size, sample_rate, margin_db=6.0, floor_window_s=3.0,
+                ceiling_dbfs=-35.0, hangover_s=0.3, pad_tail=True):
+    """
+    Find frames that are clearly silence, so VAD can skip them
+    
+    The noise floor adapts over time: it is the minimum frame level within
+    a sliding window of floor_window_s seconds. A frame is gated when its
+    level is within margin_db of that floor and also below ceiling_dbfs,
+    so stretches of continuous loud speech are never gated.
+    
+    Args:
+        audio: Audio samples (float in [-1, 1] or int16)
+        frame_size: Samples per frame
+        sample_rate: Sample rate of audio
+        margin_db: Gate frames up to this many dB above the noise floor
+        floor_window_s: Length of the noise floor window in seconds
+        ceiling_dbfs: Frames at or above this level are never gated
+        hangover_s: Seconds after an ungated frame that are never gated
+        pad_tail: Include a zero-padded trailing partial frame
+        
+    Returns:
+        Boolean numpy array, True for frames to treat as non-speech
+    """
+    level = 10 * np.log10(extract_frame_energy(audio, frame_size, pad_tail) + 1e-10)
+    if len(level) == 0:
+        return np.zeros(0, dtype=bool)
+    
+    window = max(1, int(round(floor_window_s * sample_rate / frame_size)))
+    floor = minimum_filter1d(level, size=window, mode='nearest')
+    gated = (level < floor + margin_db) & (level < ceiling_dbfs)
+    
+    # Keep frames whose preceding hangover window holds an ungated frame
+    hangover = int(round(hangover_s * sample_rate / frame_size))
+    ungated = np.concatenate(([0], np.cumsum(~gated)))
+    index = np.arange(len(gated))
+    return gated & (ungated[index + 1] == ungated[np.maximum(index - hangover, 0)])
+
+def vad_decisions(vad, audio_int16, frame_size, sample_rate, pad_tail=True, skip=None):
+    """
+    Run WebRTC VAD over consecutive frames of an int16 signal
+    
+    Frames are zero-copy byte views of one contiguous buffer.
+    
+    Args:
+        vad: WebRTC VAD instance
+        audio_int16: int16 PCM samples
+        frame_size: Samples per frame
+        sample_rate: Sample rate of audio
+        pad_tail: Zero-pad and classify a trailing partial frame instead of
+            dropping it
+        skip: Optional boolean array (e.g. from energy_gate); frames marked
+            True are non-speech without calling the VAD
+        
+    Returns:
+        Boolean numpy array with one decision per frame
+    """
+    n_samples = len(audio_int16)
+    n_full = n_samples // frame_size
+    n_frames = -(-n_samples // frame_size) if pad_tail else n_full
+    frame_bytes = frame_size * 2
+    
+    buf = memoryview(np.ascontiguousarray(audio_int16)).cast('B')
+    voiced = np.zeros(n_frames, dtype=bool)
+    frames = range(n_full) if skip is None else np.flatnonzero(~skip[:n_full]).tolist()
+    for i in frames:
+        offset = i * frame_bytes
+        voiced[i] = vad.is_speech(buf[offset:offset + frame_bytes], sample_rate)
+    
+    # Only the trailing partial frame needs padding
+    if n_full < n_frames and (skip is None or not skip[n_full]):
+        tail = np.zeros(frame_size, dtype=np.int16)
+        tail[:n_samples - n_full * frame_size] = audio_int16[n_full * frame_size:]
+        voiced[n_full] = vad.is_speech(tail.tobytes(), sample_rate)
+    return voiced
+
+def smooth_decisions(decisions, window=5, history=()):
+    """
+    Causal majority vote over the last `window` VAD decisions
+    
+    Frame i is voiced when more than half of the decisions in
+    [i - window + 1, i] are; near the start the window is shorter. This is
+    the rolling-deque vote computed with one cumulative sum.
+    
+    Args:
+        decisions: Boolean array of raw VAD decisions
+        window: Number of decisions in the vote
+        history: Decisions preceding `decisions` (e.g. from an earlier
+            call), oldest first
+        
+    Returns:
+        Boolean numpy array of smoothed decisions, same length as decisions
+    """
+    history = list(history)[max(len(history) - (window - 1), 0):] if window > 1 else []
+    values = np.concatenate((np.asarray(history, dtype=np.int32),
+                             np.asarray(decisions, dtype=np.int32)))
+    totals = np.concatenate(([0], np.cumsum(values)))
+    
+    index = np.arange(len(history), len(values))
+    lower = np.maximum(index + 1 - window, 0)
+    return 2 * (totals[index + 1] - totals[lower]) > (index + 1 - lower)
+
+def voiced_runs(decisions):
+    """
+    Find runs of voiced frames
+    
+    Args:
+        decisions: Boolean array of per-frame decisions
+        
+    Returns:
+        Tuple (starts, ends) of frame index arrays, ends exclusive
+    """
+    decisions = np.asarray(decisions, dtype=bool)
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], decisions.view(np.int8), [0]))))
+    return edges[0::2], edges[1::2]
+
 class Frame(object):
     """
     Represents a "frame" of audio data
+    
+    Frames are created for every few milliseconds of audio, so they use
+    __slots__ and hold a memoryview into a larger PCM buffer rather than a
+    copy of their bytes.
     """
-    def __init__(self, bytes, timestamp, duration):
+    __slots__ = ('bytes', 'timestamp', 'duration', 'offset')
+    
+    def __init__(self, bytes, timestamp, duration, offset=0):
         self.bytes = bytes
         self.timestamp = timestamp
         self.duration = duration
+        self.offset = offset
 
 def frame_generator(frame_duration_ms, audio, sample_rate):
     """
@@ -70,21 +219,59 @@ def frame_generator(frame_duration_ms, audio, sample_rate):
     """
     if isinstance(audio, np.ndarray):
         # Convert numpy array to bytes
-        audio = (audio * 32768).astype(np.int16).tobytes()
+        audio = float_to_int16(audio)
+        audio = memoryview(np.ascontiguousarray(audio)).cast('B')
+    else:
+        audio = memoryview(audio).cast('B')
     
     n = int(sample_rate * (frame_duration_ms / 1000.0) * 2)
-    offset = 0
-    timestamp = 0.0
     duration = (float(n) / sample_rate) / 2.0
+    offset = 0
     while offset + n <= len(audio):
-        yield Frame(audio[offset:offset + n], timestamp, duration)
-        timestamp += duration
+        sample = offset // 2
+        yield Frame(audio[offset:offset + n], sample / sample_rate, duration, sample)
         offset += n
 
-def vad_collector(sample_rate, frame_duration_ms, padding_duration_ms, vad,
-                 frames):
+def stream_frame_generator(frame_duration_ms, chunks, sample_rate):
     """
-    Filter frames using voice activity detection
+    Generate audio frames from an iterable of PCM byte chunks
+    
+    Chunks may have any length; partial frames are carried over to the
+    next chunk, so frames are produced as soon as enough audio arrives.
+    Frames of one chunk are views of a single buffer, so bytes are copied
+    once per chunk rather than once per frame.
+    
+    Args:
+        frame_duration_ms: Duration of each frame in milliseconds
+        chunks: Iterable of 16-bit PCM byte strings
+        sample_rate: Sample rate of audio
+        
+    Returns:
+        Generator that yields Frames
+    """
+    n = int(sample_rate * (frame_duration_ms / 1000.0) * 2)
+    duration = (float(n) / sample_rate) / 2.0
+    sample = 0
+    pending = b''
+    for chunk in chunks:
+        buffer = pending + chunk if pending else bytes(chunk)
+        view = memoryview(buffer)
+        offset = 0
+        while offset + n <= len(buffer):
+            yield Frame(view[offset:offset + n], sample / sample_rate, duration, sample)
+            sample += n // 2
+            offset += n
+        pending = buffer[offset:]
+
+def vad_segment_collector(sample_rate, frame_duration_ms, padding_duration_ms, vad,
+                          frames):
+    """
+    Filter frames using voice activity detection, with segment positions
+    
+    A segment opens once more than 90% of the frames in a padding-sized
+    window are voiced and closes once more than 90% are unvoiced. Voiced
+    and unvoiced frames in the window are kept as running counts, so each
+    frame costs O(1) regardless of the padding.
     
     Args:
         sample_rate: Audio sample rate
@@ -94,36 +281,66 @@ def vad_collector(sample_rate, frame_duration_ms, padding_duration_ms, vad,
         frames: Audio frames
         
     Returns:
-        Generator that yields segments of audio where speech is detected
+        Generator that yields (start_sample, end_sample, pcm_bytes) for
+        each segment where speech is detected, end exclusive
     """
     num_padding_frames = int(padding_duration_ms / frame_duration_ms)
-    ring_buffer = collections.deque(maxlen=num_padding_frames)
+    threshold = 0.9 * num_padding_frames
+    ring_buffer = collections.deque()
+    num_voiced = 0
     triggered = False
-
+    
     voiced_frames = []
     for frame in frames:
         is_speech = vad.is_speech(frame.bytes, sample_rate)
-
-        if not triggered:
+        
+        if num_padding_frames:
+            if len(ring_buffer) == num_padding_frames:
+                num_voiced -= ring_buffer.popleft()[1]
             ring_buffer.append((frame, is_speech))
-            num_voiced = len([f for f, speech in ring_buffer if speech])
-            if num_voiced > 0.9 * ring_buffer.maxlen:
+            num_voiced += is_speech
+        
+        if not triggered:
+            if num_voiced > threshold:
                 triggered = True
-                for f, s in ring_buffer:
-                    voiced_frames.append(f)
+                voiced_frames.extend(f for f, _ in ring_buffer)
                 ring_buffer.clear()
+                num_voiced = 0
         else:
             voiced_frames.append(frame)
-            ring_buffer.append((frame, is_speech))
-            num_unvoiced = len([f for f, speech in ring_buffer if not speech])
-            if num_unvoiced > 0.9 * ring_buffer.maxlen:
+            if len(ring_buffer) - num_voiced > threshold:
                 triggered = False
-                yield b''.join([f.bytes for f in voiced_frames])
+                yield _join_frames(voiced_frames)
                 ring_buffer.clear()
+                num_voiced = 0
                 voiced_frames = []
-
+    
     if voiced_frames:
-        yield b''.join([f.bytes for f in voiced_frames])
+        yield _join_frames(voiced_frames)
+
+def _join_frames(frames):
+    """Sample range and PCM bytes of consecutive frames"""
+    last = frames[-1]
+    return frames[0].offset, last.offset + len(last.bytes) // 2, b''.join(f.bytes for f in frames)
+
+def vad_collector(sample_rate, frame_duration_ms, padding_duration_ms, vad,
+                 frames):
+    """
+    Filter frames using voice activity detection
+    
+    Args:
+        sample_rate: Audio sample rate
+        frame_duration_ms: Frame duration in milliseconds
+        padding_duration_ms: Padding duration in milliseconds
+        vad: WebRTC VAD instance
+        frames: Audio frames
+        
+    Returns:
+        Generator that yields segments of audio where speech is detected
+    """
+    for _, _, segment in vad_segment_collector(sample_rate, frame_duration_ms,
+                                               padding_duration_ms, vad, frames):
+        yield segment
 
 def convert_sample_rate(audio_path, target_sample_rate=16000):
     """
@@ -0,0 +1,280 @@
+"""
+Bounded-memory block processing for very long recordings.
+
+Audio is read in fixed-size blocks and VAD state is carried across block
+boundaries, so peak memory is set by the block size (plus the longest
+open speech segment) rather than by the duration of the recording.
+"""
+import logging
+import numpy as np
+import soundfile as sf
+import webrtcvad
+
+from .audio_utils import float_to_int16, energy_gate, vad_decisions
+
+logger = logging.getLogger(__name__)
+
+
+def iter_blocks(file_path, sample_rate, block_size):
+    """
+    Read a file as int16 mono blocks at the target sample rate
+    
+    Args:
+        file_path: Path to an audio file readable by soundfile
+        sample_rate: Target sample rate
+        block_size: Number of source frames read per block
+        
+    Returns:
+        Generator yielding int16 numpy arrays
+    """
+    info = sf.info(file_path)
+    resampler = None
+    if info.samplerate != sample_rate:
+        import soxr
+        resampler = soxr.ResampleStream(info.samplerate, sample_rate, 1, dtype='float32')
+    
+    for block in sf.blocks(file_path, blocksize=block_size, dtype='float32', always_2d=True):
+        mono = block[:, 0] if block.shape[1] == 1 else block.mean(axis=1)
+        if resampler is not None:
+            mono = resampler.resample_chunk(mono)
+        if len(mono):
+            yield float_to_int16(mono)
+    
+    if resampler is not None:
+        tail = resampler.resample_chunk(np.zeros(0, dtype=np.float32), last=True)
+        if len(tail):
+            yield float_to_int16(tail)
+
+
+def read_span(file_path, sample_rate, start, stop=None):
+    """
+    Read part of a file as int16 mono at the target sample rate
+    
+    Args:
+        file_path: Path to an audio file readable by soundfile
+        sample_rate: Target sample rate
+        start: First sample to read, at the target rate
+        stop: Sample to stop at, at the target rate (None reads to the end)
+        
+    Returns:
+        int16 numpy array; stop - start samples long unless the file ends
+        first
+    """
+    info = sf.info(file_path)
+    ratio = info.samplerate / sample_rate
+    block, _ = sf.read(file_path, start=min(int(round(start * ratio)), info.frames),
+                       stop=None if stop is None else min(int(round(stop * ratio)), info.frames),
+                       dtype='float32', always_2d=True)
+    mono = block[:, 0] if block.shape[1] == 1 else block.mean(axis=1)
+    if info.samplerate != sample_rate and len(mono):
+        import soxr
+        mono = soxr.resample(mono, info.samplerate, sample_rate)
+    audio = float_to_int16(mono)
+    return audio if stop is None else audio[:stop - start]
+
+
+class BlockVAD:
+    """
+    Incremental WebRTC VAD that turns a stream of int16 blocks into speech
+    regions
+    
+    Regions follow the same rules as Diarizer._detect_speech: voiced frames
+    separated by less than 50 ms are merged and regions shorter than
+    min_speech_duration_ms are dropped. Regions are additionally split at
+    max_segment_s so the audio held for an open region stays bounded.
+    
+    With energy_gate_db set, frames are gated exactly as energy_gate would
+    gate the whole recording: the frames its noise floor and hangover look
+    back on are kept as context, and the last half floor window of each
+    block waits for the next block.
+    
+    Decisions computed ahead of time (e.g. by ShardedVAD.file_decisions)
+    can be passed instead; blocks then only drive the region state machine.
+    """
+    
+    def __init__(self, sample_rate=16000, frame_duration_ms=30, vad_aggressiveness=3,
+                 min_speech_duration_ms=300, max_segment_s=60.0, energy_gate_db=None,
+                 decisions=None, skip=None):
+        """
+        Initialize the block VAD
+        
+        Args:
+            sample_rate: Sample rate in Hz
+            frame_duration_ms: Frame duration in milliseconds
+            vad_aggressiveness: VAD aggressiveness (0-3)
+            min_speech_duration_ms: Minimum region duration in milliseconds
+            max_segment_s: Maximum region duration in seconds
+            energy_gate_db: Frames within this many dB of the adaptive
+                noise floor skip the VAD (see audio_utils.energy_gate);
+                None runs the VAD on every frame
+            decisions: Optional precomputed boolean decision per frame of
+                the whole stream; the VAD is not run
+            skip: Frames of decisions the energy gate skipped, for the
+                vad_calls_skipped count
+        """
+        self.sample_rate = sample_rate
+        self.frame_duration_ms = frame_duration_ms
+        self.frame_size = int(sample_rate * frame_duration_ms / 1000)
+        self.min_samples = int(min_speech_duration_ms * sample_rate / 1000)
+        self.max_frames = max(1, int(max_segment_s * 1000 / frame_duration_ms))
+        self.vad = webrtcvad.Vad(vad_aggressiveness)
+        self.energy_gate_db = energy_gate_db if decisions is None else None
+        self._decisions = decisions
+        self._skip = skip
+        
+        # Frames the gate decides with look-ahead into the next block, and
+        # classified frames kept as its look-behind (see energy_gate)
+        floor_window = max(1, int(round(3.0 * sample_rate / self.frame_size)))
+        hangover = int(round(0.3 * sample_rate / self.frame_size))
+        self._lookahead = (floor_window - 1) // 2 if self.energy_gate_db is not None else 0
+        self._context_frames = floor_window // 2 + hangover
+        self._context = np.zeros(0, dtype=np.int16)
+        
+        self.frames = 0              # Frames classified so far
+        self.vad_calls_skipped = 0   # Of those, frames the energy gate skipped
+        self.n_samples = 0           # Samples received so far
+        self.frame_index = 0         # Index of the next frame to classify
+        self.run_start = None        # First frame of the open region
+        self.last_voiced = None      # Last voiced frame of the open region
+        self._pending = np.zeros(0, dtype=np.int16)
+    
+    def feed(self, block):
+        """
+        Classify the complete frames of a new block
+        
+        Args:
+            block: int16 numpy array continuing the stream
+            
+        Returns:
+            List of (start_sample, end_sample) regions closed by this block
+        """
+        self.n_samples += len(block)
+        if len(self._pending):
+            block = np.concatenate([self._pending, block])
+        
+        n_ready = max(len(block) // self.frame_size - self._lookahead, 0)
+        closed = []
+        self._classify(block[:n_ready * self.frame_size], closed)
+        self._pending = block[n_ready * self.frame_size:].copy()
+        return closed
+    
+    def flush(self):
+        """
+        Finish the stream, classifying any trailing partial frame
+        
+        Returns:
+            List of the remaining (start_sample, end_sample) regions
+        """
+        closed = []
+        if len(self._pending):
+            self._classify(self._pending, closed)
+            self._pending = np.zeros(0, dtype=np.int16)
+        self._close(closed)
+        return closed
+    
+    def _classify(self, audio, closed):
+        """Run the gate and VAD over frames of audio (a partial last frame is zero-padded)"""
+        if len(audio) == 0:
+            return
+        if self._decisions is not None:
+            n = -(-len(audio) // self.frame_size)
+            voiced = np.zeros(n, dtype=bool)
+            given = self._decisions[self.frames:self.frames + n]
+            voiced[:len(given)] = given
+            if self._skip is not None:
+                self.vad_calls_skipped += int(self._skip[self.frames:self.frames + n].sum())
+            self.frames += n
+            for decision in voiced.tolist():
+                self._step(decision, closed)
+            return
+        
+        skip = None
+        if self.energy_gate_db is not None:
+            context = len(self._context) // self.frame_size
+            skip = energy_gate(np.concatenate([self._context, audio]), self.frame_size,
+                               self.sample_rate, self.energy_gate_db)[context:]
+            keep = self._context_frames * self.frame_size
+            self._context = np.concatenate([self._context, audio])[-keep:] if keep else self._context[:0]
+            self.vad_calls_skipped += int(skip.sum())
+        
+        voiced = vad_decisions(self.vad, audio, self.frame_size, self.sample_rate, skip=skip)
+        self.frames += len(voiced)
+        for decision in voiced.tolist():
+            self._step(decision, closed)
+    
+    @property
+    def earliest_needed_sample(self):
+        """First sample that may still belong to a region not yet emitted"""
+        frame = self.run_start if self.run_start is not None else self.frame_index
+        return frame * self.frame_size
+    
+    def _step(self, voiced, closed):
+        """Advance the region state machine by one frame"""
+        i = self.frame_index
+        self.frame_index += 1
+        
+        if voiced:
+            if self.run_start is None:
+                self.run_start = i
+            elif (i - self.last_voiced - 1) * self.frame_duration_ms >= 50:
+                self._close(closed)
+                self.run_start = i
+            elif i - self.run_start >= self.max_frames:
+                self.last_voiced = i - 1
+                self._close(closed)
+                self.run_start = i
+            self.last_voiced = i
+        elif self.run_start is not None and (i - self.last_voiced) * self.frame_duration_ms >= 50:
+            self._close(closed)
+    
+    def _close(self, closed):
+        """Emit the open region if it is long enough"""
+        if self.run_start is None:
+            return
+        start = self.run_start * self.frame_size
+        end = min((self.last_voiced + 1) * self.frame_size, self.n_samples)
+        if end - start >= self.min_samples:
+            closed.append((start, end))
+        self.run_start = None
+        self.last_voiced = None
+
+
+class BlockBuffer:
+    """
+    Rolling window over a block stream that can slice out recent samples
+    """
+    
+    def __init__(self):
+        self.blocks = []
+        self.start = 0   # Stream offset of the first buffered sample
+        self.end = 0     # Stream offset just past the last buffered sample
+    
+    def append(self, block):
+        """Add the next block of the stream"""
+        self.blocks.append(block)
+        self.end += len(block)
+    
+    def slice(self, start, end):
+        """
+        Copy out samples [start, end) of the stream
+        
+        Args:
+            start: First stream sample (must still be buffered)
+            end: Stream sample just past the last one needed
+            
+        Returns:
+            numpy array with the requested samples
+        """
+        parts = []
+        offset = self.start
+        for block in self.blocks:
+            block_end = offset + len(block)
+            if block_end > start and offset < end:
+                parts.append(block[max(start - offset, 0):min(end, block_end) - offset])
+            offset = block_end
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=np.int16)
+    
+    def discard_before(self, sample):
+        """Drop whole blocks that end before the given stream sample"""
+        while self.blocks and self.start + len(self.blocks[0]) <= sample:
+            self.start += len(self.blocks.pop(0))
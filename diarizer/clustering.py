@@ -0,0 +1,188 @@
+"""
+Clustering backends for speaker identification.
+
+Backends are registered by name and share one signature:
+backend(features, n_clusters, random_state) -> label array. Diarizer and
+SpeakerDiarization look them up here, so a backend can be chosen per
+instance or per request.
+"""
+import logging
+import numpy as np
+from sklearn.cluster import AgglomerativeClustering, KMeans, MiniBatchKMeans
+from sklearn.metrics import pairwise_distances
+from sklearn.mixture import GaussianMixture
+
+logger = logging.getLogger(__name__)
+
+CLUSTERING_BACKENDS = {}
+
+# 'auto' uses the numpy backend below SMALL_PROBLEM_ROWS rows and
+# MiniBatchKMeans above LARGE_PROBLEM_ROWS
+SMALL_PROBLEM_ROWS = 50
+LARGE_PROBLEM_ROWS = 10000
+
+
+def register_backend(name):
+    """
+    Register a clustering backend under a name
+    
+    Args:
+        name: Backend name
+    
+    Returns:
+        Decorator registering the function
+    """
+    def decorator(func):
+        CLUSTERING_BACKENDS[name] = func
+        return func
+    return decorator
+
+
+def cluster(features, n_clusters, backend='kmeans', random_state=0):
+    """
+    Cluster feature rows with a registered backend
+    
+    Args:
+        features: Feature matrix (one row per segment or frame)
+        n_clusters: Number of clusters
+        backend: Name of a registered backend
+        random_state: Random seed
+    
+    Returns:
+        Array of cluster labels
+    """
+    if backend not in CLUSTERING_BACKENDS:
+        raise ValueError(f"Unsupported clustering backend: {backend}")
+    features = np.asarray(features)
+    n_clusters = min(n_clusters, len(features))
+    if n_clusters <= 1:
+        return np.zeros(len(features), dtype=int)
+    logger.debug(f"Clustering {len(features)} rows into {n_clusters} clusters with {backend}")
+    return np.asarray(CLUSTERING_BACKENDS[backend](features, n_clusters, random_state))
+
+
+@register_backend('kmeans')
+def kmeans(features, n_clusters, random_state=0):
+    """KMeans with 10 restarts, refit with a GMM if a cluster is nearly empty"""
+    labels = KMeans(n_clusters=n_clusters, random_state=random_state, n_init=10).fit_predict(features)
+    
+    # Check if the clustering seems reasonable (some segments for each speaker)
+    counts = np.bincount(labels, minlength=n_clusters)
+    if np.any(counts < 2):
+        gmm = GaussianMixture(n_components=n_clusters, random_state=random_state, n_init=10)
+        labels = gmm.fit_predict(features)
+    return labels
+
+
+@register_backend('minibatch')
+def minibatch_kmeans(features, n_clusters, random_state=0):
+    """MiniBatchKMeans, for large frame-level problems"""
+    model = MiniBatchKMeans(n_clusters=n_clusters, random_state=random_state,
+                            n_init=3, batch_size=1024)
+    return model.fit_predict(features)
+
+
+@register_backend('agglomerative')
+def agglomerative(features, n_clusters, random_state=0):
+    """Average-linkage agglomerative clustering over cosine distances"""
+    distances = pairwise_distances(features, metric='cosine')
+    model = AgglomerativeClustering(n_clusters=n_clusters, metric='precomputed',
+                                    linkage='average')
+    return model.fit_predict(distances)
+
+
+def _principal_split(centered):
+    """
+    Optimal two-way split of the rows' projections on the principal axis,
+    found in closed form from prefix sums of the sorted projections
+    """
+    _, _, vt = np.linalg.svd(centered, full_matrices=False)
+    projection = centered @ vt[0]
+    order = np.argsort(projection)
+    values = projection[order]
+    n = len(values)
+    sizes = np.arange(1, n)
+    left_sum = np.cumsum(values)[:-1]
+    left_sq = np.cumsum(values ** 2)[:-1]
+    right_sum = values.sum() - left_sum
+    right_sq = (values ** 2).sum() - left_sq
+    cost = (left_sq - left_sum ** 2 / sizes) + (right_sq - right_sum ** 2 / (n - sizes))
+    labels = np.zeros(n, dtype=int)
+    labels[order[int(np.argmin(cost)) + 1:]] = 1
+    return labels
+
+
+def _lloyd(features, centers, max_iter):
+    """
+    Lloyd iterations for several initializations at once
+    
+    Args:
+        features: (n, d) feature matrix
+        centers: (runs, k, d) initial centers
+        max_iter: Maximum number of iterations
+        
+    Returns:
+        Tuple ((runs, n) labels, (runs,) inertia)
+    """
+    n_clusters = centers.shape[1]
+    sq_norms = (features ** 2).sum(axis=1)
+    labels = None
+    for _ in range(max_iter):
+        # Squared distances (runs, n, k) via the expansion |x|^2 - 2x.c + |c|^2
+        distances = (sq_norms[None, :, None]
+                     - 2 * (features @ centers.transpose(0, 2, 1))
+                     + (centers ** 2).sum(axis=2)[:, None, :])
+        new_labels = distances.argmin(axis=2)
+        if labels is not None and np.array_equal(labels, new_labels):
+            break
+        labels = new_labels
+        one_hot = (labels[:, :, None] == np.arange(n_clusters)).astype(features.dtype)
+        counts = one_hot.sum(axis=1)
+        sums = one_hot.transpose(0, 2, 1) @ features
+        centers = np.where(counts[:, :, None] > 0, sums / np.maximum(counts, 1)[:, :, None], centers)
+    inertia = np.take_along_axis(distances, labels[:, :, None], axis=2).sum(axis=(1, 2))
+    return labels, inertia
+
+
+@register_backend('numpy')
+def numpy_kmeans(features, n_clusters, random_state=0, n_init=10, max_iter=50):
+    """
+    Small-problem k-means in plain numpy, without estimator overhead
+    
+    Runs n_init k-means++ initializations (plus, for two clusters, the
+    closed-form principal-axis split) as one batched Lloyd iteration and
+    keeps the lowest inertia. Cost
+    grows with rows x clusters x dimensions per iteration, so this is
+    meant for problems of a few dozen segments.
+    """
+    features = np.asarray(features, dtype=np.float64)
+    features = features - features.mean(axis=0)
+    rng = np.random.default_rng(random_state)
+    
+    starts = []
+    if n_clusters == 2:
+        split = _principal_split(features)
+        starts.append(np.array([features[split == k].mean(axis=0) for k in (0, 1)]))
+    for _ in range(n_init):
+        # k-means++ seeding
+        centers = [features[rng.integers(len(features))]]
+        nearest = ((features - centers[0]) ** 2).sum(axis=1)
+        for _ in range(n_clusters - 1):
+            total = nearest.sum()
+            index = rng.choice(len(features), p=nearest / total) if total > 0 else rng.integers(len(features))
+            centers.append(features[index])
+            nearest = np.minimum(nearest, ((features - centers[-1]) ** 2).sum(axis=1))
+        starts.append(np.array(centers))
+    
+    labels, inertia = _lloyd(features, np.array(starts), max_iter)
+    return labels[np.argmin(inertia)]
+
+
+@register_backend('auto')
+def auto(features, n_clusters, random_state=0):
+    """numpy for small problems, minibatch for very large ones, else kmeans"""
+    if len(features) < SMALL_PROBLEM_ROWS:
+        return numpy_kmeans(features, n_clusters, random_state)
+    if len(features) > LARGE_PROBLEM_ROWS:
+        return minibatch_kmeans(features, n_clusters, random_state)
+    return kmeans(features, n_clusters, random_state)
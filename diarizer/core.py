@@ -1,20 +1,29 @@
 import os
-import uuid
 import numpy as np
-import librosa
 import webrtcvad
-from sklearn.cluster import KMeans
-from sklearn.mixture import GaussianMixture
 import logging
-from threading import Lock
+from threading import BoundedSemaphore
 import tempfile
 import wave
 import io
-from .feature_extraction import extract_mfcc
-from .audio_utils import vad_collector, write_wave
+import shutil
+import soundfile as sf
+from .feature_extraction import extract_mfcc_batch, extract_region_features
+from .audio_utils import vad_collector, write_wave, float_to_int16, energy_gate, vad_decisions, voiced_runs
+from .blocks import iter_blocks, BlockVAD, BlockBuffer
+from .rendering import SESSION_FILE, load_session, write_json_atomic
+from .session_store import SessionStore
+from .sharded_vad import ShardedVAD
+from .metrics import timed
+from .clustering import CLUSTERING_BACKENDS, cluster
+from .speaker_count import CRITERIA as SPEAKER_COUNT_CRITERIA, estimate_num_speakers
+from utils.audio_utils import load_audio
 
 logger = logging.getLogger(__name__)
 
+# Per-segment features and sample ranges saved with each session
+FEATURES_FILE = 'features.npz'
+
 class Diarizer:
     """
     Main diarization class that handles:
@@ -24,49 +33,125 @@ class Diarizer:
     """
     
     def __init__(self, sample_rate=16000, frame_duration_ms=30, 
-                 vad_aggressiveness=3, min_speech_duration_ms=300):
+                 vad_aggressiveness=3, min_speech_duration_ms=300,
+                 max_concurrency=None, temp_dir=None, feature_mode='segment',
+                 block_threshold_s=None, block_duration_s=30.0, session_store=None,
+                 max_speakers=2, speaker_count=None, clustering='kmeans',
+                 energy_gate_db=None, vad_workers=None, vad_shard_s=300.0):
         """
         Initialize the diarizer with audio parameters
         
+        A single instance can be shared between threads: all per-request
+        state, including the WebRTC VAD, lives on the call stack.
+        
         Args:
             sample_rate: Audio sample rate in Hz
             frame_duration_ms: Frame duration in milliseconds
             vad_aggressiveness: VAD aggressiveness (0-3)
             min_speech_duration_ms: Minimum speech duration to consider
+            max_concurrency: Maximum number of audio streams processed at
+                once, or None for no limit
+            temp_dir: Directory for session output, a new temporary
+                directory if None
+            feature_mode: 'segment' to run MFCC extraction on each speech
+                segment separately, or 'global' to compute MFCCs once over
+                the recording and average them per segment
+            block_threshold_s: Files longer than this many seconds are
+                processed block by block with bounded memory (None to
+                always load the whole file)
+            block_duration_s: Block length in seconds for block processing
+            session_store: SessionStore receiving session output; one
+                rooted at temp_dir is created if None
+            max_speakers: Maximum number of speakers to identify
+            speaker_count: Criterion for estimating the number of speakers
+                ('eigengap' or 'silhouette'), or None to always use
+                max_speakers speakers
+            clustering: Clustering backend (see diarizer.clustering):
+                'kmeans', 'minibatch', 'agglomerative', 'numpy' or 'auto'
+            energy_gate_db: Frames within this many dB of the adaptive
+                noise floor are treated as silence without running the VAD
+                (see audio_utils.energy_gate); None runs the VAD on every
+                frame
+            vad_workers: Worker processes for sharded VAD; recordings
+                longer than one shard are split into vad_shard_s shards
+                classified in parallel. None (or 1) runs the VAD in the
+                calling thread
+            vad_shard_s: Shard length in seconds for sharded VAD
         """
+        if feature_mode not in ('segment', 'global'):
+            raise ValueError(f"Unsupported feature mode: {feature_mode}")
+        if speaker_count is not None and speaker_count not in SPEAKER_COUNT_CRITERIA:
+            raise ValueError(f"Unsupported speaker count criterion: {speaker_count}")
+        if clustering not in CLUSTERING_BACKENDS:
+            raise ValueError(f"Unsupported clustering backend: {clustering}")
+        
         self.sample_rate = sample_rate
         self.frame_duration_ms = frame_duration_ms
         self.vad_aggressiveness = vad_aggressiveness
         self.min_speech_duration_ms = min_speech_duration_ms
-        self.vad = webrtcvad.Vad(self.vad_aggressiveness)
-        self.lock = Lock()  # For thread safety
-        self.temp_dir = tempfile.mkdtemp()
+        self.max_concurrency = max_concurrency
+        self.feature_mode = feature_mode
+        self.block_threshold_s = block_threshold_s
+        self.block_duration_s = block_duration_s
+        self.max_speakers = max_speakers
+        self.speaker_count = speaker_count
+        self.clustering = clustering
+        self.energy_gate_db = energy_gate_db
+        self.vad_workers = vad_workers
+        self.vad_shard_s = vad_shard_s
+        self._sharded_vad = None
+        if vad_workers and vad_workers > 1:
+            self._sharded_vad = ShardedVAD(vad_aggressiveness, vad_workers, vad_shard_s)
+        self._slots = BoundedSemaphore(max_concurrency) if max_concurrency else None
+        self.session_store = session_store or SessionStore(temp_dir or tempfile.mkdtemp())
+        self.temp_dir = self.session_store.root
         logger.debug(f"Initialized Diarizer with sample_rate={sample_rate}, vad_aggressiveness={vad_aggressiveness}")
     
-    def process_audio_file(self, file_path):
+    def close(self):
+        """
+        Stop the sharded VAD's worker processes, if any
+        """
+        if self._sharded_vad is not None:
+            self._sharded_vad.shutdown()
+    
+    def process_audio_file(self, file_path, progress=None):
         """
         Process an audio file for diarization
         
         Args:
             file_path: Path to the audio file
+            progress: Optional callable receiving completion percentage
             
         Returns:
             Dictionary with diarization results
         """
         logger.debug(f"Processing audio file: {file_path}")
         
-        # Load audio file and convert to mono if needed
-        y, sr = librosa.load(file_path, sr=self.sample_rate, mono=True)
+        # Stream very long recordings block by block
+        if self._use_blocks(file_path):
+            if self._slots is None:
+                return self._process_blocks(file_path, progress)
+            with self._slots:
+                return self._process_blocks(file_path, progress)
+        
+        # Load audio file and convert to mono if needed; PCM WAVs already
+        # at the target rate are memory-mapped as int16 without decoding
+        timings = {}
+        with timed(timings, 'load'):
+            y, sr = load_audio(file_path, sr=self.sample_rate, mono=True)
+        if progress:
+            progress(10)
         
         # Process the audio
-        return self._process_audio(y, sr)
+        return self._process_audio(y, sr, progress, source=file_path, timings=timings)
     
-    def process_audio_bytes(self, audio_bytes):
+    def process_audio_bytes(self, audio_bytes, progress=None):
         """
         Process audio from bytes for diarization
         
         Args:
             audio_bytes: Audio data as bytes
+            progress: Optional callable receiving completion percentage
             
         Returns:
             Dictionary with diarization results
@@ -74,166 +159,348 @@ class Diarizer:
         logger.debug(f"Processing audio bytes, size: {len(audio_bytes)}")
         
         # Convert bytes to numpy array
-        with io.BytesIO(audio_bytes) as buf:
+        timings = {}
+        with timed(timings, 'load'), io.BytesIO(audio_bytes) as buf:
             with wave.open(buf, 'rb') as wf:
                 sample_rate = wf.getframerate()
                 n_frames = wf.getnframes()
                 data = wf.readframes(n_frames)
-                y = np.frombuffer(data, dtype=np.int16).astype(np.float32) / 32768.0
+                y = np.frombuffer(data, dtype=np.int16)
         
         # Process the audio
-        return self._process_audio(y, sample_rate)
+        return self._process_audio(y, sample_rate, progress, source=audio_bytes, timings=timings)
     
-    def _process_audio(self, y, sr):
+    def _process_audio(self, y, sr, progress=None, source=None, timings=None):
         """
         Internal method to process audio data
         
         Args:
-            y: Audio data as numpy array
+            y: Audio data as numpy array (float in [-1, 1] or int16 PCM)
             sr: Sample rate
+            progress: Optional callable receiving completion percentage
+            source: Path or WAV bytes the audio came from, kept with the
+                session so speaker audio can be rendered on demand (the
+                audio itself is saved as a WAV if None)
+            timings: Optional dictionary of stage timings so far (e.g.
+                'load'), completed by the pipeline
             
         Returns:
             Dictionary with diarization results
         """
-        with self.lock:  # Ensure thread safety
-            # Step 1: Voice activity detection
-            audio_segments = self._detect_speech(y, sr)
-            
-            # Step 2: Extract features from speech segments
-            if not audio_segments:
-                logger.warning("No speech segments detected")
-                return {"success": False, "error": "No speech detected"}
-            
-            all_features = []
-            segment_times = []
-            audio_chunks = []
+        if self._slots is None:
+            return self._run_pipeline(y, sr, progress, source, timings)
+        
+        with self._slots:  # Bound the number of concurrent pipelines
+            return self._run_pipeline(y, sr, progress, source, timings)
+    
+    def _run_pipeline(self, y, sr, progress=None, source=None, timings=None):
+        """
+        Run VAD, feature extraction, clustering and output generation
+        
+        Args:
+            y: Audio data as numpy array
+            sr: Sample rate
+            progress: Optional callable receiving completion percentage
+            source: Path or WAV bytes the audio came from
+            timings: Optional dictionary receiving seconds per stage
             
-            for start_time, end_time, audio_chunk in audio_segments:
-                # Extract MFCC features
-                if len(audio_chunk) < sr * 0.1:  # Skip very short segments
-                    continue
-                    
-                mfcc_features = extract_mfcc(audio_chunk, sr)
-                if mfcc_features.size > 0:
-                    all_features.append(np.mean(mfcc_features, axis=0))
-                    segment_times.append((start_time, end_time))
-                    audio_chunks.append(audio_chunk)
+        Returns:
+            Dictionary with diarization results; successful results carry
+            "timings" (seconds per stage) and "audio_duration"
+        """
+        report = progress or (lambda pct: None)
+        timings = {} if timings is None else timings
+        
+        # Step 1: Voice activity detection
+        vad_stats = {}
+        with timed(timings, 'vad'):
+            speech_regions = self._detect_speech(y, sr, vad_stats)
+        report(30)
+        
+        # Step 2: Extract features from speech segments
+        if not speech_regions:
+            logger.warning("No speech segments detected")
+            return {"success": False, "error": "No speech detected"}
+        
+        with timed(timings, 'features'):
+            all_features, regions = self._extract_features(y, sr, speech_regions, report)
+        
+        if not all_features:
+            logger.warning("No valid features extracted")
+            return {"success": False, "error": "Could not extract features"}
+        
+        # Step 3: Cluster features to identify speakers
+        report(80)
+        features = np.array(all_features)
+        with timed(timings, 'clustering'):
+            speaker_labels = self._identify_speakers(features, self.max_speakers, self.speaker_count)
+        
+        # Step 4: Generate output segments by speaker
+        report(90)
+        if source is None:
+            source = y
+        with timed(timings, 'output'):
+            result = self._generate_speaker_segments(speaker_labels, regions, sr, source, features)
+        result["vad"] = vad_stats
+        result["timings"] = timings
+        result["audio_duration"] = len(y) / sr
+        report(100)
+        
+        return result
+    
+    def _extract_features(self, y, sr, speech_regions, report=None):
+        """
+        Compute one MFCC feature vector per speech region
+        
+        Args:
+            y: Audio data as numpy array
+            sr: Sample rate
+            speech_regions: List of (start_sample, end_sample) tuples
+            report: Optional callable receiving completion percentage
             
-            if not all_features:
-                logger.warning("No valid features extracted")
-                return {"success": False, "error": "Could not extract features"}
+        Returns:
+            Tuple (list of feature vectors, list of the regions they
+            belong to); very short regions and regions without features
+            are dropped
+        """
+        report = report or (lambda pct: None)
+        
+        # Skip very short segments
+        speech_regions = [(start, end) for start, end in speech_regions if end - start >= sr * 0.1]
+        
+        all_features = []
+        regions = []
+        
+        if self.feature_mode == 'global':
+            # One MFCC pass over the recording, averaged per segment
+            all_features = list(extract_region_features(y, sr, speech_regions))
+            regions = speech_regions
+        else:
+            # Views into the original buffer, no copy
+            chunks = [y[start_sample:end_sample] for start_sample, end_sample in speech_regions]
             
-            # Step 3: Cluster features to identify speakers
-            speaker_labels = self._identify_speakers(np.array(all_features))
+            # Extract MFCC features, in batches so progress can be reported
+            batch_size = 64
+            for i in range(0, len(chunks), batch_size):
+                report(30 + 50 * i // len(chunks))
+                batch = extract_mfcc_batch(chunks[i:i + batch_size], sr)
+                for region, mfcc_features in zip(speech_regions[i:i + batch_size], batch):
+                    if mfcc_features.size > 0:
+                        all_features.append(np.mean(mfcc_features, axis=0))
+                        regions.append(region)
+        
+        return all_features, regions
+    
+    def _use_blocks(self, file_path):
+        """
+        Decide from the file header whether to use block processing
+        
+        Args:
+            file_path: Path to the audio file
             
-            # Step 4: Generate output segments by speaker
-            result = self._generate_speaker_segments(
-                speaker_labels, segment_times, audio_chunks, sr
-            )
+        Returns:
+            True if the file is long enough and readable block by block
+        """
+        if self.block_threshold_s is None:
+            return False
+        try:
+            return sf.info(file_path).duration > self.block_threshold_s
+        except Exception:
+            return False
+    
+    def _process_blocks(self, file_path, progress=None):
+        """
+        Diarize a file block by block with memory bounded by the block size
+        
+        VAD and per-segment feature extraction run as blocks arrive; the
+        speaker audio is later rendered block by block from the source.
+        With vad_workers set, the VAD runs first over shards read from the
+        file in parallel, and the blocks only carry feature extraction.
+        
+        Args:
+            file_path: Path to the audio file
+            progress: Optional callable receiving completion percentage
             
-            return result
+        Returns:
+            Dictionary with diarization results
+        """
+        report = progress or (lambda pct: None)
+        timings = {}
+        sr = self.sample_rate
+        info = sf.info(file_path)
+        block_size = int(self.block_duration_s * info.samplerate)
+        total_samples = max(int(info.duration * sr), 1)
+        
+        decisions = skip = None
+        if self._sharded_vad is not None:
+            frame_size = int(sr * self.frame_duration_ms / 1000)
+            with timed(timings, 'vad'):
+                decisions, skip = self._sharded_vad.file_decisions(file_path, frame_size, sr,
+                                                                   self.energy_gate_db)
+        vad = BlockVAD(sr, self.frame_duration_ms, self.vad_aggressiveness,
+                       self.min_speech_duration_ms, energy_gate_db=self.energy_gate_db,
+                       decisions=decisions, skip=skip)
+        buffer = BlockBuffer()
+        regions = []
+        all_features = []
+        
+        def extract(closed):
+            # Skip very short segments
+            closed = [(start, end) for start, end in closed if end - start >= sr * 0.1]
+            chunks = [buffer.slice(start, end) for start, end in closed]
+            for region, mfcc_features in zip(closed, extract_mfcc_batch(chunks, sr)):
+                if mfcc_features.size > 0:
+                    regions.append(region)
+                    all_features.append(np.mean(mfcc_features, axis=0))
+        
+        # Pass 1: VAD and features, carrying state across blocks
+        blocks = iter_blocks(file_path, sr, block_size)
+        while True:
+            with timed(timings, 'load'):
+                block = next(blocks, None)
+            if block is None:
+                break
+            buffer.append(block)
+            with timed(timings, 'vad'):
+                closed = vad.feed(block)
+            with timed(timings, 'features'):
+                extract(closed)
+            buffer.discard_before(vad.earliest_needed_sample)
+            report(10 + int(70 * min(buffer.end / total_samples, 1.0)))
+        with timed(timings, 'vad'):
+            closed = vad.flush()
+        with timed(timings, 'features'):
+            extract(closed)
+        if self.energy_gate_db is not None:
+            logger.info(f"Energy gate skipped {vad.vad_calls_skipped} of {vad.frames} VAD calls")
+        
+        if not regions:
+            logger.warning("No speech segments detected")
+            return {"success": False, "error": "No speech detected"}
+        
+        # Cluster features to identify speakers
+        report(80)
+        features = np.array(all_features)
+        with timed(timings, 'clustering'):
+            speaker_labels = self._identify_speakers(features, self.max_speakers, self.speaker_count)
+        
+        # Speaker audio is rendered from the source when requested
+        report(90)
+        with timed(timings, 'output'):
+            result = self._generate_speaker_segments(speaker_labels, regions, sr, file_path, features)
+        result["vad"] = {"frames": vad.frames, "vad_calls_skipped": vad.vad_calls_skipped}
+        result["timings"] = timings
+        result["audio_duration"] = buffer.end / sr
+        report(100)
+        
+        return result
     
-    def _detect_speech(self, audio, sample_rate):
+    def _detect_speech(self, audio, sample_rate, stats=None):
         """
-        Detect speech segments in audio using WebRTC VAD
+        Detect speech regions in audio using WebRTC VAD
+        
+        Frames are taken as zero-copy views of a single int16 buffer and
+        voiced frames are merged with vectorized run detection, so no audio
+        is copied per frame or per segment. With energy_gate_db set, frames
+        near the noise floor skip the VAD.
         
         Args:
             audio: Audio data as numpy array
             sample_rate: Sample rate
+            stats: Optional dictionary receiving the number of frames and
+                of VAD calls skipped by the energy gate
             
         Returns:
-            List of tuples (start_time, end_time, audio_segment)
+            List of (start_sample, end_sample) tuples, end exclusive
         """
         logger.debug("Detecting speech segments")
         
-        # Convert float audio to int16
-        audio_int16 = (audio * 32768).astype(np.int16)
+        # Convert float audio to int16 once
+        audio_int16 = float_to_int16(audio)
         
-        # Calculate frame size and padding
+        # A fresh VAD per call keeps the detector free of shared state
+        vad = webrtcvad.Vad(self.vad_aggressiveness)
+        
+        # Calculate frame size
         frame_size = int(sample_rate * self.frame_duration_ms / 1000)
+        n_samples = len(audio_int16)
         
-        # Pad the audio to ensure full frames
-        padding = frame_size - (len(audio_int16) % frame_size)
-        if padding < frame_size:
-            audio_int16 = np.pad(audio_int16, (0, padding), 'constant')
-        
-        # Create frames for VAD
-        frames = [audio_int16[i:i+frame_size] for i in range(0, len(audio_int16), frame_size)]
-        
-        # Use VAD to detect speech
-        speech_frames = []
-        for i, frame in enumerate(frames):
-            is_speech = self.vad.is_speech(frame.tobytes(), sample_rate)
-            if is_speech:
-                start_sample = i * frame_size
-                end_sample = (i + 1) * frame_size
-                start_time = start_sample / sample_rate
-                end_time = end_sample / sample_rate
-                speech_frames.append((start_time, end_time, audio[start_sample:end_sample]))
-        
-        # Merge adjacent speech frames
-        merged_segments = []
-        if speech_frames:
-            current_start, current_end, current_audio = speech_frames[0]
-            current_audio_list = [current_audio]
-            
-            for start, end, segment_audio in speech_frames[1:]:
-                # If this segment starts right after the current one ends
-                if abs(start - current_end) < 0.05:  # 50ms threshold
-                    # Extend the current segment
-                    current_end = end
-                    current_audio_list.append(segment_audio)
-                else:
-                    # Save the current segment and start a new one
-                    merged_audio = np.concatenate(current_audio_list)
-                    merged_segments.append((current_start, current_end, merged_audio))
-                    current_start, current_end, current_audio = start, end, segment_audio
-                    current_audio_list = [current_audio]
-            
-            # Add the last segment
-            merged_audio = np.concatenate(current_audio_list)
-            merged_segments.append((current_start, current_end, merged_audio))
+        if n_samples == 0:
+            return []
+        
+        # Frames that are clearly silence never reach the VAD
+        skip = None
+        if self.energy_gate_db is not None:
+            skip = energy_gate(audio_int16, frame_size, sample_rate, self.energy_gate_db)
+        
+        # Run VAD over byte views of the buffer (long signals shard by shard
+        # in parallel) and find runs of voiced frames
+        if self._sharded_vad is not None:
+            voiced = self._sharded_vad.decisions(audio_int16, frame_size, sample_rate, skip=skip)
+        else:
+            voiced = vad_decisions(vad, audio_int16, frame_size, sample_rate, skip=skip)
+        starts, ends = voiced_runs(voiced)
         
-        # Filter segments that are too short
+        skipped = 0 if skip is None else int(skip.sum())
+        if stats is not None:
+            stats.update(frames=len(voiced), vad_calls_skipped=skipped)
+        if skip is not None:
+            logger.info(f"Energy gate skipped {skipped} of {len(voiced)} VAD calls")
+        
+        # Merge runs separated by less than 50ms of non-speech
+        if len(starts) > 1:
+            gap_ms = (starts[1:] - ends[:-1]) * self.frame_duration_ms
+            split = gap_ms >= 50
+            starts = starts[np.concatenate(([True], split))]
+            ends = ends[np.concatenate((split, [True]))]
+        
+        # Convert to sample ranges and filter regions that are too short
+        start_samples = starts * frame_size
+        end_samples = np.minimum(ends * frame_size, n_samples)
         min_samples = int(self.min_speech_duration_ms * sample_rate / 1000)
-        filtered_segments = []
-        for start, end, segment_audio in merged_segments:
-            if len(segment_audio) >= min_samples:
-                filtered_segments.append((start, end, segment_audio))
+        keep = (end_samples - start_samples) >= min_samples
         
-        logger.debug(f"Detected {len(filtered_segments)} speech segments")
-        return filtered_segments
+        regions = list(zip(start_samples[keep].tolist(), end_samples[keep].tolist()))
+        
+        logger.debug(f"Detected {len(regions)} speech segments")
+        return regions
     
-    def _identify_speakers(self, features, max_speakers=2):
+    def _identify_speakers(self, features, max_speakers=2, speaker_count=None, clustering=None):
         """
         Identify speakers using clustering on MFCC features
         
         Args:
             features: MFCC features for each segment
             max_speakers: Maximum number of speakers to identify
+            speaker_count: Optional criterion for estimating the number of
+                speakers between 1 and max_speakers; without one exactly
+                max_speakers clusters are used
+            clustering: Clustering backend, the instance's if None
             
         Returns:
             Array of speaker labels for each segment
         """
         logger.debug(f"Identifying speakers with max_speakers={max_speakers}")
         
+        if speaker_count is not None:
+            n_speakers, labels = estimate_num_speakers(
+                features, max_speakers=max_speakers, criterion=speaker_count
+            )
+            logger.debug(f"Estimated {n_speakers} speakers ({speaker_count})")
+            return labels
+        
         # Determine number of speakers (up to max_speakers)
         n_speakers = min(max_speakers, len(features))
         
         if n_speakers <= 1:
             return np.zeros(len(features), dtype=int)
         
-        # Try with KMeans first
+        backend = clustering or self.clustering
+        if backend not in CLUSTERING_BACKENDS:
+            raise ValueError(f"Unsupported clustering backend: {backend}")
+        
         try:
-            kmeans = KMeans(n_clusters=n_speakers, random_state=0, n_init=10)
-            labels = kmeans.fit_predict(features)
-            
-            # Check if the clustering seems reasonable (some segments for each speaker)
-            unique, counts = np.unique(labels, return_counts=True)
-            if len(unique) < n_speakers or any(count < 2 for count in counts):
-                # Try Gaussian Mixture Model as backup
-                gmm = GaussianMixture(n_components=n_speakers, random_state=0, n_init=10)
-                labels = gmm.fit_predict(features)
+            labels = cluster(features, n_speakers, backend)
         except Exception as e:
             logger.error(f"Error during speaker clustering: {e}")
             # Fallback to simple binary classification if clustering fails
@@ -247,73 +514,123 @@ class Diarizer:
         logger.debug(f"Speaker identification complete, found {len(np.unique(labels))} speakers")
         return labels
     
-    def _generate_speaker_segments(self, speaker_labels, segment_times, audio_chunks, sample_rate):
+    def recluster_session(self, session_id, num_speakers, speaker_count=None, clustering=None):
+        """
+        Re-cluster an existing session into a different number of speakers
+        
+        Only clustering and output generation are run, on the features
+        saved with the session; the result is a new session sharing the
+        original's source audio.
+        
+        Args:
+            session_id: ID of the session to re-cluster
+            num_speakers: Number of speakers to identify, or the maximum
+                when speaker_count is given
+            speaker_count: Optional criterion for estimating the number of
+                speakers ('eigengap' or 'silhouette')
+            clustering: Clustering backend, the instance's if None
+            
+        Returns:
+            Dictionary with diarization results
+        """
+        session_path = self.session_store.path(session_id)
+        session = load_session(session_path)
+        features_path = os.path.join(session_path, FEATURES_FILE)
+        if session is None or not os.path.exists(features_path):
+            return {"success": False, "error": "Session not found"}
+        
+        timings = {}
+        with timed(timings, 'load'), np.load(features_path) as saved:
+            features = saved["features"].astype(np.float64)
+            regions = [tuple(region) for region in saved["regions"].tolist()]
+        
+        with timed(timings, 'clustering'):
+            speaker_labels = self._identify_speakers(features, num_speakers, speaker_count, clustering)
+        with timed(timings, 'output'):
+            result = self._generate_speaker_segments(
+                speaker_labels, regions, session["sample_rate"],
+                os.path.join(session_path, session["source"]), features
+            )
+        result["timings"] = timings
+        return result
+    
+    def _generate_speaker_segments(self, speaker_labels, regions, sample_rate, source,
+                                   features=None):
         """
         Generate final output with separated speaker segments
         
+        Only the segment index and a reference to the source audio are
+        stored; speaker WAVs are rendered on first request (see
+        diarizer.rendering). Each speaker's "url" is the API endpoint that
+        renders it; in-process callers use rendering.render_speaker_file.
+        
         Args:
             speaker_labels: Array of speaker IDs for each segment
-            segment_times: List of (start, end) times for each segment
-            audio_chunks: List of audio data for each segment
-            sample_rate: Sample rate
+            regions: List of (start_sample, end_sample) ranges per segment
+            sample_rate: Sample rate the ranges refer to
+            source: Path to the source audio, its WAV bytes, or the audio
+                samples themselves
+            features: Optional per-segment feature matrix, saved with the
+                session (float32) so it can be re-clustered later
             
         Returns:
             Dictionary with diarization results
         """
         logger.debug("Generating speaker segments")
         
-        # Create a unique output directory
-        session_id = str(uuid.uuid4())
-        output_path = os.path.join(self.temp_dir, session_id)
-        os.makedirs(output_path, exist_ok=True)
+        # Assemble the session in a staging directory
+        session_id, staging_path = self.session_store.create()
+        output_path = self.session_store.path(session_id)
+        source_name = self._store_source(source, sample_rate, staging_path)
+        if features is not None:
+            np.savez(os.path.join(staging_path, FEATURES_FILE),
+                     features=np.asarray(features, dtype=np.float32),
+                     regions=np.asarray(regions, dtype=np.int64).reshape(-1, 2))
         
         # Group segments by speaker
-        speaker_segments = {}
-        for i, label in enumerate(speaker_labels):
-            speaker_id = f"speaker_{label}"
-            if speaker_id not in speaker_segments:
-                speaker_segments[speaker_id] = []
-            
-            speaker_segments[speaker_id].append({
-                "start": segment_times[i][0],
-                "end": segment_times[i][1],
-                "audio": audio_chunks[i]
-            })
+        speaker_ranges = {}
+        for (start, end), label in sorted(zip(regions, speaker_labels)):
+            speaker_ranges.setdefault(f"speaker_{label}", []).append((int(start), int(end)))
         
         # Create output for each speaker
         output_files = {}
-        for speaker_id, segments in speaker_segments.items():
-            # Sort segments by start time
-            segments.sort(key=lambda x: x["start"])
-            
+        for speaker_id, ranges in sorted(speaker_ranges.items()):
             # Prepare detailed segment info
             segment_info = [{
-                "start": segment["start"], 
-                "end": segment["end"],
-                "duration": segment["end"] - segment["start"]
-            } for segment in segments]
-            
-            # Concatenate audio for this speaker
-            speaker_audio = np.concatenate([segment["audio"] for segment in segments])
-            
-            # Generate output file path
-            output_file = os.path.join(output_path, f"{speaker_id}.wav")
-            
-            # Save the audio file
-            audio_int16 = (speaker_audio * 32768).astype(np.int16)
-            with wave.open(output_file, 'wb') as wf:
-                wf.setnchannels(1)
-                wf.setsampwidth(2)  # 16-bit audio
-                wf.setframerate(sample_rate)
-                wf.writeframes(audio_int16.tobytes())
+                "start": start / sample_rate,
+                "end": end / sample_rate,
+                "duration": (end - start) / sample_rate
+            } for start, end in ranges]
             
             output_files[speaker_id] = {
-                "file_path": output_file,
+                "url": f"/api/segments/{session_id}/{speaker_id}",
                 "segments": segment_info,
                 "total_duration": sum(s["duration"] for s in segment_info)
             }
         
-        logger.debug(f"Generated {len(output_files)} speaker files")
+        write_json_atomic(os.path.join(staging_path, SESSION_FILE), {
+            "session_id": session_id,
+            "sample_rate": sample_rate,
+            "source": source_name,
+            "speakers": {
+                speaker_id: {"ranges": ranges}
+                for speaker_id, ranges in speaker_ranges.items()
+            }
+        })
+        
+        # Publish it; the index holds what /api/info needs
+        self.session_store.commit(session_id, {
+            "num_speakers": len(output_files),
+            "speakers": {
+                speaker_id: {
+                    "num_segments": len(info["segments"]),
+                    "total_duration": info["total_duration"]
+                }
+                for speaker_id, info in output_files.items()
+            }
+        })
+        
+        logger.debug(f"Indexed {len(output_files)} speakers for session {session_id}")
         
         return {
             "success": True,
@@ -322,3 +639,37 @@ class Diarizer:
             "speakers": output_files,
             "temp_dir": output_path
         }
+    
+    def _store_source(self, source, sample_rate, output_path):
+        """
+        Keep the session's source audio next to its segment index
+        
+        Files are hard-linked when possible (copied otherwise), WAV bytes
+        are written as-is and in-memory audio is saved as 16-bit WAV.
+        
+        Args:
+            source: Path, WAV bytes or numpy audio
+            sample_rate: Sample rate of in-memory audio
+            output_path: Session directory
+            
+        Returns:
+            File name of the stored source within the session directory
+        """
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            name = "source.wav"
+            with open(os.path.join(output_path, name), 'wb') as f:
+                f.write(source)
+            return name
+        
+        if isinstance(source, np.ndarray):
+            name = "source.wav"
+            write_wave(os.path.join(output_path, name), float_to_int16(source), sample_rate)
+            return name
+        
+        name = "source" + os.path.splitext(source)[1].lower()
+        target = os.path.join(output_path, name)
+        try:
+            os.link(source, target)
+        except OSError:
+            shutil.copyfile(source, target)
+        return name
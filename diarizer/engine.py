@@ -0,0 +1,321 @@
+"""
+Process-pool execution engine for diarization requests.
+
+CPU-heavy work (decoding, MFCC extraction, clustering) runs in a pool of
+warm worker processes so a single API process can use every core. The
+number of in-flight requests is bounded; once workers and queue are full,
+new submissions fail fast with EngineBusy instead of waiting. If a worker
+dies (e.g. killed for running out of memory) the pool is replaced, and the
+requests it was running fail with EngineBusy so clients retry.
+"""
+import os
+import time
+import inspect
+import itertools
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from threading import BoundedSemaphore, Lock, Thread
+
+from .core import Diarizer
+from .result_cache import RESULT_PARAMS
+
+logger = logging.getLogger(__name__)
+
+# Diarizer methods whose results depend only on their audio argument
+CACHEABLE_METHODS = ('process_audio_file', 'process_audio_bytes')
+
+# Diarizer instance and progress channel owned by each worker process
+_worker_diarizer = None
+_progress_queue = None
+
+
+class EngineBusy(Exception):
+    """
+    Raised when the engine queue is full
+    """
+    def __init__(self, retry_after):
+        super().__init__("Diarization queue is full")
+        self.retry_after = retry_after
+
+
+def _init_worker(diarizer_kwargs, progress_queue):
+    """
+    Initialize a worker process: import heavy libraries and build the
+    worker's Diarizer once
+    """
+    global _worker_diarizer, _progress_queue
+    from multiprocessing.util import Finalize
+    import numpy as np
+    import librosa  # noqa: F401
+    import sklearn.cluster  # noqa: F401
+    import sklearn.mixture  # noqa: F401
+    from .core import Diarizer
+    from .feature_extraction import extract_mfcc
+    
+    _worker_diarizer = Diarizer(**diarizer_kwargs)
+    _progress_queue = progress_queue
+    
+    # Pool workers leave through os._exit, which skips atexit; stop the
+    # sharded VAD's processes with the worker. The priority runs this
+    # before the VAD pool's queues close their feeder threads (priority 10)
+    Finalize(_worker_diarizer, _worker_diarizer.close, exitpriority=100)
+    
+    # Touch the MFCC path so first requests don't pay lazy initialization
+    extract_mfcc(np.zeros(1600, dtype=np.float32), _worker_diarizer.sample_rate)
+    logger.debug(f"Diarization worker {os.getpid()} ready")
+
+
+def _warm_up():
+    """No-op task used to start worker processes ahead of traffic"""
+    return os.getpid()
+
+
+def _with_queue_wait(result, wait):
+    """Add the time a task waited for a worker to its result's timings"""
+    if isinstance(result, dict) and wait is not None:
+        result.setdefault("timings", {})["queue_wait"] = wait
+    return result
+
+
+def _run(method, args, submitted=None):
+    """Call a Diarizer method inside a worker process"""
+    wait = None if submitted is None else max(time.time() - submitted, 0.0)
+    return _with_queue_wait(getattr(_worker_diarizer, method)(*args), wait)
+
+
+def _run_with_progress(task_id, method, args, submitted=None):
+    """Call a Diarizer method, forwarding progress updates to the parent"""
+    wait = None if submitted is None else max(time.time() - submitted, 0.0)
+    last = [-1]
+    
+    def progress(pct):
+        if pct != last[0]:
+            last[0] = pct
+            _progress_queue.put((task_id, pct))
+    
+    return _with_queue_wait(getattr(_worker_diarizer, method)(*args, progress=progress), wait)
+
+
+class DiarizationEngine:
+    """
+    Bounded pool of warm diarization worker processes
+    """
+    
+    def __init__(self, max_workers=None, queue_depth=None, diarizer_kwargs=None,
+                 retry_after=5, result_cache=None, metrics=None):
+        """
+        Initialize the engine and start its workers
+        
+        Args:
+            max_workers: Number of worker processes (defaults to CPU count)
+            queue_depth: Number of requests allowed to wait for a free
+                worker (defaults to max_workers)
+            diarizer_kwargs: Keyword arguments for each worker's Diarizer
+            retry_after: Seconds clients should wait when the queue is full
+            result_cache: Optional ResultCache answering repeated audio
+                without running the pipeline again
+            metrics: Optional DiarizationMetrics recording stage timings,
+                queue wait and outcome of every pipeline run
+        """
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.queue_depth = self.max_workers if queue_depth is None else queue_depth
+        self.retry_after = retry_after
+        self._slots = BoundedSemaphore(self.max_workers + self.queue_depth)
+        self.result_cache = result_cache
+        self.metrics = metrics
+        
+        # Each worker's sharded VAD starts its own pool; share the cores
+        # between them rather than starting workers x vad_workers processes
+        diarizer_kwargs = dict(diarizer_kwargs or {})
+        vad_workers = diarizer_kwargs.get('vad_workers')
+        if vad_workers and vad_workers > 1:
+            budget = max(1, (os.cpu_count() or 1) // self.max_workers)
+            if vad_workers > budget:
+                logger.warning(f"Limiting vad_workers from {vad_workers} to {budget} "
+                               f"for {self.max_workers} engine workers")
+                diarizer_kwargs['vad_workers'] = budget
+        
+        # Parameters that identify a result, with the Diarizer's defaults
+        defaults = {
+            name: parameter.default
+            for name, parameter in inspect.signature(Diarizer.__init__).parameters.items()
+        }
+        defaults.update(diarizer_kwargs)
+        self.result_params = {name: defaults[name] for name in RESULT_PARAMS}
+        
+        # Progress updates from workers are routed to per-task callbacks
+        context = multiprocessing.get_context('spawn')
+        self._progress_queue = context.Queue()
+        self._progress_callbacks = {}
+        self._progress_lock = Lock()
+        self._task_ids = itertools.count()
+        self._progress_thread = Thread(target=self._dispatch_progress, daemon=True)
+        self._progress_thread.start()
+        
+        self._context = context
+        self._diarizer_kwargs = diarizer_kwargs
+        self._executor_lock = Lock()
+        self._executor = self._start_executor()
+        
+        logger.debug(f"Started diarization engine with {self.max_workers} workers, "
+                     f"queue depth {self.queue_depth}")
+    
+    def _start_executor(self):
+        """Start a pool of worker processes and warm them up"""
+        # Spawn keeps workers independent of the (threaded) parent's state
+        executor = ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=self._context,
+            initializer=_init_worker,
+            initargs=(self._diarizer_kwargs, self._progress_queue)
+        )
+        for _ in range(self.max_workers):
+            executor.submit(_warm_up)
+        return executor
+    
+    def _restart(self, broken):
+        """Replace a pool that lost a worker, unless another thread already did"""
+        with self._executor_lock:
+            if self._executor is not broken:
+                return
+            logger.warning("Diarization worker died, restarting the worker pool")
+            broken.shutdown(wait=False, cancel_futures=True)
+            self._executor = self._start_executor()
+    
+    def _dispatch_progress(self):
+        """Forward (task_id, percentage) updates to registered callbacks"""
+        while True:
+            message = self._progress_queue.get()
+            if message is None:
+                return
+            task_id, pct = message
+            with self._progress_lock:
+                callback = self._progress_callbacks.get(task_id)
+            if callback:
+                try:
+                    callback(pct)
+                except Exception as e:
+                    logger.error(f"Error in progress callback: {e}")
+    
+    def submit(self, method, *args, progress=None, wait=False):
+        """
+        Submit a Diarizer method call to the pool
+        
+        Args:
+            method: Name of the Diarizer method to call
+            *args: Arguments for the method (must be picklable)
+            progress: Optional callable receiving completion percentage,
+                called from a background thread of this process
+            wait: Block until a queue slot is free instead of raising
+                EngineBusy when the queue is full
+            
+        Returns:
+            concurrent.futures.Future with the method's return value
+            
+        Raises:
+            EngineBusy: If all workers are busy and the queue is full
+                (unless wait is set), or the pool is being restarted after
+                a worker died
+        """
+        # The slot is taken before the cache lookup, so a waiting caller
+        # never blocks other requests while holding the cache lock
+        reserved = wait and self._slots.acquire()
+        
+        def start():
+            nonlocal reserved
+            held, reserved = reserved, False
+            return self._submit(method, args, progress, held)
+        
+        try:
+            if self.result_cache is not None and method in CACHEABLE_METHODS:
+                key = self.result_cache.key(args[0], self.result_params)
+                return self.result_cache.get_or_submit(key, start)
+            return start()
+        finally:
+            # Answered from the cache, or failed before starting a task
+            if reserved:
+                self._slots.release()
+    
+    def _submit(self, method, args, progress, reserved=False):
+        """Start a task in the pool, taking a queue slot unless one is reserved"""
+        if not reserved and not self._slots.acquire(blocking=False):
+            raise EngineBusy(self.retry_after)
+        
+        task_id = None
+        submitted = time.time()
+        with self._executor_lock:
+            executor = self._executor
+        try:
+            if progress is None:
+                future = executor.submit(_run, method, args, submitted)
+            else:
+                task_id = next(self._task_ids)
+                with self._progress_lock:
+                    self._progress_callbacks[task_id] = progress
+                future = executor.submit(_run_with_progress, task_id, method, args, submitted)
+        except BrokenProcessPool:
+            self._forget(task_id)
+            self._restart(executor)
+            raise EngineBusy(self.retry_after)
+        except Exception:
+            self._forget(task_id)
+            raise
+        
+        future.add_done_callback(lambda _: self._forget(task_id))
+        future.add_done_callback(lambda done: self._check_broken(executor, done))
+        if self.metrics is not None:
+            future.add_done_callback(lambda done: self._observe(method, done))
+        return future
+    
+    def _observe(self, method, future):
+        """Record a finished task in the metrics"""
+        if future.cancelled():
+            return
+        error = future.exception()
+        try:
+            self.metrics.observe_run(method, None if error else future.result(), error)
+        except Exception as e:
+            logger.error(f"Error recording metrics: {e}")
+    
+    def _check_broken(self, executor, future):
+        """Restart the pool when a task failed because a worker died"""
+        if not future.cancelled() and isinstance(future.exception(), BrokenProcessPool):
+            self._restart(executor)
+    
+    def _forget(self, task_id):
+        """Release a queue slot and drop the task's progress callback"""
+        if task_id is not None:
+            with self._progress_lock:
+                self._progress_callbacks.pop(task_id, None)
+        self._slots.release()
+    
+    def run(self, method, *args, timeout=None):
+        """
+        Submit a Diarizer method call and wait for its result
+        
+        Args:
+            method: Name of the Diarizer method to call
+            *args: Arguments for the method
+            timeout: Maximum seconds to wait, or None
+            
+        Returns:
+            The method's return value
+            
+        Raises:
+            EngineBusy: If the queue is full, or a worker died while
+                running the call
+        """
+        try:
+            return self.submit(method, *args).result(timeout=timeout)
+        except BrokenProcessPool:
+            raise EngineBusy(self.retry_after)
+    
+    def shutdown(self, wait=True):
+        """
+        Stop the worker processes
+        """
+        with self._executor_lock:
+            self._executor.shutdown(wait=wait)
+        self._progress_queue.put(None)
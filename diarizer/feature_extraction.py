@@ -1,10 +1,29 @@
+import os
 import numpy as np
 import librosa
 import logging
+from . import mfcc as numpy_mfcc
 
 logger = logging.getLogger(__name__)
 
-def extract_mfcc(audio, sample_rate, n_mfcc=13, n_fft=512, hop_length=160):
+# MFCC implementation used when no backend is given: 'librosa' or 'numpy'
+MFCC_BACKEND = os.environ.get('DIARIZER_MFCC_BACKEND', 'librosa')
+
+def as_float_audio(audio):
+    """
+    Return audio as float32 in [-1, 1], converting int16 PCM if needed
+    
+    Args:
+        audio: Audio signal as numpy array
+        
+    Returns:
+        Float audio as numpy array
+    """
+    if audio.dtype == np.int16:
+        return audio.astype(np.float32) / 32768.0
+    return audio
+
+def extract_mfcc(audio, sample_rate, n_mfcc=13, n_fft=512, hop_length=160, backend=None):
     """
     Extract MFCC features from an audio signal
     
@@ -14,16 +33,26 @@ def extract_mfcc(audio, sample_rate, n_mfcc=13, n_fft=512, hop_length=160):
         n_mfcc: Number of MFCC coefficients to extract
         n_fft: FFT window size
         hop_length: Hop length for FFT
+        backend: 'librosa' or 'numpy' (defaults to MFCC_BACKEND)
         
     Returns:
         MFCC features as numpy array
     """
+    backend = backend or MFCC_BACKEND
     try:
         # Ensure audio is not empty
         if len(audio) == 0:
             logger.warning("Empty audio provided to MFCC extraction")
             return np.array([])
         
+        audio = as_float_audio(audio)
+        
+        if backend == 'numpy':
+            return numpy_mfcc.mfcc(audio, sample_rate, n_mfcc=n_mfcc, n_fft=n_fft,
+                                   hop_length=hop_length)
+        if backend != 'librosa':
+            raise ValueError(f"Unsupported MFCC backend: {backend}")
+        
         # Extract MFCCs
         mfccs = librosa.feature.mfcc(
             y=audio, 
@@ -49,6 +78,104 @@ def extract_mfcc(audio, sample_rate, n_mfcc=13, n_fft=512, hop_length=160):
         logger.error(f"Error extracting MFCC features: {e}")
         return np.array([])
 
+def extract_mfcc_batch(segments, sample_rate, n_mfcc=13, n_fft=512, hop_length=160,
+                       backend=None):
+    """
+    Extract MFCC features from many audio segments
+    
+    The numpy backend transforms all segments with batched FFTs; the
+    librosa backend processes them one at a time.
+    
+    Args:
+        segments: List of audio signals as numpy arrays
+        sample_rate: Sample rate of the audio
+        n_mfcc: Number of MFCC coefficients to extract
+        n_fft: FFT window size
+        hop_length: Hop length for FFT
+        backend: 'librosa' or 'numpy' (defaults to MFCC_BACKEND)
+        
+    Returns:
+        List of MFCC feature arrays, empty for segments that failed
+    """
+    backend = backend or MFCC_BACKEND
+    if backend != 'numpy':
+        return [extract_mfcc(segment, sample_rate, n_mfcc, n_fft, hop_length, backend)
+                for segment in segments]
+    
+    try:
+        segments = [as_float_audio(segment) for segment in segments]
+        return numpy_mfcc.mfcc_batch(segments, sample_rate, n_mfcc=n_mfcc, n_fft=n_fft,
+                                     hop_length=hop_length)
+    except Exception as e:
+        logger.error(f"Error extracting MFCC features: {e}")
+        return [np.array([]) for _ in segments]
+
+def extract_region_features(audio, sample_rate, regions, n_mfcc=13, n_fft=512,
+                            hop_length=160, block_frames=6000, voiced_only=True,
+                            backend=None):
+    """
+    Extract the mean MFCC+delta vector of many regions from one framewise pass
+    
+    MFCCs are computed once over the signal, block by block so memory stays
+    bounded, and each region's mean is taken from prefix sums of the frames
+    it covers. This avoids re-running the full MFCC setup for every region.
+    
+    Args:
+        audio: Audio signal as numpy array
+        sample_rate: Sample rate of the audio
+        regions: List of (start_sample, end_sample) tuples, end exclusive
+        n_mfcc: Number of MFCC coefficients to extract
+        n_fft: FFT window size
+        hop_length: Hop length for FFT
+        block_frames: Number of frames computed per block
+        voiced_only: Skip blocks that do not overlap any region
+        backend: 'librosa' or 'numpy' (defaults to MFCC_BACKEND)
+        
+    Returns:
+        Array of shape (len(regions), 3 * n_mfcc) with one mean feature
+        vector per region
+    """
+    n_dims = 3 * n_mfcc
+    if len(regions) == 0 or len(audio) == 0:
+        return np.zeros((len(regions), n_dims), dtype=np.float32)
+    
+    # Frame ranges of each region (frames are centered on multiples of hop)
+    bounds = np.asarray(regions, dtype=np.int64)
+    first = bounds[:, 0] // hop_length
+    last = np.maximum(bounds[:, 1] // hop_length, first + 1)
+    
+    n_frames = 1 + len(audio) // hop_length
+    last = np.minimum(last, n_frames)
+    sums = np.zeros((len(regions), n_dims), dtype=np.float64)
+    
+    # Context frames on each side so block edges don't affect STFT and deltas
+    margin = n_fft // hop_length + 8
+    
+    for block_start in range(0, n_frames, block_frames):
+        block_end = min(block_start + block_frames, n_frames)
+        overlap = np.flatnonzero((first < block_end) & (last > block_start))
+        if voiced_only and len(overlap) == 0:
+            continue
+        
+        ctx_start = max(block_start - margin, 0)
+        ctx_end = min(block_end + margin, n_frames)
+        block = audio[ctx_start * hop_length:(ctx_end - 1) * hop_length + 1]
+        
+        features = extract_mfcc(block, sample_rate, n_mfcc=n_mfcc, n_fft=n_fft,
+                                hop_length=hop_length, backend=backend)
+        if features.size == 0:
+            continue
+        features = features[block_start - ctx_start:block_end - ctx_start]
+        
+        # Prefix sums over the block give each region's sum in O(1)
+        prefix = np.zeros((len(features) + 1, n_dims), dtype=np.float64)
+        np.cumsum(features, axis=0, out=prefix[1:])
+        a = np.maximum(first[overlap], block_start) - block_start
+        b = np.minimum(last[overlap], block_end) - block_start
+        sums[overlap] += prefix[b] - prefix[a]
+    
+    return (sums / (last - first)[:, None]).astype(np.float32)
+
 def extract_energy(audio, n_fft=512, hop_length=160):
     """
     Extract energy features from an audio signal
@@ -74,6 +201,34 @@ def extract_energy(audio, n_fft=512, hop_length=160):
         logger.error(f"Error extracting energy features: {e}")
         return np.array([])
 
+def extract_frame_energy(audio, frame_size, pad_tail=True):
+    """
+    Extract the mean-square energy of consecutive non-overlapping frames
+    
+    By Parseval's theorem this is the STFT energy of extract_energy for a
+    rectangular window without overlap, divided by the frame size, so no
+    FFT is needed. int16 input is scaled to [-1, 1] full scale.
+    
+    Args:
+        audio: Audio signal as numpy array (float or int16)
+        frame_size: Samples per frame
+        pad_tail: Include a zero-padded trailing partial frame
+        
+    Returns:
+        float64 numpy array with one energy value per frame
+    """
+    n_full = len(audio) // frame_size
+    frames = audio[:n_full * frame_size].reshape(n_full, frame_size)
+    energy = np.einsum('ij,ij->i', frames, frames, dtype=np.float64) / frame_size
+    
+    if pad_tail and n_full * frame_size < len(audio):
+        tail = np.asarray(audio[n_full * frame_size:], dtype=np.float64)
+        energy = np.append(energy, np.dot(tail, tail) / frame_size)
+    
+    if audio.dtype == np.int16:
+        energy /= 32768.0 ** 2
+    return energy
+
 def extract_features(audio, sample_rate):
     """
     Extract all features for speaker diarization
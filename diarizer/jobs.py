@@ -0,0 +1,336 @@
+"""
+Asynchronous diarization jobs.
+
+Jobs are submitted to the DiarizationEngine from a small dispatcher pool,
+so callers get a job id immediately and poll for status, progress and the
+result. Job records are kept in SQLite so that every server process can
+report on any job. An optional webhook is notified when a job finishes;
+webhooks to private, loopback and link-local addresses are refused unless
+their host is explicitly allowed.
+"""
+import os
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import logging
+import ipaddress
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from threading import Lock
+
+from .engine import EngineBusy
+
+logger = logging.getLogger(__name__)
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    """Refuse redirects, which could point a checked webhook elsewhere"""
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+_webhook_opener = urllib.request.build_opener(_NoRedirect)
+
+
+def webhook_allowed(url, allowed_hosts=None):
+    """
+    Check whether the server may POST to a webhook URL
+    
+    Args:
+        url: Webhook URL
+        allowed_hosts: Optional collection of host names or addresses; if
+            given, only these hosts are allowed (private ones included)
+            
+    Returns:
+        True if the URL is http(s) and its host is allowed, or resolves
+        only to public addresses when no allowlist is set
+    """
+    try:
+        parsed = urllib.parse.urlsplit(url)
+        host = parsed.hostname
+        port = parsed.port
+    except ValueError:
+        return False
+    if parsed.scheme not in ('http', 'https') or not host:
+        return False
+    
+    if allowed_hosts:
+        return host.lower() in {h.lower() for h in allowed_hosts}
+    
+    try:
+        addresses = {info[4][0] for info in socket.getaddrinfo(host, port or 80)}
+    except (socket.gaierror, UnicodeError):
+        return False
+    for address in addresses:
+        ip = ipaddress.ip_address(address.split('%')[0])
+        if not ip.is_global or ip.is_multicast:
+            return False
+    return bool(addresses)
+
+
+def _process_alive(pid):
+    """Check whether a process on this host is still running"""
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class JobManager:
+    """
+    Tracks asynchronous diarization jobs run on a DiarizationEngine
+    
+    Job records live in a SQLite database that all server processes on
+    the host share (the session index), so any process can answer for a
+    job. Each job is dispatched by the process that accepted it.
+    """
+    
+    def __init__(self, engine, index_path, max_jobs=1000, max_pending=100, webhook_timeout=10,
+                 webhook_hosts=None):
+        """
+        Initialize the job manager
+        
+        Args:
+            engine: DiarizationEngine (or a callable returning one) that
+                runs the jobs
+            index_path: SQLite database holding the job records, shared
+                with the other server processes (e.g. the session store's
+                index)
+            max_jobs: Number of job records kept; the oldest finished jobs
+                are dropped first
+            max_pending: Number of queued and running jobs (each holding
+                its uploaded file) this process accepts before refusing
+                submissions
+            webhook_timeout: Timeout in seconds for completion webhooks
+            webhook_hosts: Optional hosts webhooks may be sent to; without
+                it only hosts with public addresses are allowed
+        """
+        self._engine = engine
+        self.index_path = index_path
+        self.max_jobs = max_jobs
+        self.max_pending = max_pending
+        self.webhook_timeout = webhook_timeout
+        self.webhook_hosts = set(webhook_hosts or ())
+        self._pending = 0
+        self._lock = Lock()
+        self._dispatcher = None
+        
+        with closing(self._connect()) as db, db:
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    job_id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    progress NUMERIC NOT NULL,
+                    created REAL NOT NULL,
+                    updated REAL NOT NULL,
+                    result TEXT,
+                    error TEXT,
+                    pid INTEGER NOT NULL
+                )
+            """)
+            db.execute("CREATE INDEX IF NOT EXISTS jobs_created ON jobs (created)")
+    
+    def _connect(self):
+        """Open a connection to the job index (one per call, safe across processes)"""
+        db = sqlite3.connect(self.index_path, timeout=30)
+        db.execute("PRAGMA journal_mode=WAL")
+        return db
+    
+    @property
+    def engine(self):
+        """The engine jobs run on"""
+        return self._engine() if callable(self._engine) else self._engine
+    
+    def submit(self, file_path, callback_url=None, remove_file=True):
+        """
+        Queue an audio file for diarization
+        
+        Args:
+            file_path: Path to the audio file
+            callback_url: Optional http(s) URL notified with the final job
+                status
+            remove_file: Delete the file (and its directory if empty) once
+                the job finishes
+            
+        Returns:
+            The new job's ID
+            
+        Raises:
+            EngineBusy: If max_pending jobs are already unfinished
+        """
+        job_id = str(uuid.uuid4())
+        
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise EngineBusy(self.engine.retry_after)
+            self._pending += 1
+            if self._dispatcher is None:
+                self._dispatcher = ThreadPoolExecutor(
+                    max_workers=self.engine.max_workers,
+                    thread_name_prefix='diarization-job'
+                )
+        
+        now = time.time()
+        with closing(self._connect()) as db, db:
+            db.execute(
+                "INSERT INTO jobs VALUES (?, 'queued', 0, ?, ?, NULL, NULL, ?)",
+                (job_id, now, now, os.getpid())
+            )
+            self._evict(db)
+        
+        self._dispatcher.submit(self._run, job_id, file_path, callback_url, remove_file)
+        logger.debug(f"Queued diarization job {job_id}")
+        return job_id
+    
+    def check_capacity(self):
+        """
+        Check that a job could be queued now, before its upload is saved
+        
+        Raises:
+            EngineBusy: If max_pending jobs are already unfinished
+        """
+        with self._lock:
+            full = self._pending >= self.max_pending
+        if full:
+            raise EngineBusy(self.engine.retry_after)
+    
+    def webhook_allowed(self, url):
+        """
+        Check a completion webhook URL against this manager's policy
+        
+        Args:
+            url: Webhook URL
+            
+        Returns:
+            True if jobs may notify the URL
+        """
+        return webhook_allowed(url, self.webhook_hosts)
+    
+    def get(self, job_id):
+        """
+        Get a snapshot of a job's state
+        
+        Unfinished jobs whose dispatching process has exited are reported
+        (and recorded) as failed.
+        
+        Args:
+            job_id: Job ID
+            
+        Returns:
+            Dictionary with the job's status, or None if it is unknown
+        """
+        with closing(self._connect()) as db:
+            row = db.execute(
+                "SELECT job_id, status, progress, created, updated, result, error, pid "
+                "FROM jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        
+        job_id, status, progress, created, updated, result, error, pid = row
+        if status in ("queued", "running") and not _process_alive(pid):
+            error = "The server process running the job exited"
+            self._update(job_id, status="failed", error=error)
+            status, updated = "failed", time.time()
+        
+        return {
+            "job_id": job_id,
+            "status": status,
+            "progress": progress,
+            "created": created,
+            "updated": updated,
+            "result": json.loads(result) if result is not None else None,
+            "error": error
+        }
+    
+    def _update(self, job_id, **fields):
+        """Update the record of an unfinished job"""
+        if "result" in fields:
+            fields["result"] = json.dumps(fields["result"])
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        with closing(self._connect()) as db, db:
+            # Finished jobs stay finished, even if a late progress update arrives
+            db.execute(
+                f"UPDATE jobs SET {columns}, updated = ? "
+                "WHERE job_id = ? AND status IN ('queued', 'running')",
+                (*fields.values(), time.time(), job_id)
+            )
+    
+    def _evict(self, db):
+        """Drop the oldest finished jobs beyond max_jobs"""
+        excess = db.execute("SELECT COUNT(*) FROM jobs").fetchone()[0] - self.max_jobs
+        if excess > 0:
+            db.execute(
+                "DELETE FROM jobs WHERE job_id IN (SELECT job_id FROM jobs "
+                "WHERE status IN ('completed', 'failed') ORDER BY created LIMIT ?)",
+                (excess,)
+            )
+    
+    def _run(self, job_id, file_path, callback_url, remove_file):
+        """Submit a job to the engine, waiting for capacity, and record the outcome"""
+        def submit():
+            return self.engine.submit(
+                'process_audio_file', file_path,
+                progress=lambda pct: self._update(job_id, status="running", progress=pct),
+                wait=True
+            )
+        
+        try:
+            try:
+                future = submit()
+            except EngineBusy:
+                # Raised despite waiting only while the pool of a dead
+                # worker was replaced, which has finished by now
+                future = submit()
+            
+            result = future.result()
+            
+            if result.get("success"):
+                self._update(job_id, status="completed", progress=100, result=result)
+            else:
+                self._update(job_id, status="failed", result=result, error=result.get("error"))
+        
+        except Exception as e:
+            logger.error(f"Error running diarization job {job_id}: {e}")
+            self._update(job_id, status="failed", error=str(e))
+        
+        finally:
+            if remove_file:
+                try:
+                    os.remove(file_path)
+                    os.rmdir(os.path.dirname(file_path))
+                except OSError:
+                    pass
+            with self._lock:
+                self._pending -= 1
+        
+        if callback_url:
+            self._notify(callback_url, self.get(job_id))
+    
+    def _notify(self, callback_url, job):
+        """POST the final job state to a webhook URL"""
+        # Checked again at delivery, since DNS may have changed since submission
+        if not self.webhook_allowed(callback_url):
+            logger.error(f"Refusing to notify webhook {callback_url}: host not allowed")
+            return
+        try:
+            request = urllib.request.Request(
+                callback_url,
+                data=json.dumps(job).encode('utf-8'),
+                headers={'Content-Type': 'application/json'},
+                method='POST'
+            )
+            with _webhook_opener.open(request, timeout=self.webhook_timeout):
+                pass
+            logger.debug(f"Notified {callback_url} of job {job['job_id']}")
+        except Exception as e:
+            logger.error(f"Error notifying webhook {callback_url}: {e}")
@@ -0,0 +1,230 @@
+"""
+Request and pipeline metrics in the Prometheus text exposition format.
+
+Pipeline stages are timed with time.perf_counter into a plain dictionary
+that travels with the result; the serving process aggregates results and
+HTTP requests into counters and histograms and renders them on demand.
+Recording a value is a dictionary lookup and a few additions under one
+lock, so instrumentation costs microseconds per request.
+"""
+import time
+import bisect
+import logging
+from contextlib import contextmanager
+from threading import Lock
+
+logger = logging.getLogger(__name__)
+
+# Stages timed by Diarizer, in pipeline order
+STAGES = ('load', 'vad', 'features', 'clustering', 'output')
+
+# Histogram buckets (upper bounds) for durations in seconds
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+                    30.0, 60.0, 120.0, 300.0)
+
+# Histogram buckets for the real-time factor (processing time / audio time)
+RTF_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0)
+
+
+@contextmanager
+def timed(timings, stage):
+    """
+    Add the duration of a block to a stage timing
+    
+    Args:
+        timings: Dictionary mapping stage names to seconds
+        stage: Stage name; repeated blocks for one stage accumulate
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - start
+
+
+def _format_labels(names, values, extra=()):
+    """Render a label set as {name="value",...}"""
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+               for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value):
+    """Render a sample value"""
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    """
+    Monotonic counter with optional labels
+    """
+    
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+    
+    def inc(self, amount=1.0, **labels):
+        """Increase the counter for a label set (caller holds the registry lock)"""
+        key = tuple(labels[name] for name in self.labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+    
+    def render(self):
+        """Exposition lines"""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    """
+    Cumulative histogram with fixed buckets and optional labels
+    """
+    
+    def __init__(self, name, documentation, buckets=DURATION_BUCKETS, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(sorted(buckets))
+        self.labels = tuple(labels)
+        self._values = {}
+    
+    def observe(self, value, **labels):
+        """Record a value for a label set (caller holds the registry lock)"""
+        key = tuple(labels[name] for name in self.labels)
+        entry = self._values.get(key)
+        if entry is None:
+            entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+        entry[0][bisect.bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+    
+    def render(self):
+        """Exposition lines"""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for key, (counts, total) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else _format_value(bound)
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, [('le', le)])} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {cumulative}")
+        return lines
+
+
+class DiarizationMetrics:
+    """
+    Counters and histograms for the diarization service
+    
+    One instance lives in the serving process. HTTP requests are recorded
+    by the API, finished pipeline runs by the DiarizationEngine.
+    """
+    
+    def __init__(self, result_cache=None):
+        """
+        Initialize the metrics
+        
+        Args:
+            result_cache: Optional ResultCache whose hit and miss counts
+                are exported
+        """
+        self.result_cache = result_cache
+        self._lock = Lock()
+        
+        self.requests = Counter(
+            'diarizer_http_requests_total', 'HTTP requests by endpoint, method and status',
+            ('endpoint', 'method', 'status'))
+        self.errors = Counter(
+            'diarizer_http_errors_total', 'HTTP responses with status 400 or higher by endpoint',
+            ('endpoint', 'status'))
+        self.request_duration = Histogram(
+            'diarizer_http_request_duration_seconds', 'Time to produce a response by endpoint',
+            labels=('endpoint',))
+        self.runs = Counter(
+            'diarizer_pipeline_runs_total', 'Pipeline runs by method and outcome',
+            ('method', 'outcome'))
+        self.audio_seconds = Counter(
+            'diarizer_audio_seconds_total', 'Seconds of audio processed')
+        self.stage_duration = Histogram(
+            'diarizer_stage_duration_seconds', 'Time spent in each pipeline stage',
+            labels=('stage',))
+        self.real_time_factor = Histogram(
+            'diarizer_real_time_factor', 'Pipeline processing time divided by audio duration',
+            RTF_BUCKETS)
+        self.queue_wait = Histogram(
+            'diarizer_queue_wait_seconds', 'Time requests waited for a free worker')
+        self._metrics = [self.requests, self.errors, self.request_duration, self.runs,
+                         self.audio_seconds, self.stage_duration, self.real_time_factor,
+                         self.queue_wait]
+    
+    def observe_request(self, endpoint, method, status, seconds):
+        """
+        Record a finished HTTP request
+        
+        Args:
+            endpoint: Endpoint name
+            method: HTTP method
+            status: Response status code
+            seconds: Time to produce the response
+        """
+        with self._lock:
+            self.requests.inc(endpoint=endpoint, method=method, status=status)
+            if status >= 400:
+                self.errors.inc(endpoint=endpoint, status=status)
+            self.request_duration.observe(seconds, endpoint=endpoint)
+    
+    def observe_run(self, method, result=None, error=None):
+        """
+        Record a finished pipeline run
+        
+        Args:
+            method: Diarizer method that ran
+            result: Its result dictionary, with "timings" and
+                "audio_duration" when available
+            error: Exception raised by the run, if any
+        """
+        if error is not None:
+            outcome = 'error'
+        elif isinstance(result, dict) and result.get('success'):
+            outcome = 'success'
+        else:
+            outcome = 'failed'
+        timings = result.get('timings', {}) if isinstance(result, dict) else {}
+        audio_duration = result.get('audio_duration') if isinstance(result, dict) else None
+        
+        with self._lock:
+            self.runs.inc(method=method, outcome=outcome)
+            processing = 0.0
+            for stage, seconds in timings.items():
+                if stage == 'queue_wait':
+                    self.queue_wait.observe(seconds)
+                else:
+                    self.stage_duration.observe(seconds, stage=stage)
+                    processing += seconds
+            if audio_duration:
+                self.audio_seconds.inc(audio_duration)
+                if processing:
+                    self.real_time_factor.observe(processing / audio_duration)
+    
+    def render(self):
+        """
+        Render all metrics
+        
+        Returns:
+            Text in the Prometheus exposition format
+        """
+        with self._lock:
+            lines = []
+            for metric in self._metrics:
+                lines.extend(metric.render())
+        
+        if self.result_cache is not None:
+            for name, value in (('hits', self.result_cache.hits), ('misses', self.result_cache.misses)):
+                lines += [f"# HELP diarizer_result_cache_{name}_total Result cache {name}",
+                          f"# TYPE diarizer_result_cache_{name}_total counter",
+                          f"diarizer_result_cache_{name}_total {value}"]
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,237 @@
+"""
+NumPy MFCC engine.
+
+A self-contained replacement for librosa.feature.mfcc + delta that matches
+librosa's defaults (centered Hann STFT with zero padding, Slaney mel
+filterbank, 80 dB dynamic range, orthonormal DCT-II, Savitzky-Golay
+deltas). The window, filterbank and DCT matrix are built once per
+parameter set, and many segments are transformed with a single batched
+rfft.
+"""
+import logging
+from functools import lru_cache
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on STFT frames transformed per rfft call, to bound memory
+MAX_BATCH_FRAMES = 16384
+
+
+def _hz_to_mel(freqs):
+    """Convert Hz to mels (Slaney scale)"""
+    freqs = np.asarray(freqs, dtype=np.float64)
+    f_sp = 200.0 / 3
+    min_log_hz = 1000.0
+    min_log_mel = min_log_hz / f_sp
+    logstep = np.log(6.4) / 27.0
+    
+    mels = freqs / f_sp
+    log_region = freqs >= min_log_hz
+    mels[log_region] = min_log_mel + np.log(freqs[log_region] / min_log_hz) / logstep
+    return mels
+
+
+def _mel_to_hz(mels):
+    """Convert mels (Slaney scale) to Hz"""
+    mels = np.asarray(mels, dtype=np.float64)
+    f_sp = 200.0 / 3
+    min_log_hz = 1000.0
+    min_log_mel = min_log_hz / f_sp
+    logstep = np.log(6.4) / 27.0
+    
+    freqs = f_sp * mels
+    log_region = mels >= min_log_mel
+    freqs[log_region] = min_log_hz * np.exp(logstep * (mels[log_region] - min_log_mel))
+    return freqs
+
+
+def mel_filterbank(sample_rate, n_fft, n_mels):
+    """
+    Build a Slaney-normalized mel filterbank
+    
+    Args:
+        sample_rate: Sample rate in Hz
+        n_fft: FFT size
+        n_mels: Number of mel bands
+        
+    Returns:
+        Array of shape (n_mels, n_fft // 2 + 1)
+    """
+    fft_freqs = np.fft.rfftfreq(n_fft, 1.0 / sample_rate)
+    mel_points = np.linspace(_hz_to_mel([0.0])[0], _hz_to_mel([sample_rate / 2.0])[0], n_mels + 2)
+    mel_freqs = _mel_to_hz(mel_points)
+    
+    fdiff = np.diff(mel_freqs)
+    ramps = mel_freqs[:, None] - fft_freqs[None, :]
+    lower = -ramps[:-2] / fdiff[:-1, None]
+    upper = ramps[2:] / fdiff[1:, None]
+    weights = np.maximum(0.0, np.minimum(lower, upper))
+    
+    # Slaney normalization: constant energy per band
+    weights *= (2.0 / (mel_freqs[2:] - mel_freqs[:-2]))[:, None]
+    return weights
+
+
+def dct_matrix(n_mfcc, n_mels):
+    """
+    Build an orthonormal DCT-II matrix
+    
+    Args:
+        n_mfcc: Number of output coefficients
+        n_mels: Number of input bands
+        
+    Returns:
+        Array of shape (n_mfcc, n_mels)
+    """
+    k = np.arange(n_mfcc)[:, None]
+    n = np.arange(n_mels)[None, :]
+    basis = np.cos(np.pi * k * (2 * n + 1) / (2.0 * n_mels)) * np.sqrt(2.0 / n_mels)
+    basis[0] /= np.sqrt(2.0)
+    return basis
+
+
+@lru_cache(maxsize=4)
+def _delta_coeffs(order, width=9):
+    """
+    Savitzky-Golay coefficients for the order-th derivative
+    
+    Equivalent to librosa.feature.delta(order=order, width=width), which
+    fits a polynomial of degree `order` over each window.
+    """
+    x = np.arange(width) - width // 2
+    vander = np.vander(x, order + 1, increasing=True).astype(np.float64)
+    coeffs = np.linalg.pinv(vander)[order] * np.prod(np.arange(1, order + 1))
+    return coeffs.astype(np.float32)
+
+
+def _deltas(coeffs, starts, ends, order, width=9):
+    """
+    Delta features of several segments stacked in one (frames, n) array
+    
+    The interior is a single strided correlation over all rows. With a
+    polynomial of degree `order`, librosa's 'interp' edge handling gives
+    every edge frame the value of the nearest fully covered frame, so the
+    edges are filled from those.
+    """
+    half = width // 2
+    kernel = _delta_coeffs(order, width)
+    out = np.zeros_like(coeffs)
+    windows = np.lib.stride_tricks.sliding_window_view(coeffs, width, axis=0)
+    out[half:len(coeffs) - half] = windows @ kernel
+    
+    for start, end in zip(starts, ends):
+        out[start:start + half] = out[start + half]
+        out[end - half:end] = out[end - half - 1]
+    return out
+
+
+@lru_cache(maxsize=16)
+def _basis(sample_rate, n_fft, n_mels, n_mfcc):
+    """Window, mel filterbank and DCT matrix for one parameter set"""
+    window = (0.5 - 0.5 * np.cos(2 * np.pi * np.arange(n_fft) / n_fft)).astype(np.float32)
+    mel = mel_filterbank(sample_rate, n_fft, n_mels).astype(np.float32)
+    dct = dct_matrix(n_mfcc, n_mels).astype(np.float32)
+    for array in (window, mel, dct):
+        array.flags.writeable = False
+    return window, mel, dct
+
+
+def _frames(audio, n_fft, hop_length):
+    """Centered, zero-padded STFT frames as a strided view"""
+    padded = np.pad(np.asarray(audio, dtype=np.float32), n_fft // 2)
+    if len(padded) < n_fft:
+        return np.empty((0, n_fft), dtype=np.float32)
+    return np.lib.stride_tricks.sliding_window_view(padded, n_fft)[::hop_length]
+
+
+def _log_mel(frames, window, mel):
+    """Log-mel power spectrum (dB) of a (frames, n_fft) batch"""
+    power = np.abs(np.fft.rfft(frames * window, axis=1)) ** 2
+    mel_power = power.astype(np.float32, copy=False) @ mel.T
+    return 10.0 * np.log10(np.maximum(mel_power, 1e-10))
+
+
+def mfcc_batch(segments, sample_rate, n_mfcc=13, n_fft=512, hop_length=160,
+               n_mels=128, deltas=True, top_db=80.0):
+    """
+    Compute MFCCs (and deltas) for many audio segments at once
+    
+    Args:
+        segments: List of 1-D audio arrays
+        sample_rate: Sample rate of the audio
+        n_mfcc: Number of MFCC coefficients
+        n_fft: FFT window size
+        hop_length: Hop length for FFT
+        n_mels: Number of mel bands
+        deltas: Append first and second order deltas
+        top_db: Dynamic range of the log-mel spectrum, per segment
+        
+    Returns:
+        List of float32 arrays of shape (frames, n_mfcc) or
+        (frames, 3 * n_mfcc) with deltas; an empty array for segments too
+        short for delta computation
+    """
+    window, mel, dct = _basis(sample_rate, n_fft, n_mels, n_mfcc)
+    
+    frame_views = [_frames(segment, n_fft, hop_length) for segment in segments]
+    counts = np.array([len(f) for f in frame_views], dtype=np.int64)
+    total = int(counts.sum())
+    
+    # Split long segments so no rfft batch exceeds MAX_BATCH_FRAMES
+    pieces = [view[start:start + MAX_BATCH_FRAMES]
+              for view in frame_views
+              for start in range(0, len(view), MAX_BATCH_FRAMES)]
+    
+    # Log-mel energies of every frame of every segment, in bounded batches
+    log_mel = np.empty((total, n_mels), dtype=np.float32)
+    row = 0
+    batch = []
+    batch_rows = 0
+    for piece in pieces + [None]:
+        if piece is None or batch_rows + len(piece) > MAX_BATCH_FRAMES:
+            if batch_rows:
+                log_mel[row:row + batch_rows] = _log_mel(np.concatenate(batch), window, mel)
+                row += batch_rows
+            batch, batch_rows = [], 0
+        if piece is not None:
+            batch.append(piece)
+            batch_rows += len(piece)
+    
+    # Per-segment dynamic range clipping, then DCT
+    offsets = np.concatenate(([0], np.cumsum(counts)))
+    if top_db is not None and total:
+        nonempty = counts > 0
+        peaks = np.maximum.reduceat(log_mel, offsets[:-1][nonempty], axis=0).max(axis=1)
+        floors = np.repeat(peaks - top_db, counts[nonempty]).astype(np.float32)
+        np.maximum(log_mel, floors[:, None], out=log_mel)
+    coeffs = log_mel @ dct.T
+    
+    min_frames = 9 if deltas else 1
+    valid = counts >= min_frames
+    if deltas and valid.any():
+        starts, ends = offsets[:-1][valid], offsets[1:][valid]
+        coeffs = np.hstack([
+            coeffs,
+            _deltas(coeffs, starts, ends, 1),
+            _deltas(coeffs, starts, ends, 2)
+        ])
+    
+    return [coeffs[offsets[i]:offsets[i + 1]] if valid[i] else np.array([])
+            for i in range(len(segments))]
+
+
+def mfcc(audio, sample_rate, **kwargs):
+    """
+    Compute MFCCs (and deltas) for one audio signal
+    
+    Args:
+        audio: 1-D audio array
+        sample_rate: Sample rate of the audio
+        **kwargs: Options accepted by mfcc_batch
+        
+    Returns:
+        float32 array of shape (frames, n_mfcc) or (frames, 3 * n_mfcc)
+    """
+    return mfcc_batch([audio], sample_rate, **kwargs)[0]
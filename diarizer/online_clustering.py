@@ -0,0 +1,207 @@
+"""
+Online speaker clustering for live sessions.
+
+Segments are assigned one at a time to running speaker centroids, so the
+per-segment cost depends only on the number of speakers, never on how
+long the session has been running.
+"""
+import heapq
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class OnlineSpeakerClusterer:
+    """
+    Incremental speaker clustering over per-segment feature vectors
+    
+    Each speaker keeps its sample count, feature sum and sum of squares.
+    A segment joins the nearest speaker by cosine distance, or starts a new
+    speaker when it is farther than `threshold` from all of them. Every
+    `merge_interval` updates, speakers whose centroids have drifted closer
+    than `merge_threshold` are merged into the older one. Labels are never
+    renumbered: a merged speaker's label resolves to the speaker it was
+    merged into, and every merge is logged in `merges_` so that consumers
+    can relabel what they already received. The label of a merged speaker
+    is free again and goes to the next new speaker, which keeps labels
+    below max_speakers.
+    """
+    
+    def __init__(self, threshold=0.01, merge_threshold=None, merge_interval=20,
+                 max_speakers=None):
+        """
+        Initialize the clusterer
+        
+        Args:
+            threshold: Cosine distance above which a segment starts a new
+                speaker
+            merge_threshold: Cosine distance below which two speakers are
+                merged (defaults to half of threshold)
+            merge_interval: Number of updates between merge passes
+            max_speakers: Maximum number of speakers, or None for no limit
+        """
+        self.threshold = threshold
+        self.merge_threshold = threshold / 2 if merge_threshold is None else merge_threshold
+        self.merge_interval = merge_interval
+        self.max_speakers = max_speakers
+        
+        self.labels_ = []      # Stable label of each active speaker
+        self.counts_ = None    # (k,) number of segments per speaker
+        self.sums_ = None      # (k, d) feature sums
+        self.sq_sums_ = None   # (k, d) feature sums of squares
+        self.aliases_ = {}     # Merged label -> surviving label
+        self.merges_ = []      # (merged label, surviving label) in merge order
+        self.n_updates_ = 0
+        self._next_label = 0
+        self._free_labels = [] # Labels of merged speakers, reused smallest first
+    
+    @property
+    def n_speakers(self):
+        """Number of active speakers"""
+        return len(self.labels_)
+    
+    @property
+    def centroids_(self):
+        """(k, d) array of speaker centroids"""
+        return self.sums_ / self.counts_[:, None]
+    
+    @property
+    def variances_(self):
+        """(k, d) array of per-speaker feature variances"""
+        means = self.centroids_
+        return np.maximum(self.sq_sums_ / self.counts_[:, None] - means ** 2, 0.0)
+    
+    def partial_fit(self, segment_features):
+        """
+        Assign segments to speakers, updating the model
+        
+        Args:
+            segment_features: Feature vector of one segment, or a (n, d)
+                array for several segments in time order
+            
+        Returns:
+            Array of speaker labels, one per segment
+        """
+        X = np.atleast_2d(np.asarray(segment_features, dtype=np.float64))
+        labels = np.empty(len(X), dtype=int)
+        
+        for i, x in enumerate(X):
+            labels[i] = self._update(x)
+            self.n_updates_ += 1
+            if self.n_updates_ % self.merge_interval == 0:
+                self._merge()
+        
+        # Report labels as they stand after any merges in this call
+        return np.array([self.resolve(label) for label in labels], dtype=int)
+    
+    def predict(self, segment_features):
+        """
+        Label segments with the nearest speaker without updating the model
+        
+        Args:
+            segment_features: Feature vector or (n, d) array
+            
+        Returns:
+            Array of speaker labels
+        """
+        X = np.atleast_2d(np.asarray(segment_features, dtype=np.float64))
+        if not self.labels_:
+            return np.zeros(len(X), dtype=int)
+        
+        distances = self._cosine_distances(X, self.centroids_)
+        return np.array(self.labels_)[np.argmin(distances, axis=1)]
+    
+    def resolve(self, label):
+        """
+        Follow merges to the label a speaker is currently known by
+        
+        A label freed by a merge and reused for a new speaker resolves to
+        that new speaker from then on.
+        
+        Args:
+            label: Label returned earlier by partial_fit
+            
+        Returns:
+            The surviving label
+        """
+        while label in self.aliases_:
+            label = self.aliases_[label]
+        return label
+    
+    def _update(self, x):
+        """Assign one feature vector and update sufficient statistics"""
+        if not self.labels_:
+            return self._add_speaker(x)
+        
+        distances = self._cosine_distances(x[None, :], self.centroids_)[0]
+        nearest = int(np.argmin(distances))
+        
+        can_grow = self.max_speakers is None or self.n_speakers < self.max_speakers
+        if distances[nearest] > self.threshold and can_grow:
+            return self._add_speaker(x)
+        
+        self.counts_[nearest] += 1
+        self.sums_[nearest] += x
+        self.sq_sums_[nearest] += x * x
+        return self.labels_[nearest]
+    
+    def _add_speaker(self, x):
+        """Start a new speaker from one feature vector"""
+        if self._free_labels:
+            label = heapq.heappop(self._free_labels)
+            del self.aliases_[label]
+        else:
+            label = self._next_label
+            self._next_label += 1
+        self.labels_.append(label)
+        
+        if self.counts_ is None:
+            self.counts_ = np.ones(1)
+            self.sums_ = x[None, :].copy()
+            self.sq_sums_ = (x * x)[None, :]
+        else:
+            self.counts_ = np.append(self.counts_, 1.0)
+            self.sums_ = np.vstack([self.sums_, x])
+            self.sq_sums_ = np.vstack([self.sq_sums_, x * x])
+        
+        logger.debug(f"Online clustering created speaker {label}")
+        return label
+    
+    def _merge(self):
+        """Merge speakers whose centroids are closer than merge_threshold"""
+        while self.n_speakers > 1:
+            distances = self._cosine_distances(self.centroids_, self.centroids_)
+            np.fill_diagonal(distances, np.inf)
+            i, j = np.unravel_index(np.argmin(distances), distances.shape)
+            if distances[i, j] >= self.merge_threshold:
+                return
+            
+            # Keep the older speaker (labels_ is in creation order)
+            keep, drop = (i, j) if i < j else (j, i)
+            self.counts_[keep] += self.counts_[drop]
+            self.sums_[keep] += self.sums_[drop]
+            self.sq_sums_[keep] += self.sq_sums_[drop]
+            
+            # Aliases always point at active speakers, so a freed label
+            # can be reused without redirecting other merged labels
+            merged, survivor = self.labels_[drop], self.labels_[keep]
+            for label, target in self.aliases_.items():
+                if target == merged:
+                    self.aliases_[label] = survivor
+            self.aliases_[merged] = survivor
+            self.merges_.append((merged, survivor))
+            heapq.heappush(self._free_labels, merged)
+            logger.debug(f"Online clustering merged speaker {merged} into {survivor}")
+            
+            del self.labels_[drop]
+            self.counts_ = np.delete(self.counts_, drop)
+            self.sums_ = np.delete(self.sums_, drop, axis=0)
+            self.sq_sums_ = np.delete(self.sq_sums_, drop, axis=0)
+    
+    @staticmethod
+    def _cosine_distances(A, B):
+        """Pairwise cosine distances between rows of A and B"""
+        A = A / (np.linalg.norm(A, axis=1, keepdims=True) + 1e-10)
+        B = B / (np.linalg.norm(B, axis=1, keepdims=True) + 1e-10)
+        return 1.0 - A @ B.T
@@ -0,0 +1,336 @@
+"""
+On-demand rendering of per-speaker audio.
+
+A diarization session only records its segment index and a reference to
+the source audio (session.json). A speaker's WAV is produced the first
+time it is requested, streamed to the client as it is rendered, and
+cached in the session directory for later requests.
+"""
+import os
+import io
+import json
+import uuid
+import struct
+import logging
+import numpy as np
+import soundfile as sf
+
+from .blocks import iter_blocks
+from .audio_utils import float_to_int16
+from utils.audio_utils import load_audio
+
+logger = logging.getLogger(__name__)
+
+SESSION_FILE = 'session.json'
+
+# Output formats: (soundfile format, subtype, MIME type)
+SEGMENT_FORMATS = {
+    'wav': ('WAV', 'PCM_16', 'audio/wav'),
+    'flac': ('FLAC', 'PCM_16', 'audio/flac'),
+    'ogg': ('OGG', 'VORBIS', 'audio/ogg'),
+}
+
+
+def write_json_atomic(path, data):
+    """
+    Write JSON so readers never see a partially written file
+    
+    Args:
+        path: Destination path
+        data: JSON-serializable object
+    """
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def load_session(session_path):
+    """
+    Read a session's metadata
+    
+    Args:
+        session_path: Session directory
+        
+    Returns:
+        Session dictionary, or None if the session does not exist
+    """
+    try:
+        with open(os.path.join(session_path, SESSION_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def wav_header(n_samples, sample_rate):
+    """
+    Build a 44-byte header for 16-bit mono PCM WAV data
+    
+    Args:
+        n_samples: Number of samples that follow
+        sample_rate: Sample rate in Hz
+        
+    Returns:
+        Header bytes
+    """
+    data_size = n_samples * 2
+    return struct.pack('<4sI4s4sIHHIIHH4sI', b'RIFF', 36 + data_size, b'WAVE',
+                       b'fmt ', 16, 1, 1, sample_rate, sample_rate * 2, 2, 16,
+                       b'data', data_size)
+
+
+def iter_speaker_audio(source, sample_rate, ranges, block_duration_s=30.0):
+    """
+    Yield the audio of a speaker's segments in order
+    
+    Memory-mappable PCM sources are sliced directly and other sources at
+    the session rate are seeked to each range, so only the needed spans
+    are decoded. Sources that need resampling are streamed block by block;
+    anything soundfile cannot read is decoded in full.
+    
+    Args:
+        source: Path to the session's source audio
+        sample_rate: Sample rate the segment index refers to
+        ranges: Time-ordered list of (start_sample, end_sample) ranges
+        block_duration_s: Block length for streamed sources
+        
+    Returns:
+        Generator yielding int16 numpy arrays
+    """
+    try:
+        info = sf.info(source)
+    except Exception:
+        info = None
+    
+    if info is None or (info.samplerate == sample_rate and info.subtype == 'PCM_16'
+                        and info.channels == 1):
+        audio, _ = load_audio(source, sr=sample_rate)
+        for start, end in ranges:
+            yield audio[start:end] if audio.dtype == np.int16 else float_to_int16(audio[start:end])
+        return
+    
+    block_size = int(block_duration_s * info.samplerate)
+    if info.samplerate == sample_rate:
+        with sf.SoundFile(source) as f:
+            for start, end in ranges:
+                f.seek(start)
+                while start < end:
+                    block = f.read(min(block_size, end - start), dtype='float32', always_2d=True)
+                    if not len(block):
+                        break
+                    start += len(block)
+                    yield float_to_int16(block[:, 0] if block.shape[1] == 1 else block.mean(axis=1))
+        return
+    
+    offset = 0
+    current = 0
+    for block in iter_blocks(source, sample_rate, block_size):
+        block_end = offset + len(block)
+        while current < len(ranges) and ranges[current][0] < block_end:
+            start, end = ranges[current]
+            yield block[max(start, offset) - offset:min(end, block_end) - offset]
+            if end > block_end:
+                break
+            current += 1
+        offset = block_end
+        if current == len(ranges):
+            return
+
+
+def clip_ranges(ranges, start, end):
+    """
+    Map a span of a speaker's concatenated audio back to source ranges
+    
+    Args:
+        ranges: Time-ordered list of (start_sample, end_sample) ranges
+        start: First sample of the span within the speaker's audio
+        end: End sample (exclusive) of the span, or None for the end
+        
+    Returns:
+        List of (start_sample, end_sample) source ranges covering the span
+    """
+    clipped = []
+    position = 0
+    for range_start, range_end in ranges:
+        length = range_end - range_start
+        lo = max(start - position, 0)
+        hi = length if end is None else min(end - position, length)
+        if lo < hi:
+            clipped.append((range_start + lo, range_start + hi))
+        position += length
+        if end is not None and position >= end:
+            break
+    return clipped
+
+
+def _speaker_ranges(session_path, speaker_id):
+    """
+    Look up a speaker's source ranges
+    
+    Args:
+        session_path: Session directory
+        speaker_id: Speaker ID (e.g. "speaker_0")
+        
+    Returns:
+        Tuple (session dictionary, list of (start_sample, end_sample))
+        
+    Raises:
+        KeyError: If the session or speaker does not exist
+    """
+    session = load_session(session_path)
+    if session is None or speaker_id not in session["speakers"]:
+        raise KeyError(speaker_id)
+    return session, session["speakers"][speaker_id]["ranges"]
+
+
+def _encode(path_or_file, chunks, sample_rate, fmt):
+    """
+    Encode int16 chunks with soundfile
+    
+    Args:
+        path_or_file: Destination path or file object
+        chunks: Iterable of int16 numpy arrays
+        sample_rate: Sample rate in Hz
+        fmt: Key of SEGMENT_FORMATS
+    """
+    sf_format, subtype, _ = SEGMENT_FORMATS[fmt]
+    with sf.SoundFile(path_or_file, 'w', samplerate=sample_rate, channels=1,
+                      format=sf_format, subtype=subtype) as out:
+        for audio in chunks:
+            out.write(audio)
+
+
+def render_speaker(session_path, speaker_id, chunk_size=65536):
+    """
+    Render a speaker's WAV, streaming it while writing the cache file
+    
+    Args:
+        session_path: Session directory
+        speaker_id: Speaker ID (e.g. "speaker_0")
+        chunk_size: Approximate size in bytes of each yielded chunk
+        
+    Returns:
+        Tuple (total size in bytes, generator of WAV byte chunks)
+        
+    Raises:
+        KeyError: If the session or speaker does not exist
+    """
+    session, ranges = _speaker_ranges(session_path, speaker_id)
+    sample_rate = session["sample_rate"]
+    n_samples = sum(end - start for start, end in ranges)
+    source = os.path.join(session_path, session["source"])
+    cache_path = os.path.join(session_path, f"{speaker_id}.wav")
+    
+    def generate():
+        tmp_path = f"{cache_path}.{uuid.uuid4().hex}.tmp"
+        completed = False
+        try:
+            with open(tmp_path, 'wb') as cache:
+                header = wav_header(n_samples, sample_rate)
+                cache.write(header)
+                yield header
+                
+                pending = []
+                pending_bytes = 0
+                for audio in iter_speaker_audio(source, sample_rate, ranges):
+                    data = audio.astype('<i2', copy=False).tobytes()
+                    cache.write(data)
+                    pending.append(data)
+                    pending_bytes += len(data)
+                    if pending_bytes >= chunk_size:
+                        yield b''.join(pending)
+                        pending, pending_bytes = [], 0
+                if pending:
+                    yield b''.join(pending)
+            
+            os.replace(tmp_path, cache_path)
+            completed = True
+            logger.debug(f"Rendered {cache_path}")
+        finally:
+            if not completed and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    
+    return 44 + n_samples * 2, generate()
+
+
+def render_speaker_file(session_path, speaker_id, fmt='wav'):
+    """
+    Make sure a speaker's audio is cached in the given format
+    
+    Args:
+        session_path: Session directory
+        speaker_id: Speaker ID (e.g. "speaker_0")
+        fmt: Key of SEGMENT_FORMATS
+        
+    Returns:
+        Path to the cached file
+        
+    Raises:
+        KeyError: If the session or speaker does not exist
+    """
+    cache_path = os.path.join(session_path, f"{speaker_id}.{fmt}")
+    if os.path.exists(cache_path):
+        return cache_path
+    
+    if fmt == 'wav':
+        _, chunks = render_speaker(session_path, speaker_id)
+        for _ in chunks:
+            pass
+        return cache_path
+    
+    session, ranges = _speaker_ranges(session_path, speaker_id)
+    sample_rate = session["sample_rate"]
+    
+    # Transcode the cached WAV if there is one, otherwise read the source
+    wav_path = os.path.join(session_path, f"{speaker_id}.wav")
+    if os.path.exists(wav_path):
+        source, ranges = wav_path, [(0, sum(end - start for start, end in ranges))]
+    else:
+        source = os.path.join(session_path, session["source"])
+    
+    tmp_path = f"{cache_path}.{uuid.uuid4().hex}.tmp"
+    try:
+        _encode(tmp_path, iter_speaker_audio(source, sample_rate, ranges), sample_rate, fmt)
+        os.replace(tmp_path, cache_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    
+    logger.debug(f"Rendered {cache_path}")
+    return cache_path
+
+
+def render_speaker_span(session_path, speaker_id, start=0.0, end=None, fmt='wav'):
+    """
+    Render part of a speaker's audio, decoding only the requested span
+    
+    Args:
+        session_path: Session directory
+        speaker_id: Speaker ID (e.g. "speaker_0")
+        start: Start time in seconds within the speaker's audio
+        end: End time in seconds within the speaker's audio, or None
+        fmt: Key of SEGMENT_FORMATS
+        
+    Returns:
+        Encoded audio bytes
+        
+    Raises:
+        KeyError: If the session or speaker does not exist
+    """
+    session, ranges = _speaker_ranges(session_path, speaker_id)
+    sample_rate = session["sample_rate"]
+    start_sample = int(start * sample_rate)
+    end_sample = None if end is None else int(end * sample_rate)
+    
+    # Slice the cached WAV when it exists, otherwise seek in the source
+    wav_path = os.path.join(session_path, f"{speaker_id}.wav")
+    if os.path.exists(wav_path):
+        source = wav_path
+        ranges = [(0, sum(range_end - range_start for range_start, range_end in ranges))]
+    else:
+        source = os.path.join(session_path, session["source"])
+    
+    ranges = clip_ranges(ranges, start_sample, end_sample)
+    buffer = io.BytesIO()
+    _encode(buffer, iter_speaker_audio(source, sample_rate, ranges), sample_rate, fmt)
+    return buffer.getvalue()
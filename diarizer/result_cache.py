@@ -0,0 +1,162 @@
+"""
+Content-addressed cache of diarization results.
+
+Results are keyed by a hash of the audio bytes and the parameters that
+affect the outcome, so re-uploads of the same recording are answered
+without running the pipeline again. Identical requests that arrive while
+a computation is still running share its future instead of starting a
+duplicate.
+"""
+import json
+import hashlib
+import logging
+from collections import OrderedDict
+from concurrent.futures import Future
+from threading import Lock
+
+logger = logging.getLogger(__name__)
+
+# Diarizer parameters that change the result for the same audio
+RESULT_PARAMS = ('sample_rate', 'frame_duration_ms', 'vad_aggressiveness',
+                 'min_speech_duration_ms', 'max_speakers', 'speaker_count', 'clustering',
+                 'feature_mode', 'energy_gate_db', 'vad_workers', 'vad_shard_s')
+
+
+def audio_digest(source, chunk_size=1 << 20):
+    """
+    Hash audio content
+    
+    Args:
+        source: Path to an audio file, or its bytes
+        chunk_size: Read size for files
+    
+    Returns:
+        Hex digest of the content
+    """
+    digest = hashlib.sha256()
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        digest.update(source)
+    else:
+        with open(source, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _as_hit(result):
+    """
+    Copy of a shared result as served to a cache hit: marked "cached" and
+    without the stage timings (queue wait included) of the run that
+    produced it
+    """
+    if not isinstance(result, dict):
+        return result
+    hit = {key: value for key, value in result.items() if key != 'timings'}
+    hit['cached'] = True
+    return hit
+
+
+def _relay_hit(source, target):
+    """Complete a joined request's future from the in-flight computation"""
+    if source.cancelled():
+        target.cancel()
+    elif source.exception() is not None:
+        target.set_exception(source.exception())
+    else:
+        target.set_result(_as_hit(source.result()))
+
+
+class ResultCache:
+    """
+    Bounded LRU cache of results with in-flight request coalescing
+    """
+    
+    def __init__(self, max_entries=256, validate=None):
+        """
+        Initialize the cache
+        
+        Args:
+            max_entries: Maximum number of cached results
+            validate: Optional callable returning False for cached results
+                that can no longer be served (e.g. evicted sessions)
+        """
+        self.max_entries = max_entries
+        self.validate = validate
+        self.hits = 0
+        self.misses = 0
+        self._results = OrderedDict()
+        self._in_flight = {}
+        self._lock = Lock()
+    
+    @staticmethod
+    def key(source, params):
+        """
+        Build the cache key for a request
+        
+        Args:
+            source: Path to an audio file, or its bytes
+            params: Dictionary of result-affecting parameters
+        
+        Returns:
+            Cache key string
+        """
+        return audio_digest(source) + ':' + json.dumps(params, sort_keys=True)
+    
+    def get_or_submit(self, key, submit):
+        """
+        Return a future for the result of a request, computing it only if
+        it is neither cached nor already running
+        
+        Args:
+            key: Cache key from key()
+            submit: Callable starting the computation and returning a
+                concurrent.futures.Future; exceptions it raises propagate
+        
+        Returns:
+            concurrent.futures.Future with the result. Results served from
+            the cache or from another request's computation are copies
+            with "cached" set to True and no "timings"
+        """
+        with self._lock:
+            result = self._results.get(key)
+            if result is not None and (self.validate is None or self.validate(result)):
+                self._results.move_to_end(key)
+                self.hits += 1
+                logger.debug(f"Result cache hit for {key[:16]}")
+                future = Future()
+                future.set_result(_as_hit(result))
+                return future
+            self._results.pop(key, None)
+            
+            running = self._in_flight.get(key)
+            if running is not None:
+                self.hits += 1
+                logger.debug(f"Joining in-flight computation for {key[:16]}")
+                future = Future()
+                running.add_done_callback(lambda done: _relay_hit(done, future))
+                return future
+            
+            self.misses += 1
+            future = submit()
+            self._in_flight[key] = future
+        
+        future.add_done_callback(lambda done: self._finish(key, done))
+        return future
+    
+    def _finish(self, key, future):
+        """Store a successful result and stop coalescing onto its future"""
+        with self._lock:
+            self._in_flight.pop(key, None)
+            if future.cancelled() or future.exception() is not None:
+                return
+            result = future.result()
+            if not (isinstance(result, dict) and result.get("success")):
+                return
+            self._results[key] = result
+            self._results.move_to_end(key)
+            while len(self._results) > self.max_entries:
+                self._results.popitem(last=False)
+    
+    def __len__(self):
+        with self._lock:
+            return len(self._results)
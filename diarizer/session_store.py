@@ -0,0 +1,266 @@
+"""
+Shared, size-bounded storage for diarization sessions.
+
+Sessions live under a single root directory that every worker process
+can reach. Each session is assembled in a staging directory and renamed
+into place, so other processes only ever see complete sessions. A SQLite
+index next to the sessions holds their metadata and access times; it
+answers session lookups without touching the session directories and
+drives TTL and LRU eviction against a disk quota.
+"""
+import os
+import json
+import time
+import uuid
+import shutil
+import sqlite3
+import logging
+import threading
+from contextlib import closing
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE = 'index.sqlite'
+STAGING_PREFIX = '.staging-'
+
+
+def _dir_size(path):
+    """Total size in bytes of the files directly inside a directory"""
+    try:
+        with os.scandir(path) as entries:
+            return sum(entry.stat().st_size for entry in entries if entry.is_file())
+    except OSError:
+        return 0
+
+
+class SessionStore:
+    """
+    Session directories under a shared root with a SQLite metadata index
+    """
+    
+    def __init__(self, root, max_bytes=None, ttl=None, sweep_interval=60.0):
+        """
+        Initialize the session store
+        
+        Args:
+            root: Directory holding the sessions, shared by all workers
+            max_bytes: Disk quota for all sessions, None for no quota
+            ttl: Seconds since last access after which a session expires,
+                None to keep sessions until the quota needs the space
+            sweep_interval: Seconds between background sweeps
+        """
+        self.root = root
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.sweep_interval = sweep_interval
+        self.index_path = os.path.join(root, INDEX_FILE)
+        self._sweeper = None
+        self._stop = threading.Event()
+        
+        os.makedirs(root, exist_ok=True)
+        with closing(self._connect()) as db, db:
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS sessions (
+                    session_id TEXT PRIMARY KEY,
+                    created REAL NOT NULL,
+                    last_access REAL NOT NULL,
+                    size_bytes INTEGER NOT NULL,
+                    metadata TEXT NOT NULL
+                )
+            """)
+            db.execute("CREATE INDEX IF NOT EXISTS sessions_last_access ON sessions (last_access)")
+    
+    def __getstate__(self):
+        """Pickle without the sweeper thread (stores are passed to workers)"""
+        state = self.__dict__.copy()
+        state['_sweeper'] = None
+        state['_stop'] = None
+        return state
+    
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._stop = threading.Event()
+    
+    def _connect(self):
+        """Open a connection to the index (one per call, safe across processes)"""
+        db = sqlite3.connect(self.index_path, timeout=30)
+        db.execute("PRAGMA journal_mode=WAL")
+        return db
+    
+    def path(self, session_id):
+        """
+        Directory of a session
+        
+        Args:
+            session_id: Session ID
+        
+        Returns:
+            Path to the session directory
+        """
+        return os.path.join(self.root, session_id)
+    
+    def create(self):
+        """
+        Start a new session in a private staging directory
+        
+        Returns:
+            Tuple (session_id, staging directory path)
+        """
+        session_id = str(uuid.uuid4())
+        staging_path = os.path.join(self.root, STAGING_PREFIX + session_id)
+        os.makedirs(staging_path)
+        return session_id, staging_path
+    
+    def commit(self, session_id, metadata):
+        """
+        Publish a staged session and add it to the index
+        
+        Args:
+            session_id: Session ID returned by create()
+            metadata: JSON-serializable session summary served by get()
+        
+        Returns:
+            Path to the published session directory
+        """
+        staging_path = os.path.join(self.root, STAGING_PREFIX + session_id)
+        session_path = self.path(session_id)
+        size = _dir_size(staging_path)
+        os.rename(staging_path, session_path)
+        
+        now = time.time()
+        with closing(self._connect()) as db, db:
+            db.execute(
+                "INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?, ?)",
+                (session_id, now, now, size, json.dumps(metadata))
+            )
+        
+        if self.max_bytes is not None:
+            self.sweep(keep=session_id)
+        return session_path
+    
+    def get(self, session_id):
+        """
+        Look up a session and mark it as recently used
+        
+        Args:
+            session_id: Session ID
+        
+        Returns:
+            Session metadata dictionary, or None if the session is unknown
+        """
+        with closing(self._connect()) as db, db:
+            row = db.execute(
+                "SELECT metadata FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            db.execute(
+                "UPDATE sessions SET last_access = ? WHERE session_id = ?",
+                (time.time(), session_id)
+            )
+        return json.loads(row[0])
+    
+    def update_size(self, session_id):
+        """
+        Re-measure a session after files were added to it (e.g. renders)
+        
+        Args:
+            session_id: Session ID
+        """
+        size = _dir_size(self.path(session_id))
+        with closing(self._connect()) as db, db:
+            db.execute(
+                "UPDATE sessions SET size_bytes = ? WHERE session_id = ?",
+                (size, session_id)
+            )
+    
+    def total_bytes(self):
+        """
+        Disk usage of all indexed sessions
+        
+        Returns:
+            Size in bytes
+        """
+        with closing(self._connect()) as db:
+            return db.execute("SELECT COALESCE(SUM(size_bytes), 0) FROM sessions").fetchone()[0]
+    
+    def delete(self, session_id):
+        """
+        Remove a session from the index and from disk
+        
+        Args:
+            session_id: Session ID
+        """
+        with closing(self._connect()) as db, db:
+            db.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+        shutil.rmtree(self.path(session_id), ignore_errors=True)
+    
+    def sweep(self, keep=None):
+        """
+        Evict expired sessions, then least recently used ones over quota
+        
+        Staging directories left behind by crashed workers are removed once
+        they are older than the TTL (or an hour without one).
+        
+        Args:
+            keep: Optional session ID that must not be evicted
+            
+        Returns:
+            Number of sessions evicted
+        """
+        now = time.time()
+        evicted = []
+        
+        with closing(self._connect()) as db, db:
+            rows = db.execute(
+                "SELECT session_id, size_bytes, last_access FROM sessions ORDER BY last_access"
+            ).fetchall()
+            total = sum(size for _, size, _ in rows)
+            for session_id, size, last_access in rows:
+                expired = self.ttl is not None and last_access < now - self.ttl
+                over_quota = self.max_bytes is not None and total > self.max_bytes
+                if not (expired or over_quota):
+                    break  # Rows are oldest first
+                if session_id == keep:
+                    continue
+                evicted.append(session_id)
+                total -= size
+            
+            db.executemany("DELETE FROM sessions WHERE session_id = ?",
+                           [(session_id,) for session_id in evicted])
+        
+        for session_id in evicted:
+            shutil.rmtree(self.path(session_id), ignore_errors=True)
+        
+        # Abandoned staging directories
+        max_age = self.ttl if self.ttl is not None else 3600
+        with os.scandir(self.root) as entries:
+            for entry in entries:
+                if entry.name.startswith(STAGING_PREFIX) and now - entry.stat().st_mtime > max_age:
+                    shutil.rmtree(entry.path, ignore_errors=True)
+        
+        if evicted:
+            logger.info(f"Evicted {len(evicted)} sessions from {self.root}")
+        return len(evicted)
+    
+    def start_sweeper(self):
+        """Run sweep() every sweep_interval seconds in a daemon thread"""
+        if self._sweeper is not None:
+            return
+        
+        def run():
+            while not self._stop.wait(self.sweep_interval):
+                try:
+                    self.sweep()
+                except Exception as e:
+                    logger.error(f"Session sweep failed: {e}")
+        
+        self._sweeper = threading.Thread(target=run, name='session-sweeper', daemon=True)
+        self._sweeper.start()
+    
+    def stop_sweeper(self):
+        """Stop the background sweeper"""
+        self._stop.set()
+        if self._sweeper is not None:
+            self._sweeper.join()
+            self._sweeper = None
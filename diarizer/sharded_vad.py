@@ -0,0 +1,317 @@
+"""
+Parallel voice activity detection for long recordings.
+
+The py-webrtcvad extension holds the GIL while it classifies a frame, so
+threads cannot run it in parallel; long signals are instead split into
+time shards that are classified in a process pool. Each shard's VAD
+starts a few seconds before the shard so its adaptive noise model has
+settled, and runs a few seconds past its end. Adjacent shards are spliced
+at the first frame in that overlap that both classify as non-speech, so a
+speech run crossing a boundary is taken whole from one shard.
+
+Files can also be classified without loading them: each worker reads its
+own shard (margins included) from disk, so memory stays bounded by the
+shard length, as block processing requires.
+
+WebRTC VAD keeps state across frames, so a shard can still disagree with
+a sequential pass on isolated frames after its warm-up; results are
+near-identical rather than bit-exact (a few dozen of the 120000 frames
+in an hour of audio).
+"""
+import logging
+import multiprocessing
+import numpy as np
+import soundfile as sf
+import webrtcvad
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from threading import Lock
+
+from .audio_utils import energy_gate, vad_decisions
+from .blocks import read_span
+
+logger = logging.getLogger(__name__)
+
+# Seconds of audio each shard's VAD sees before its first frame, and
+# classifies past its last frame for splicing
+SHARD_OVERLAP_S = 10.0
+
+
+def _shard_decisions(audio_int16, frame_size, sample_rate, aggressiveness, warmup_frames,
+                     pad_tail, skip):
+    """
+    Classify one shard in a worker process
+    
+    Args:
+        audio_int16: int16 samples of the shard, margins included
+        frame_size: Samples per frame
+        sample_rate: Sample rate of audio
+        aggressiveness: VAD aggressiveness (0-3)
+        warmup_frames: Leading frames that only warm up the VAD
+        pad_tail: Classify a zero-padded trailing partial frame
+        skip: Optional boolean array of frames to skip (margin included)
+    
+    Returns:
+        Boolean numpy array of decisions from the shard's first frame on
+    """
+    vad = webrtcvad.Vad(aggressiveness)
+    return vad_decisions(vad, audio_int16, frame_size, sample_rate, pad_tail, skip)[warmup_frames:]
+
+
+def _file_shard_decisions(file_path, frame_size, sample_rate, aggressiveness, first, stop,
+                          warmup_frames, last, energy_gate_db):
+    """
+    Read one shard of a file and classify it, in a worker process
+    
+    Args:
+        file_path: Path to the audio file
+        frame_size: Samples per frame
+        sample_rate: Sample rate to classify at
+        aggressiveness: VAD aggressiveness (0-3)
+        first: First frame read (margin included)
+        stop: Frame to stop reading at (margin included)
+        warmup_frames: Leading frames that only warm up the VAD
+        last: True for the shard ending the file, which is read to its
+            end and whose trailing partial frame is zero-padded
+        energy_gate_db: Energy gate margin, or None to classify every frame
+    
+    Returns:
+        Tuple (decisions, frames skipped by the energy gate) as boolean
+        numpy arrays from the shard's first frame on
+    """
+    audio = read_span(file_path, sample_rate, first * frame_size, None if last else stop * frame_size)
+    if not last and len(audio) < (stop - first) * frame_size:
+        audio = np.concatenate([audio, np.zeros((stop - first) * frame_size - len(audio), dtype=np.int16)])
+    skip = None
+    if energy_gate_db is not None:
+        skip = energy_gate(audio, frame_size, sample_rate, energy_gate_db, pad_tail=last)
+    vad = webrtcvad.Vad(aggressiveness)
+    voiced = vad_decisions(vad, audio, frame_size, sample_rate, last, skip)
+    if skip is None:
+        skip = np.zeros(len(voiced), dtype=bool)
+    return voiced[warmup_frames:], skip[warmup_frames:]
+
+
+def _splice(head, tail):
+    """
+    Join the decisions of adjacent shards
+    
+    Args:
+        head: Decisions of the earlier shard, running past the boundary
+        tail: Decisions of the later shard, starting at the boundary
+    
+    Returns:
+        Tuple (decisions kept from head, decisions kept from tail)
+    """
+    overlap = min(len(head), len(tail))
+    both_silent = np.flatnonzero(~head[:overlap] & ~tail[:overlap])
+    cut = both_silent[0] if len(both_silent) else overlap
+    return head[:cut], tail[cut:]
+
+
+def _join(bounds, shards):
+    """
+    Splice the results of consecutive shards
+    
+    Args:
+        bounds: Shard bounds from shard_bounds
+        shards: Iterable of per-shard tuples of equally long arrays; the
+            first array holds the decisions, and the others (e.g. skip
+            masks) are cut at the same frames
+    
+    Returns:
+        Tuple of the joined arrays
+    """
+    shards = iter(shards)
+    pieces = []
+    carry = next(shards)
+    carry_start = 0
+    for (start, _), shard in zip(bounds[1:], shards):
+        boundary = start - carry_start
+        head, _ = _splice(carry[0][boundary:], shard[0])
+        cut = len(head)
+        pieces.append(tuple(array[:boundary + cut] for array in carry))
+        carry, carry_start = tuple(array[cut:] for array in shard), start + cut
+    pieces.append(carry)
+    return tuple(np.concatenate(arrays) for arrays in zip(*pieces))
+
+
+def shard_bounds(n_frames, shard_frames):
+    """
+    Split frames into consecutive shards
+    
+    Args:
+        n_frames: Number of frames
+        shard_frames: Frames per shard
+    
+    Returns:
+        List of (first_frame, end_frame) tuples, end exclusive
+    """
+    return [(start, min(start + shard_frames, n_frames)) for start in range(0, n_frames, shard_frames)]
+
+
+class ShardedVAD:
+    """
+    Runs WebRTC VAD over time shards in a pool of worker processes
+    
+    The pool is started on first use and shared by all calls; an instance
+    can be used from several threads. If a worker dies the pool is
+    replaced and the call falls back to a sequential pass.
+    """
+    
+    def __init__(self, aggressiveness=3, max_workers=None, shard_duration_s=300.0,
+                 overlap_s=SHARD_OVERLAP_S):
+        """
+        Initialize the sharded VAD
+        
+        Args:
+            aggressiveness: VAD aggressiveness (0-3)
+            max_workers: Worker processes, one per CPU if None
+            shard_duration_s: Shard length in seconds
+            overlap_s: Margin classified before and after each shard in
+                seconds
+        """
+        self.aggressiveness = aggressiveness
+        self.max_workers = max_workers
+        self.shard_duration_s = shard_duration_s
+        self.overlap_s = overlap_s
+        self._pool = None
+        self._lock = Lock()
+    
+    def __getstate__(self):
+        """Pickle without the pool (each process starts its own)"""
+        state = self.__dict__.copy()
+        state['_pool'] = None
+        state['_lock'] = None
+        return state
+    
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = Lock()
+    
+    def _executor(self):
+        """Return the worker pool, starting it if needed"""
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+            return self._pool
+    
+    def _discard(self, broken):
+        """Drop a pool that lost a worker; the next call starts a new one"""
+        with self._lock:
+            if self._pool is broken:
+                self._pool = None
+        broken.shutdown(wait=False, cancel_futures=True)
+    
+    def decisions(self, audio_int16, frame_size, sample_rate, pad_tail=True, skip=None):
+        """
+        Classify every frame of a signal, shards in parallel
+        
+        Args:
+            audio_int16: int16 PCM samples
+            frame_size: Samples per frame
+            sample_rate: Sample rate of audio
+            pad_tail: Zero-pad and classify a trailing partial frame
+            skip: Optional boolean array of frames that are non-speech
+                without calling the VAD (e.g. from energy_gate)
+        
+        Returns:
+            Boolean numpy array with one decision per frame, as
+            vad_decisions would return for the whole signal
+        """
+        n_samples = len(audio_int16)
+        n_frames = -(-n_samples // frame_size) if pad_tail else n_samples // frame_size
+        shard_frames = max(1, int(self.shard_duration_s * sample_rate / frame_size))
+        margin = int(self.overlap_s * sample_rate / frame_size)
+        bounds = shard_bounds(n_frames, shard_frames)
+        
+        # A single shard is cheaper in-process than a round trip to the pool
+        if len(bounds) <= 1:
+            vad = webrtcvad.Vad(self.aggressiveness)
+            return vad_decisions(vad, audio_int16, frame_size, sample_rate, pad_tail, skip)
+        
+        executor = self._executor()
+        try:
+            return self._sharded(executor, audio_int16, frame_size, sample_rate, pad_tail, skip,
+                                 n_frames, bounds, margin)
+        except BrokenProcessPool:
+            logger.warning("VAD worker died, restarting the pool and running VAD sequentially")
+            self._discard(executor)
+            vad = webrtcvad.Vad(self.aggressiveness)
+            return vad_decisions(vad, audio_int16, frame_size, sample_rate, pad_tail, skip)
+    
+    def _sharded(self, executor, audio_int16, frame_size, sample_rate, pad_tail, skip,
+                 n_frames, bounds, margin):
+        """Classify shards in the pool and splice their decisions"""
+        n_samples = len(audio_int16)
+        futures = []
+        for start, end in bounds:
+            first = max(start - margin, 0)
+            stop = min(end + margin, n_frames)
+            last = stop == n_frames
+            futures.append(executor.submit(
+                _shard_decisions,
+                audio_int16[first * frame_size:n_samples if last else stop * frame_size],
+                frame_size, sample_rate, self.aggressiveness, start - first,
+                pad_tail and last, None if skip is None else skip[first:stop]
+            ))
+        
+        # Each shard's decisions run past its end; splice them in order
+        voiced, = _join(bounds, ((future.result(),) for future in futures))
+        logger.debug(f"VAD over {n_frames} frames in {len(bounds)} shards")
+        return voiced
+    
+    def file_decisions(self, file_path, frame_size, sample_rate, energy_gate_db=None):
+        """
+        Classify every frame of an audio file, shards read and classified
+        in parallel without loading the whole file
+        
+        Args:
+            file_path: Path to an audio file readable by soundfile
+            frame_size: Samples per frame
+            sample_rate: Sample rate to classify at (the file is resampled
+                shard by shard if needed)
+            energy_gate_db: Energy gate margin (see audio_utils.energy_gate),
+                or None to classify every frame
+        
+        Returns:
+            Tuple (decisions, frames skipped by the energy gate) as boolean
+            numpy arrays with one entry per frame; a zero-padded trailing
+            partial frame is included
+        """
+        info = sf.info(file_path)
+        n_samples = int(round(info.frames * sample_rate / info.samplerate))
+        n_frames = max(-(-n_samples // frame_size), 1)
+        shard_frames = max(1, int(self.shard_duration_s * sample_rate / frame_size))
+        margin = int(self.overlap_s * sample_rate / frame_size)
+        bounds = shard_bounds(n_frames, shard_frames)
+        shards = []
+        for start, end in bounds:
+            first = max(start - margin, 0)
+            stop = min(end + margin, n_frames)
+            shards.append((file_path, frame_size, sample_rate, self.aggressiveness, first, stop,
+                           start - first, stop == n_frames, energy_gate_db))
+        
+        if len(bounds) > 1:
+            executor = self._executor()
+            try:
+                futures = [executor.submit(_file_shard_decisions, *shard) for shard in shards]
+                result = _join(bounds, (future.result() for future in futures))
+                logger.debug(f"VAD over {n_frames} frames of {file_path} in {len(bounds)} shards")
+                return result
+            except BrokenProcessPool:
+                logger.warning("VAD worker died, restarting the pool and running VAD sequentially")
+                self._discard(executor)
+        
+        # Shard by shard in this process, still with bounded memory
+        return _join(bounds, (_file_shard_decisions(*shard) for shard in shards))
+    
+    def shutdown(self):
+        """Stop the worker pool"""
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
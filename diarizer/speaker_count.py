@@ -0,0 +1,175 @@
+"""
+Automatic speaker-count estimation.
+
+Candidate speaker counts are compared with a model-selection criterion
+(eigengap by default, or silhouette). The work is shared across candidates:
+pairwise distances are computed once, each k-means fit is warm-started
+from the previous candidate's centroids (so a single initialization is
+enough), and candidates are scored in parallel.
+"""
+import logging
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from scipy.sparse.linalg import eigsh
+from sklearn.cluster import KMeans
+from sklearn.metrics import pairwise_distances, silhouette_score
+
+logger = logging.getLogger(__name__)
+
+CRITERIA = ('silhouette', 'eigengap')
+
+# Candidates need this many rows per cluster on average; with fewer, the
+# per-cluster statistics are degenerate and every criterion overfits
+MIN_ROWS_PER_SPEAKER = 3
+
+# Silhouette is undefined for one cluster; a split has to beat this score
+SINGLE_SPEAKER_SILHOUETTE = 0.25
+
+# Eigengap answers one speaker only if the first gap is this much larger
+# than every gap after it
+SINGLE_SPEAKER_GAP_RATIO = 1.25
+
+
+def _standardize(features):
+    """Zero-mean, unit-variance columns so no coefficient dominates distances"""
+    features = np.asarray(features, dtype=np.float64)
+    std = features.std(axis=0)
+    std[std == 0] = 1.0
+    return (features - features.mean(axis=0)) / std
+
+
+def _eigengap_count(distances, min_speakers, max_speakers):
+    """
+    Speaker count from the largest gap in the normalized Laplacian spectrum
+    
+    Args:
+        distances: Pairwise Euclidean distance matrix
+        min_speakers: Smallest candidate count
+        max_speakers: Largest candidate count
+    
+    Returns:
+        Estimated number of speakers
+    """
+    # Locally scaled affinity (Zelnik-Manor & Perona): each point's scale is
+    # the distance to its 7th nearest neighbour, or nearer when clusters
+    # can be small. Half the average cluster size at max_speakers keeps the
+    # neighbour inside the point's own speaker on short recordings, where
+    # a fixed 7th neighbour bridges the clusters and everything looks like
+    # one speaker
+    n = len(distances)
+    neighbour = max(1, min(7, n // (2 * max_speakers), n - 1))
+    sigma = np.maximum(np.partition(distances, neighbour, axis=1)[:, neighbour], 1e-12)
+    affinity = np.exp(-distances ** 2 / (sigma[:, None] * sigma[None, :]))
+    np.fill_diagonal(affinity, 0.0)
+    degree = affinity.sum(axis=1)
+    degree[degree == 0] = 1.0
+    scale = 1.0 / np.sqrt(degree)
+    normalized = scale[:, None] * affinity * scale[None, :]
+    
+    # Only the smallest Laplacian eigenvalues (1 - largest of the
+    # normalized affinity) are needed
+    n_eigenvalues = min(max_speakers + 1, len(normalized) - 1)
+    top = eigsh(normalized, k=n_eigenvalues, which='LA', return_eigenvectors=False)
+    eigenvalues = np.sort(1.0 - top)
+    gaps = np.diff(eigenvalues)
+    # gaps[k - 1] is the gap after the k-th smallest eigenvalue
+    candidates = np.arange(min_speakers, min(max_speakers, len(gaps)) + 1)
+    if len(candidates) == 0:
+        return min_speakers
+    scores = gaps[candidates - 1]
+    k = int(candidates[np.argmax(scores)])
+    
+    # A first gap that barely leads is no evidence for a single speaker
+    if k == 1 and len(scores) > 1 and scores[0] < SINGLE_SPEAKER_GAP_RATIO * scores[1:].max():
+        k = int(candidates[1 + np.argmax(scores[1:])])
+    return k
+
+
+def _warm_start_fits(features, ks, random_state):
+    """
+    Fit k-means for increasing k, seeding each fit from the previous one
+    
+    The previous centroids are kept and the point farthest from all of
+    them becomes the new centroid, so each fit needs one initialization
+    instead of n_init random restarts.
+    
+    Args:
+        features: Feature matrix
+        ks: Increasing candidate counts
+        random_state: Seed for the first fit
+    
+    Returns:
+        Dictionary mapping k to a fitted KMeans model
+    """
+    fits = {}
+    centers = None
+    for k in ks:
+        if centers is None:
+            model = KMeans(n_clusters=k, random_state=random_state, n_init=3)
+        else:
+            while len(centers) < k:
+                nearest = pairwise_distances(features, centers).min(axis=1)
+                centers = np.vstack([centers, features[np.argmax(nearest)]])
+            model = KMeans(n_clusters=k, init=centers, n_init=1)
+        model.fit(features)
+        fits[k] = model
+        centers = model.cluster_centers_
+    return fits
+
+
+def estimate_num_speakers(features, min_speakers=1, max_speakers=8, criterion='eigengap',
+                          sample_size=1000, n_jobs=None, random_state=0):
+    """
+    Pick the number of speakers and cluster the features accordingly
+    
+    Args:
+        features: Feature matrix (one row per segment or frame)
+        min_speakers: Smallest candidate count
+        max_speakers: Largest candidate count
+        criterion: 'eigengap' or 'silhouette'
+        sample_size: Rows used for the pairwise distance matrix (shared by
+            the silhouette and eigengap criteria); larger inputs are
+            subsampled
+        n_jobs: Threads used to score candidates (None for one per
+            candidate)
+        random_state: Random seed
+    
+    Returns:
+        Tuple (number of speakers, label array)
+    """
+    if criterion not in CRITERIA:
+        raise ValueError(f"Unsupported speaker count criterion: {criterion}")
+    
+    features = _standardize(features)
+    n = len(features)
+    max_speakers = max(1, min(max_speakers, n // MIN_ROWS_PER_SPEAKER))
+    min_speakers = max(1, min(min_speakers, max_speakers))
+    if max_speakers == 1:
+        return 1, np.zeros(n, dtype=int)
+    
+    # One distance matrix shared by all candidates
+    rng = np.random.default_rng(random_state)
+    sample = np.sort(rng.choice(n, sample_size, replace=False)) if n > sample_size else np.arange(n)
+    distances = pairwise_distances(features[sample])
+    
+    if criterion == 'eigengap':
+        k = _eigengap_count(distances, min_speakers, max_speakers)
+        fits = _warm_start_fits(features, [k], random_state)
+        logger.debug(f"Eigengap estimate: {k} speakers")
+        return k, fits[k].labels_
+    
+    fits = _warm_start_fits(features, list(range(min_speakers, max_speakers + 1)), random_state)
+    
+    def score(k):
+        labels = fits[k].labels_[sample]
+        if k == 1 or len(np.unique(labels)) < 2:
+            return SINGLE_SPEAKER_SILHOUETTE
+        return silhouette_score(distances, labels, metric='precomputed')
+    
+    with ThreadPoolExecutor(max_workers=n_jobs or len(fits)) as executor:
+        scores = dict(zip(fits, executor.map(score, fits)))
+    
+    k = max(scores, key=scores.get)
+    logger.debug(f"Speaker count scores ({criterion}): "
+                 + ", ".join(f"{c}={s:.3f}" for c, s in scores.items()))
+    return k, fits[k].labels_
@@ -0,0 +1,113 @@
+"""
+Incremental diarization of live audio.
+
+Audio arrives as 16-bit PCM chunks; speech segments are found with the
+WebRTC VAD collector and each segment is labelled with a speaker as soon
+as it closes, instead of waiting for the complete recording.
+"""
+import logging
+import numpy as np
+import webrtcvad
+
+from .feature_extraction import extract_mfcc
+from .audio_utils import stream_frame_generator, vad_segment_collector
+from .online_clustering import OnlineSpeakerClusterer
+
+logger = logging.getLogger(__name__)
+
+
+class StreamingDiarizer:
+    """
+    Labels speech segments of a live PCM stream as they close
+    
+    One instance handles one stream; it is not shared between threads.
+    """
+    
+    def __init__(self, sample_rate=16000, frame_duration_ms=30,
+                 padding_duration_ms=300, vad_aggressiveness=3,
+                 min_speech_duration_ms=300, max_speakers=2, clusterer=None):
+        """
+        Initialize the streaming diarizer
+        
+        Args:
+            sample_rate: Sample rate of the incoming PCM (8000, 16000,
+                32000 or 48000)
+            frame_duration_ms: VAD frame duration in milliseconds
+            padding_duration_ms: VAD smoothing window; a segment is closed
+                once this much mostly non-speech audio follows it, which
+                bounds the emission latency
+            vad_aggressiveness: VAD aggressiveness (0-3)
+            min_speech_duration_ms: Shorter segments are dropped
+            max_speakers: Maximum number of speakers to identify
+            clusterer: OnlineSpeakerClusterer to use (a new one capped at
+                max_speakers if None)
+        """
+        self.sample_rate = sample_rate
+        self.frame_duration_ms = frame_duration_ms
+        self.padding_duration_ms = padding_duration_ms
+        self.min_speech_duration_ms = min_speech_duration_ms
+        self.max_speakers = max_speakers
+        self.vad = webrtcvad.Vad(vad_aggressiveness)
+        
+        self.clusterer = clusterer or OnlineSpeakerClusterer(max_speakers=max_speakers)
+        self._merges_reported = len(self.clusterer.merges_)
+    
+    def process(self, chunks):
+        """
+        Diarize a stream of PCM chunks
+        
+        Args:
+            chunks: Iterable of 16-bit mono PCM byte strings
+            
+        Returns:
+            Generator yielding a dictionary with speaker, start, end and
+            duration for each speech segment, as soon as it closes, and
+            {"merge": {"from": ..., "into": ...}} before the first segment
+            labelled after two speakers were merged: segments already
+            yielded for "from" belong to "into", and "from" may later name
+            a new speaker
+        """
+        min_samples = int(self.min_speech_duration_ms * self.sample_rate / 1000)
+        
+        frames = stream_frame_generator(self.frame_duration_ms, chunks, self.sample_rate)
+        segments = vad_segment_collector(self.sample_rate, self.frame_duration_ms,
+                                         self.padding_duration_ms, self.vad, frames)
+        
+        for start_sample, end_sample, segment_bytes in segments:
+            if end_sample - start_sample < min_samples:
+                continue
+            
+            start = start_sample / self.sample_rate
+            end = end_sample / self.sample_rate
+            
+            audio = np.frombuffer(segment_bytes, dtype=np.int16).astype(np.float32) / 32768.0
+            speaker = self._label_segment(audio)
+            if speaker is None:
+                continue
+            
+            for merged, survivor in self.clusterer.merges_[self._merges_reported:]:
+                yield {"merge": {"from": f"speaker_{merged}", "into": f"speaker_{survivor}"}}
+            self._merges_reported = len(self.clusterer.merges_)
+            
+            yield {
+                "speaker": f"speaker_{speaker}",
+                "start": round(start, 3),
+                "end": round(end, 3),
+                "duration": round(end - start, 3)
+            }
+    
+    def _label_segment(self, audio):
+        """
+        Assign a speaker to a new segment
+        
+        Args:
+            audio: Segment audio as float numpy array
+            
+        Returns:
+            Integer speaker label, or None if no features could be extracted
+        """
+        mfcc_features = extract_mfcc(audio, self.sample_rate)
+        if mfcc_features.size == 0:
+            return None
+        
+        return int(self.clusterer.partial_fit(np.mean(mfcc_features, axis=0))[0])
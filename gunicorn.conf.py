@@ -0,0 +1,24 @@
+"""
+Gunicorn settings for the diarization server.
+
+Gunicorn loads this file from the working directory, so the run commands
+in .replit (``gunicorn --bind 0.0.0.0:5000 main:app``) pick it up.
+
+/api/stream/live holds a request open for as long as audio is captured,
+so the default sync worker (one request at a time, killed after 30 s)
+cannot serve it. Threaded workers keep other endpoints responsive while
+streams are open, and their timeout only applies to a stuck worker
+process, not to long requests. Diarization itself runs in the engine's
+worker processes, so one server process is usually enough.
+"""
+import os
+
+worker_class = 'gthread'
+workers = int(os.environ.get('GUNICORN_WORKERS', '1'))
+
+# Each open live stream occupies one thread
+threads = int(os.environ.get('GUNICORN_THREADS', '16'))
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '120'))
+graceful_timeout = 30
+keepalive = 5
@@ -1,8 +1,85 @@
 import os
+import struct
 import logging
+import numpy as np
 
 logger = logging.getLogger(__name__)
 
+def wav_data_offset(file_path):
+    """
+    Find the byte offset of the sample data in a RIFF/WAVE file.
+    
+    Args:
+        file_path (str): Path to the WAV file
+        
+    Returns:
+        int: Offset of the 'data' chunk payload, or None if not found
+    """
+    with open(file_path, 'rb') as f:
+        header = f.read(12)
+        if len(header) < 12 or header[:4] != b'RIFF' or header[8:12] != b'WAVE':
+            return None
+        
+        while True:
+            chunk = f.read(8)
+            if len(chunk) < 8:
+                return None
+            chunk_id, size = chunk[:4], struct.unpack('<I', chunk[4:])[0]
+            if chunk_id == b'data':
+                return f.tell()
+            # Chunks are word aligned
+            f.seek(size + (size & 1), os.SEEK_CUR)
+
+def load_audio(file_path, sr=None, mono=True, mmap=True):
+    """
+    Load an audio file, decoding and resampling only when needed.
+    
+    The header is inspected first. A mono 16-bit PCM WAV that is already at
+    the target rate is memory-mapped as int16 without copying (when mmap
+    is True). Other formats soundfile can read are decoded directly, and
+    only files it cannot read, or that need resampling, go through librosa.
+    
+    Args:
+        file_path (str): Path to the audio file
+        sr (int): Target sample rate, or None to keep the file's rate
+        mono (bool): Downmix to mono
+        mmap (bool): Allow returning an int16 memory map for PCM WAVs
+        
+    Returns:
+        tuple: (samples as numpy array, sample rate). Samples are int16 for
+        memory-mapped PCM and float32 in [-1, 1] otherwise.
+    """
+    import soundfile as sf
+    
+    try:
+        info = sf.info(file_path)
+    except Exception:
+        info = None
+    
+    if info is not None and (sr is None or info.samplerate == sr):
+        if (mmap and info.format == 'WAV' and info.subtype == 'PCM_16'
+                and info.channels == 1):
+            offset = wav_data_offset(file_path)
+            if offset is not None:
+                n_samples = min(info.frames, (os.path.getsize(file_path) - offset) // 2)
+                samples = np.memmap(file_path, dtype='<i2', mode='r',
+                                    offset=offset, shape=(n_samples,))
+                return samples, info.samplerate
+        
+        # Decodable without resampling
+        samples, sample_rate = sf.read(file_path, dtype='float32', always_2d=True)
+        if samples.shape[1] == 1:
+            samples = samples[:, 0]
+        elif mono:
+            samples = samples.mean(axis=1)
+        else:
+            samples = samples.T
+        return np.ascontiguousarray(samples, dtype=np.float32), sample_rate
+    
+    import librosa
+    samples, sample_rate = librosa.load(file_path, sr=sr, mono=mono)
+    return samples, sample_rate
+
 def validate_audio_file(filename):
     """
     Validate that a file is an allowed audio type.
@@ -56,10 +133,13 @@ def get_audio_duration(file_path):
         float: Duration in seconds, or None if an error occurs
     """
     try:
-        import librosa
-        y, sr = librosa.load(file_path, sr=None)
-        duration = librosa.get_duration(y=y, sr=sr)
-        return duration
+        # Read the length from the header when possible
+        import soundfile as sf
+        try:
+            return sf.info(file_path).duration
+        except Exception:
+            import librosa
+            return librosa.get_duration(path=file_path)
     except Exception as e:
         logger.error(f"Error getting audio duration: {str(e)}")
         return None